@@ -0,0 +1,194 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: AnalisisIntervalos.py - Intervalos entre mediciones de toda la serie: tramos con
+#          intervalo distinto, duplicadas, desorden y marcas fuera de rejilla
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import pandas as pd
+import numpy as np
+
+from Class_SerieRegular import paso_intervalo
+
+
+# =============================================================================================
+# Procedimientos y funciones
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def _tramos_estables(deltas, min_repeticiones):
+    """
+    Tramos de deltas iguales (positivos) repetidos al menos min_repeticiones veces seguidas,
+    uniendo los consecutivos de igual delta aunque haya otros deltas entre ellos (lagunas,
+    mediciones sueltas).
+
+    Returns:
+        Tupla (posición en deltas donde inicia cada tramo, delta de cada tramo).
+    """
+    if len(deltas) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    cambios = np.flatnonzero(np.diff(deltas)) + 1
+    inicios = np.r_[0, cambios]
+    longitudes = np.diff(np.r_[inicios, len(deltas)])
+    valores = deltas[inicios]
+
+    estables = (longitudes >= min_repeticiones) & (valores > 0)
+    inicios, valores = inicios[estables], valores[estables]
+    nuevos = np.r_[True, valores[1:] != valores[:-1]] if len(valores) > 0 else valores > 0
+    return inicios[nuevos], valores[nuevos]
+
+
+# ---------------------------------------------------------------------------------------------
+class AnalisisIntervalos:
+    """
+    Revisión de las marcas de tiempo de toda la serie, con operaciones vectorizadas de
+    costo O(n) (si el archivo no está en orden, además un ordenamiento):
+
+        df_histograma: conteo de cada delta positivo entre mediciones consecutivas
+        df_segmentos:  tramos con intervalo distinto (p.ej. registradores que pasan de 15 a
+                       5 y luego a 1 minuto), con sus fechas, mediciones y fuera de rejilla
+        duplicadas:    filas con marca de tiempo repetida (todas menos la última del
+                       archivo, que es la que conserva rellenar_faltantes)
+        no_monotonas:  filas cuya marca de tiempo es anterior a la de la fila previa
+        fuera_rejilla: filas que no caen en la rejilla del intervalo de su tramo
+
+    Las filas se cuentan en el orden del archivo, desde 0.
+    """
+
+    # -----------------------------------------------------------------------------------------
+    def __init__(self, fechas, min_repeticiones=6):
+        """
+        Args:
+            fechas: Marcas de tiempo (datetime64) de las mediciones, en orden del archivo.
+            min_repeticiones: Deltas iguales seguidos para reconocer un tramo; evita que
+                una laguna o una medición suelta se tomen como cambio de intervalo.
+        """
+        fechas = np.asarray(fechas, dtype='datetime64[ns]')
+        tiempos = fechas.astype(np.int64)
+        self.num_mediciones = len(fechas)
+
+        # Orden temporal: el del archivo si ya es creciente (lo usual)
+        self.no_monotonas = np.flatnonzero(np.diff(tiempos) < 0) + 1
+        self._orden = None
+        if len(self.no_monotonas) > 0:
+            self._orden = np.argsort(tiempos, kind='stable')
+            tiempos = tiempos[self._orden]
+        deltas = np.diff(tiempos)
+
+        # Duplicadas: en orden estable, todas las de una misma marca menos la última
+        self.duplicadas = self._filas(np.flatnonzero(deltas == 0))
+
+        # Histograma de deltas positivos (en minutos) y el más frecuente como intervalo
+        positivos = pd.Series(deltas[deltas > 0])
+        conteos = positivos.value_counts()
+        self.df_histograma = pd.DataFrame({
+            'intervalo' : conteos.index.to_numpy() / 60e9,
+            'conteo'    : conteos.to_numpy(),
+            'fraccion'  : conteos.to_numpy() / max(len(positivos), 1),
+        })
+        self.intervalo = \
+            float(self.df_histograma['intervalo'].iloc[0]) if len(conteos) > 0 else None
+
+        # Tramos: desde el inicio de cada racha estable de un nuevo delta
+        # (sin rachas estables, un solo tramo con el delta más frecuente)
+        inicios, pasos = _tramos_estables(deltas, min_repeticiones)
+        if (len(inicios) == 0) and (len(tiempos) > 0):
+            paso = int(conteos.index[0]) if len(conteos) > 0 else 0
+            inicios, pasos = np.zeros(1, dtype=np.int64), np.array([paso], dtype=np.int64)
+        inicios[:1] = 0
+        longitudes = np.diff(np.r_[inicios, len(tiempos)])
+
+        # Fuera de rejilla: desfase respecto a la primera medición del tramo no múltiplo
+        # del intervalo del tramo
+        fuera = np.zeros(len(tiempos), dtype=bool)
+        por_tramo = np.zeros(len(inicios), dtype=np.int64)
+        if len(tiempos) > 0:
+            anclas = np.repeat(tiempos[inicios], longitudes)
+            pasos_filas = np.repeat(pasos, longitudes)
+            con_paso = pasos_filas > 0
+            fuera[con_paso] = \
+                (tiempos[con_paso] - anclas[con_paso]) % pasos_filas[con_paso] != 0
+            por_tramo = np.add.reduceat(fuera.astype(np.int64), inicios)
+        self.fuera_rejilla = self._filas(np.flatnonzero(fuera))
+
+        ultimos = inicios + longitudes - 1
+        self.df_segmentos = pd.DataFrame({
+            'inicia'        : tiempos[inicios].astype('datetime64[ns]'),
+            'termina'       : tiempos[ultimos].astype('datetime64[ns]'),
+            'intervalo'     : np.where(pasos > 0, pasos / 60e9, np.nan),
+            'mediciones'    : longitudes,
+            'fuera_rejilla' : por_tramo,
+        })
+
+    # -----------------------------------------------------------------------------------------
+    def _filas(self, posiciones):
+        # Posiciones en orden temporal -> filas del archivo, en orden creciente
+        if self._orden is None:
+            return posiciones
+        return np.sort(self._orden[posiciones])
+
+    # -----------------------------------------------------------------------------------------
+    @property
+    def intervalo_mixto(self):
+        return len(self.df_segmentos['intervalo'].unique()) > 1
+
+    # -----------------------------------------------------------------------------------------
+    def resumen(self):
+        # Conteos para mostrar en la interfaz o en el resumen de lotes
+        return {
+            'intervalo'     : self.intervalo,
+            'segmentos'     : self.df_segmentos.shape[0],
+            'intervalos'    : sorted(self.df_segmentos['intervalo'].unique().tolist()),
+            'duplicadas'    : len(self.duplicadas),
+            'no_monotonas'  : len(self.no_monotonas),
+            'fuera_rejilla' : len(self.fuera_rejilla),
+        }
+
+    # -----------------------------------------------------------------------------------------
+    def remuestrear(self, fechas, valores, intervalo=None):
+        """
+        Lleva toda la serie a una rejilla común sumando las mediciones de cada periodo;
+        cada medición acumula la lluvia hasta su marca de tiempo, así que se asigna al
+        periodo (t - intervalo, t] que la contiene. Las duplicadas se descartan (se
+        conserva la última) y las faltantes (NaN o <0) no suman; los periodos sin
+        mediciones válidas quedan como faltantes (NaN).
+
+        Args:
+            fechas, valores: Mediciones en el orden del archivo (las mismas fechas
+                analizadas).
+            intervalo: Minutos de la rejilla común. None: el mayor intervalo de los tramos,
+                para no repartir mediciones gruesas entre periodos más finos.
+
+        Returns:
+            Tupla (fechas, valores) sobre la rejilla regular, en orden.
+        """
+        if intervalo is None:
+            intervalo = float(self.df_segmentos['intervalo'].max())
+        paso = paso_intervalo(intervalo).astype(np.int64)
+
+        tiempos = np.asarray(fechas, dtype='datetime64[ns]').astype(np.int64)
+        valores = np.asarray(valores, dtype=float)
+        conservar = np.ones(len(tiempos), dtype=bool)
+        conservar[self.duplicadas] = False
+        conservar &= valores >= 0
+        tiempos, valores = tiempos[conservar], valores[conservar]
+        if len(tiempos) == 0:
+            return np.array([], dtype='datetime64[ns]'), np.array([])
+
+        periodos = -(-tiempos // paso)
+        primero = periodos.min()
+        posiciones = periodos - primero
+        sumas = np.bincount(posiciones, weights=valores)
+        conteos = np.bincount(posiciones)
+        sumas[conteos == 0] = np.nan
+
+        fechas_rejilla = ((primero + np.arange(len(sumas))) * paso).astype('datetime64[ns]')
+        return fechas_rejilla, sumas
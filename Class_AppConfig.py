@@ -14,6 +14,7 @@
 # =============================================================================================
 
 import streamlit as st
+import pyarrow as pa
 
 # ---------------------------------------------------------------------------------------------
 class AppConfig:
@@ -46,4 +47,50 @@ class AppConfig:
             st.header(header)
         if subheader is not None:
             st.subheader(subheader)
-            
\ No newline at end of file
+
+    # -----------------------------------------------------------------------------------------
+    def mostrar_tabla_paginada(self, df, clave, filas_por_pagina=1000, columnas=None):
+        # Tabla por páginas: solo se envía al navegador la página visible. df puede ser un
+        # DataFrame o una tabla Arrow (la página es un corte sin copia de sus buffers)
+        num_filas = df.shape[0]
+        num_paginas = max((num_filas - 1) // filas_por_pagina + 1, 1)
+        if num_paginas == 1:
+            st.dataframe(df, column_order=columnas)
+            return
+
+        zona_pagina, zona_info = st.columns([1, 3])
+        pagina = zona_pagina.number_input(
+            'Página', min_value=1, max_value=num_paginas, value=1, step=1, key=clave
+        )
+        inicio = (pagina - 1) * filas_por_pagina
+        fin = min(inicio + filas_por_pagina, num_filas)
+        zona_info.caption(f'Filas {inicio + 1} a {fin} de {num_filas} ({num_paginas} páginas)')
+        if isinstance(df, pa.Table):
+            st.dataframe(df.slice(inicio, fin - inicio), column_order=columnas)
+        else:
+            st.dataframe(df.iloc[inicio:fin], column_order=columnas)
+
+    # -----------------------------------------------------------------------------------------
+    def mostrar_instrumentacion(self, datos):
+        # Panel plegable con tiempo, memoria y filas de las etapas ejecutadas en la sesión
+        instrumentacion = datos.instrumentacion
+        if instrumentacion is None:
+            return
+
+        with st.expander('Desempeño del procesamiento', expanded=False):
+            instrumentacion.memoria = st.toggle(
+                'Medir memoria pico?', 
+                value=instrumentacion.memoria,
+                help='Con tracemalloc: el procesamiento es más lento mientras esté activo.',
+            )
+            if len(instrumentacion.registros) == 0:
+                st.caption('Sin etapas medidas.')
+                return
+
+            st.write('Resumen por etapa:')
+            st.dataframe(instrumentacion.resumen())
+            if st.toggle('Ver todas las etapas medidas?'):
+                st.dataframe(instrumentacion.reporte(), hide_index=True)
+            if st.button('Borrar mediciones de desempeño'):
+                instrumentacion.borrar()
+                st.rerun()
@@ -0,0 +1,88 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: CacheFiguras.py - Cache en memoria de figuras ya generadas
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import threading
+from collections import OrderedDict
+
+
+# ---------------------------------------------------------------------------------------------
+class CacheFiguras:
+    """
+    Imágenes (PNG o SVG) de figuras ya generadas, identificadas por la huella de los datos
+    graficados más los parámetros de la figura. Así, al volver a ejecutar una página
+    de Streamlit (cualquier cambio en un control) solo se dibujan las figuras que
+    cambiaron.
+
+    Cada sesión tiene su propia cache; con compartida=True se consulta además una cache
+    común a todas las sesiones del servidor, de modo que el mismo archivo procesado con
+    los mismos criterios en otra sesión reutiliza las imágenes. En ambas se conservan
+    las max_figuras usadas más recientemente.
+    """
+
+    _comun   = OrderedDict()    # Cache común a todas las sesiones (mismo proceso)
+    _candado = threading.Lock() # Streamlit ejecuta cada sesión en su propio hilo
+
+    # -----------------------------------------------------------------------------------------
+    def __init__(self, compartida=False, max_figuras=32, dpi=200):
+        self.compartida  = compartida
+        self.max_figuras = max_figuras
+        self.dpi         = dpi            # Resolución de las imágenes PNG
+        self._propias    = OrderedDict()
+
+    # -----------------------------------------------------------------------------------------
+    def buscar(self, clave):
+        # Imagen guardada para clave en esta sesión o en la cache común; None si no existe
+        imagen = self._buscar(self._propias, clave)
+        if (imagen is None) and self.compartida:
+            with self._candado:
+                imagen = self._buscar(self._comun, clave)
+            if imagen is not None:
+                self._guardar(self._propias, clave, imagen)
+        return imagen
+
+    # -----------------------------------------------------------------------------------------
+    def guardar(self, clave, imagen):
+        # Guarda una imagen ya generada (ServicioFiguras las dibuja, en otros procesos)
+        if self.compartida:
+            with self._candado:
+                self._guardar(self._comun, clave, imagen)
+        self._guardar(self._propias, clave, imagen)
+
+    # -----------------------------------------------------------------------------------------
+    def contiene(self, clave):
+        if clave in self._propias:
+            return True
+        if self.compartida:
+            with self._candado:
+                return clave in self._comun
+        return False
+
+    # -----------------------------------------------------------------------------------------
+    def invalidar(self):
+        # Descarta las figuras de esta sesión (la cache común se limpia sola por antigüedad)
+        self._propias.clear()
+
+    # -----------------------------------------------------------------------------------------
+    def _buscar(self, cache, clave):
+        imagen = cache.get(clave)
+        if imagen is not None:
+            cache.move_to_end(clave)
+        return imagen
+
+    # -----------------------------------------------------------------------------------------
+    def _guardar(self, cache, clave, imagen):
+        cache[clave] = imagen
+        cache.move_to_end(clave)
+        while len(cache) > self.max_figuras:
+            cache.popitem(last=False)
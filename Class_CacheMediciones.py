@@ -0,0 +1,129 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: CacheMediciones.py - Cache en disco de mediciones y eventos ya procesados
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import hashlib
+import json
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+
+# ---------------------------------------------------------------------------------------------
+class CacheMediciones:
+    """
+    Guarda tablas ya procesadas (mediciones, eventos) en formato columnar Feather,
+    identificadas por la huella del contenido del archivo original más las opciones con
+    que se procesaron. Al leerlas se mapean en memoria, sin volver a convertir el CSV.
+    Cuando el directorio supera el tamaño límite se eliminan las menos usadas.
+    Sin pyarrow instalado la cache queda deshabilitada.
+    """
+
+    # -----------------------------------------------------------------------------------------
+    def __init__(self, directorio=None, limite_bytes=2 * 1024**3):
+        if directorio is None:
+            directorio = os.environ.get(
+                'HYETIASCAN_CACHE',
+                os.path.join(os.path.expanduser('~'), '.cache', 'hyetiascan'),
+            )
+        self.directorio   = directorio
+        self.limite_bytes = limite_bytes
+        self.habilitada   = pa is not None
+
+    # -----------------------------------------------------------------------------------------
+    def calcular_huella(self, archivo_io, tamaño_bloque=8 * 1024**2):
+        # Huella del contenido, leído por bloques; el archivo queda de nuevo al inicio
+        huella = hashlib.blake2b(digest_size=16)
+        archivo_io.seek(0)
+        while bloque := archivo_io.read(tamaño_bloque):
+            huella.update(bloque if isinstance(bloque, bytes) else bloque.encode())
+        archivo_io.seek(0)
+        return huella.hexdigest()
+
+    # -----------------------------------------------------------------------------------------
+    def _ruta(self, huella, tipo, opciones):
+        clave = hashlib.blake2b(repr(opciones).encode(), digest_size=8).hexdigest()
+        return os.path.join(self.directorio, f'{huella}_{clave}.{tipo}.feather')
+
+    # -----------------------------------------------------------------------------------------
+    def contiene(self, huella):
+        if (not self.habilitada) or (not os.path.isdir(self.directorio)):
+            return False
+        return any(nombre.startswith(f'{huella}_') for nombre in os.listdir(self.directorio))
+
+    # -----------------------------------------------------------------------------------------
+    def cargar(self, huella, tipo, opciones):
+        """
+        Retorna (DataFrame, metadatos) guardados para huella, tipo y opciones;
+        (None, None) si no están en cache.
+        """
+        if not self.habilitada:
+            return None, None
+        ruta = self._ruta(huella, tipo, opciones)
+        if not os.path.exists(ruta):
+            return None, None
+
+        try:
+            tabla = feather.read_table(ruta, memory_map=True)
+            metadatos = json.loads((tabla.schema.metadata or {}).get(b'hyetiascan', b'{}'))
+            df = tabla.to_pandas(split_blocks=True)
+        except (OSError, pa.ArrowException, ValueError):
+            return None, None
+
+        # Marcar como usado recientemente
+        os.utime(ruta)
+        return df, metadatos
+
+    # -----------------------------------------------------------------------------------------
+    def guardar(self, df, huella, tipo, opciones, metadatos=None):
+        if not self.habilitada:
+            return
+        os.makedirs(self.directorio, exist_ok=True)
+
+        # Arreglos tal cual (NaN como valor, no como nulo) para leerlos sin copiar
+        tabla = pa.table({columna: pa.array(df[columna].to_numpy()) for columna in df.columns})
+        tabla = tabla.replace_schema_metadata({'hyetiascan': json.dumps(metadatos or {})})
+
+        ruta = self._ruta(huella, tipo, opciones)
+        temporal = f'{ruta}.{os.getpid()}.tmp'
+        try:
+            feather.write_feather(tabla, temporal, compression='uncompressed')
+            os.replace(temporal, ruta)
+        except OSError:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            return
+
+        self._depurar()
+
+    # -----------------------------------------------------------------------------------------
+    def _depurar(self):
+        # Eliminar las tablas usadas hace más tiempo hasta quedar dentro del límite
+        rutas = [
+            os.path.join(self.directorio, nombre)
+            for nombre in os.listdir(self.directorio) if nombre.endswith('.feather')
+        ]
+        tamaños = {ruta: os.path.getsize(ruta) for ruta in rutas}
+        total = sum(tamaños.values())
+        for ruta in sorted(rutas, key=os.path.getmtime):
+            if total <= self.limite_bytes:
+                break
+            try:
+                os.remove(ruta)
+                total -= tamaños[ruta]
+            except OSError:
+                pass
@@ -0,0 +1,206 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: DetectorAguaceros.py - Detección de aguaceros sobre mediciones en tiempo real
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import pandas as pd
+import numpy as np
+
+from Class_Precipitaciones import (
+    _segmentar_secuencias, _acumular_segmentos, _percentiles_segmentos, _clasificar_cuartil_huff
+)
+from Class_SerieRegular import paso_intervalo
+
+
+# ---------------------------------------------------------------------------------------------
+class DetectorAguaceros:
+    """
+    Detecta aguaceros a medida que llegan las mediciones de un pluviómetro, una por una o
+    por lotes, con los mismos criterios de Precipitaciones.detectar_aguaceros.
+
+    Solo se guardan las mediciones del aguacero en curso: al superar la pausa máxima sin
+    lluvia el aguacero se cierra y, si cumple los criterios, se emite su registro.
+    Posiciones sin medición, valores negativos y NaN se toman como cero (igual que
+    rellenar_faltantes). Mediciones con marca de tiempo igual o anterior a la última
+    recibida se descartan.
+    """
+
+    # -----------------------------------------------------------------------------------------
+    def __init__(self, intervalo, pausa_maxima=5, duracion_minima=15, duracion_maxima=None,
+                 intensidad_minima=2):
+        self.intervalo         = intervalo         # Minutos entre mediciones
+        self.pausa_maxima      = pausa_maxima
+        self.duracion_minima   = duracion_minima
+        self.duracion_maxima   = duracion_maxima   # None: sin límite
+        self.intensidad_minima = intensidad_minima
+        self.descartadas       = 0                 # Mediciones fuera de orden o duplicadas
+
+        self._paso   = int(paso_intervalo(intervalo).astype(np.int64)) # En nanosegundos
+        self._inicio = None # Marca de tiempo de la primera medición (posición 0), en ns
+        self._ultima = -1   # Posición de la última medición recibida
+
+        # Aguacero en curso: posición inicial, última posición con lluvia y mediciones
+        # (None si no hay aguacero en curso)
+        self._inicio_aguacero = None
+        self._fin_aguacero    = None
+        self._mediciones      = []
+        self._excedido        = False # Ya superó duracion_maxima: no se guardan mediciones
+
+        # Pausa en curso: posición inicial y número de mediciones sin lluvia
+        self._inicio_pausa = 0
+        self._pausa        = 0
+
+    # -----------------------------------------------------------------------------------------
+    def agregar(self, fecha, valor):
+        """
+        Agrega una medición. Retorna lista de aguaceros cerrados con ella (normalmente vacía).
+        """
+        aguaceros = []
+        posicion = self._ubicar(fecha)
+        if posicion <= self._ultima:
+            self.descartadas += 1
+            return aguaceros
+
+        # Posiciones sin medición entre la anterior y esta: sin lluvia
+        if posicion - self._ultima > 1:
+            self._agregar_secas(self._ultima + 1, posicion - self._ultima - 1, aguaceros)
+        self._ultima = posicion
+
+        if (not valor > 0):
+            self._agregar_secas(posicion, 1, aguaceros)
+            return aguaceros
+
+        # Medición con lluvia: la pausa previa se incluye si es corta (o inicial)
+        if self._pausa > 0:
+            pausa_corta = self._duracion(self._inicio_pausa, posicion - 1) <= self.pausa_maxima
+            if self._inicio_aguacero is None and pausa_corta and self._inicio_pausa == 0:
+                self._abrir_aguacero(0)
+            if self._inicio_aguacero is not None:
+                self._extender_aguacero([0.0] * self._pausa)
+            self._pausa = 0
+        if self._inicio_aguacero is None:
+            self._abrir_aguacero(posicion)
+        self._extender_aguacero([float(valor)])
+        self._fin_aguacero = posicion
+        return aguaceros
+
+    # -----------------------------------------------------------------------------------------
+    def agregar_lote(self, fechas, valores):
+        # Agrega mediciones en orden; retorna aguaceros cerrados durante el lote
+        aguaceros = []
+        for fecha, valor in zip(np.asarray(fechas, dtype='datetime64[ns]'), valores):
+            aguaceros.extend(self.agregar(fecha, valor))
+        return aguaceros
+
+    # -----------------------------------------------------------------------------------------
+    def finalizar(self):
+        # Cierra el aguacero en curso al terminar las mediciones; una pausa final corta
+        # forma parte de él, como en detectar_aguaceros
+        aguaceros = []
+        if self._inicio_aguacero is not None:
+            if self._pausa > 0:
+                self._extender_aguacero([0.0] * self._pausa)
+                self._fin_aguacero = self._ultima
+            self._cerrar_aguacero(aguaceros)
+        return aguaceros
+
+    # -----------------------------------------------------------------------------------------
+    def _ubicar(self, fecha):
+        # Posición de la medición en la rejilla que inicia con la primera recibida
+        fecha = int(np.datetime64(fecha, 'ns').astype(np.int64))
+        if self._inicio is None:
+            self._inicio = fecha
+        return (fecha - self._inicio + self._paso // 2) // self._paso
+
+    # -----------------------------------------------------------------------------------------
+    def _fecha(self, posicion):
+        return pd.Timestamp(self._inicio + posicion * self._paso)
+
+    # -----------------------------------------------------------------------------------------
+    def _duracion(self, primera, ultima):
+        # Duración en minutos entre dos posiciones, con la fórmula de detectar_aguaceros
+        return (ultima - primera) * self._paso / 1e9 // 60 + self.intervalo
+
+    # -----------------------------------------------------------------------------------------
+    def _agregar_secas(self, primera, cantidad, aguaceros):
+        # Agrega cantidad de mediciones sin lluvia a partir de la posición primera
+        if self._pausa == 0:
+            self._inicio_pausa = primera
+        self._pausa += cantidad
+        ultima_seca = self._inicio_pausa + self._pausa - 1
+
+        # Pausa más larga que la máxima: el aguacero en curso ya no puede continuar
+        if self._inicio_aguacero is not None and \
+                self._duracion(self._inicio_pausa, ultima_seca) > self.pausa_maxima:
+            self._cerrar_aguacero(aguaceros)
+
+    # -----------------------------------------------------------------------------------------
+    def _abrir_aguacero(self, posicion):
+        self._inicio_aguacero = posicion
+        self._fin_aguacero    = posicion
+        self._mediciones      = []
+        self._excedido        = False
+
+    # -----------------------------------------------------------------------------------------
+    def _extender_aguacero(self, valores):
+        if self._excedido:
+            return
+        self._mediciones.extend(valores)
+
+        # Memoria acotada: un aguacero más largo que duracion_maxima ya no cumple criterios
+        if (self.duracion_maxima is not None) and \
+                len(self._mediciones) * self.intervalo > self.duracion_maxima:
+            self._excedido = True
+            self._mediciones = []
+
+    # -----------------------------------------------------------------------------------------
+    def _cerrar_aguacero(self, aguaceros):
+        aguacero = None if self._excedido else self._resumir_aguacero()
+        self._inicio_aguacero = None
+        self._mediciones = []
+        if aguacero is not None:
+            aguaceros.append(aguacero)
+
+    # -----------------------------------------------------------------------------------------
+    def _resumir_aguacero(self):
+        # Mismos cálculos (y mismas funciones) que detectar_aguaceros, para un aguacero
+        mediciones = np.array(self._mediciones)
+        _, _, sumas = _segmentar_secuencias(mediciones)
+        precipitacion = np.add.reduceat(sumas, [0])[0]
+        if precipitacion == 0:
+            return None
+
+        inicia = self._fecha(self._inicio_aguacero)
+        termina = self._fecha(self._fin_aguacero)
+        duracion = (termina - inicia).total_seconds() // 60 + self.intervalo
+        intensidad = 60 * precipitacion / duracion
+        if (duracion < self.duracion_minima) or (intensidad < self.intensidad_minima) or \
+                ((self.duracion_maxima is not None) and (duracion > self.duracion_maxima)):
+            return None
+
+        desplazamientos = np.array([0, len(mediciones)])
+        porcentajes = _acumular_segmentos(mediciones, desplazamientos, factor=100)
+        Q_Huff = _clasificar_cuartil_huff(
+            _percentiles_segmentos(porcentajes, desplazamientos, [25, 50, 75])
+        )[0]
+
+        return {
+            'inicia'                  : inicia,
+            'termina'                 : termina,
+            'duracion'                : duracion,
+            'intensidad'              : intensidad,
+            'precipitacion_acumulada' : precipitacion,
+            'conteo'                  : len(mediciones),
+            'mediciones'              : mediciones,
+            'porcentaje_acumulado'    : porcentajes,
+            'Q_Huff'                  : Q_Huff,
+        }
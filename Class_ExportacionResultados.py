@@ -0,0 +1,209 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: ExportacionResultados.py - Escritura de catálogo de aguaceros, curvas de Huff,
+#          lagunas y parámetros a Parquet, CSV y NetCDF, por bloques de filas
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from Class_TablasArrow import pa
+
+if pa is not None:
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+# NetCDF es opcional: solo se requiere para exportar en ese formato
+try:
+    import netCDF4
+except ImportError:
+    netCDF4 = None
+
+
+FORMATOS = {'parquet': '.parquet', 'csv': '.csv', 'netcdf': '.nc'}
+
+# Dimensión NetCDF de cada tabla (una fila por elemento de la dimensión) y prefijo de sus
+# variables (todas comparten el mismo espacio de nombres)
+DIMENSIONES = {
+    'aguaceros'            : ('aguacero', ''),
+    'mediciones_aguaceros' : ('medicion', ''),
+    'lagunas'              : ('laguna',   'laguna_'),
+}
+
+UNIDADES_TIEMPO = 'seconds since 1970-01-01 00:00:00'
+
+
+# =============================================================================================
+# Procedimientos y funciones
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def _a_arrow(tabla):
+    # DataFrame, diccionario de arreglos o tabla Arrow -> tabla Arrow (los arreglos NumPy
+    # numéricos se usan sin copiar)
+    if isinstance(tabla, pa.Table):
+        return tabla
+    if isinstance(tabla, pd.DataFrame):
+        return pa.Table.from_pandas(tabla, preserve_index=False)
+    return pa.table({nombre: pa.array(np.asarray(datos)) for nombre, datos in tabla.items()})
+
+# ---------------------------------------------------------------------------------------------
+def _escribir_parquet(tabla, ruta, parametros, filas_por_bloque):
+    # Un grupo de filas por bloque; los parámetros van en los metadatos del esquema
+    esquema = tabla.schema.with_metadata({'hyetiascan': json.dumps(parametros, default=str)})
+    with pq.ParquetWriter(ruta, esquema) as escritor:
+        for lote in tabla.to_batches(max_chunksize=filas_por_bloque):
+            escritor.write_batch(lote)
+
+# ---------------------------------------------------------------------------------------------
+def _escribir_csv(tabla, ruta, filas_por_bloque):
+    # Fechas en segundos si no tienen fracciones (2024-01-01 00:05:00, como pandas)
+    for i, campo in enumerate(tabla.schema):
+        if pa.types.is_timestamp(campo.type):
+            try:
+                tabla = tabla.set_column(i, campo.name, tabla.column(i).cast(pa.timestamp('s')))
+            except pa.ArrowInvalid:
+                pass
+
+    with pa_csv.CSVWriter(ruta, tabla.schema) as escritor:
+        for lote in tabla.to_batches(max_chunksize=filas_por_bloque):
+            escritor.write_batch(lote)
+
+# ---------------------------------------------------------------------------------------------
+def _variable_netcdf(nc, nombre, columna, dimensiones):
+    # Crea la variable según el tipo Arrow de la columna. Las fechas se guardan como
+    # segundos desde 1970 (convención CF), los booleanos como 0/1
+    tipo = columna.type
+    if pa.types.is_timestamp(tipo):
+        variable = nc.createVariable(nombre, 'i8', dimensiones, zlib=True)
+        variable.units = UNIDADES_TIEMPO
+        variable.calendar = 'standard'
+    elif pa.types.is_boolean(tipo):
+        variable = nc.createVariable(nombre, 'i1', dimensiones, zlib=True)
+        variable.flag_values = np.array([0, 1], dtype='i1')
+        variable.flag_meanings = 'no si'
+    elif pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        variable = nc.createVariable(nombre, str, dimensiones)
+    else:
+        variable = nc.createVariable(nombre, tipo.to_pandas_dtype(), dimensiones, zlib=True)
+    return variable
+
+# ---------------------------------------------------------------------------------------------
+def _valores_netcdf(columna):
+    # Bloque de una columna Arrow como arreglo para asignar a la variable NetCDF
+    if pa.types.is_timestamp(columna.type):
+        return columna.cast(pa.timestamp('s'), safe=False).cast(pa.int64()).to_numpy()
+    if pa.types.is_boolean(columna.type):
+        return columna.to_numpy(zero_copy_only=False).astype('i1')
+    if pa.types.is_string(columna.type) or pa.types.is_large_string(columna.type):
+        return columna.to_numpy(zero_copy_only=False).astype(object)
+    return columna.to_numpy(zero_copy_only=False)
+
+# ---------------------------------------------------------------------------------------------
+def _escribir_netcdf(tablas, ruta, parametros, filas_por_bloque):
+    """
+    Un solo archivo NetCDF4 con una dimensión por tabla. Las mediciones de los aguaceros
+    siguen la representación de arreglo irregular contiguo de CF: 'conteo' (mediciones
+    por aguacero) indica con sample_dimension la dimensión de las mediciones. Las curvas
+    de Huff son una variable de dos dimensiones (cuartil, percentil).
+    """
+    if netCDF4 is None:
+        raise ImportError('Se requiere netCDF4 para exportar en formato NetCDF')
+    columnas_omitidas = {'mediciones_aguaceros': 'aguacero'}
+
+    with netCDF4.Dataset(ruta, 'w', format='NETCDF4') as nc:
+        nc.setncatts({
+            clave: valor if isinstance(valor, (str, int, float)) else \
+                json.dumps(valor, default=str)
+            for clave, valor in parametros.items() if valor is not None
+        })
+
+        for nombre_tabla, (dimension, prefijo) in DIMENSIONES.items():
+            tabla = tablas[nombre_tabla]
+            nc.createDimension(dimension, tabla.num_rows)
+            for nombre in tabla.column_names:
+                # El aguacero de cada medición ya lo indica 'conteo'
+                if nombre == columnas_omitidas.get(nombre_tabla):
+                    continue
+                columna = tabla.column(nombre)
+                variable = _variable_netcdf(nc, prefijo + nombre, columna, (dimension,))
+                for desde in range(0, tabla.num_rows, filas_por_bloque):
+                    bloque = columna.slice(desde, filas_por_bloque)
+                    variable[desde:desde + len(bloque)] = _valores_netcdf(bloque)
+        nc.variables['conteo'].sample_dimension = DIMENSIONES['mediciones_aguaceros'][0]
+
+        curvas = tablas['curvas_huff']
+        columnas = [c for c in curvas.column_names if c != 'Q']
+        nc.createDimension('cuartil', curvas.num_rows)
+        nc.createDimension('percentil', len(columnas))
+        nc.createVariable('Q', str, ('cuartil',))[:] = _valores_netcdf(curvas.column('Q'))
+        nc.createVariable('percentil', 'i4', ('percentil',))[:] = \
+            np.array([int(c[1:]) for c in columnas])
+        curva = nc.createVariable('curva_huff', 'f8', ('cuartil', 'percentil'))
+        curva.units = 'percent'
+        curva.long_name = 'porcentaje acumulado medio de precipitación por cuartil de Huff'
+        if curvas.num_rows > 0:
+            curva[:, :] = np.column_stack([curvas.column(c).to_numpy() for c in columnas])
+
+# ---------------------------------------------------------------------------------------------
+def exportar_tablas(tablas, parametros, directorio, prefijo, formatos=('parquet',),
+                    filas_por_bloque=100_000):
+    """
+    Escribe las tablas de resultados en cada formato, por bloques de filas (sin armar
+    el contenido completo del archivo en memoria), más <prefijo>_parametros.json.
+
+    Args:
+        tablas: Diccionario con 'aguaceros', 'mediciones_aguaceros', 'curvas_huff' y
+            'lagunas' (DataFrame, tabla Arrow o diccionario de arreglos cada una).
+        parametros: Diccionario de parámetros de la ejecución (serializable a JSON).
+        directorio: Directorio de salida (se crea si no existe).
+        prefijo: Inicio del nombre de cada archivo (p.ej. la estación).
+        formatos: 'parquet', 'csv' y/o 'netcdf'. Parquet y CSV escriben un archivo por
+            tabla; NetCDF, un archivo con todas.
+        filas_por_bloque: Filas por bloque (y por grupo de filas en Parquet).
+
+    Returns:
+        Lista de rutas escritas.
+    """
+    if pa is None:
+        raise ImportError('Se requiere pyarrow para exportar resultados')
+    desconocidos = set(formatos) - set(FORMATOS)
+    if desconocidos:
+        raise ValueError(f'Formatos desconocidos: {", ".join(sorted(desconocidos))}')
+
+    os.makedirs(directorio, exist_ok=True)
+    tablas = {nombre: _a_arrow(tabla) for nombre, tabla in tablas.items()}
+    rutas = []
+
+    ruta = os.path.join(directorio, f'{prefijo}_parametros.json')
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(parametros, archivo, ensure_ascii=False, indent=2, default=str)
+    rutas.append(ruta)
+
+    for formato in formatos:
+        if formato == 'netcdf':
+            ruta = os.path.join(directorio, f'{prefijo}{FORMATOS[formato]}')
+            _escribir_netcdf(tablas, ruta, parametros, filas_por_bloque)
+            rutas.append(ruta)
+            continue
+        for nombre, tabla in tablas.items():
+            ruta = os.path.join(directorio, f'{prefijo}_{nombre}{FORMATOS[formato]}')
+            if formato == 'parquet':
+                _escribir_parquet(tabla, ruta, parametros, filas_por_bloque)
+            else:
+                _escribir_csv(tabla, ruta, filas_por_bloque)
+            rutas.append(ruta)
+
+    return rutas
@@ -0,0 +1,485 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: GraficasAguaceros.py - Figuras de aguaceros con la API de objetos de matplotlib
+#          (sin el estado global de pyplot), dibujadas en procesos, con cache y por lotes
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from math import floor, ceil, trunc
+
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection
+from matplotlib.colors import LogNorm
+from pandas import cut
+
+from Class_Precipitaciones import Precipitaciones
+
+
+# Atributos de Precipitaciones que usan las figuras (además de df_aguaceros)
+ATRIBUTOS_GRAFICAS = [
+    'nombre', 'col_precipitacion', 'primera_fecha', 'ultima_fecha',
+    'duracion_minima', 'duracion_maxima', 'pausa_maxima', 'intensidad_minima',
+    'porcentajes_aguaceros', 'desplazamientos_aguaceros', 'rejilla_huff',
+]
+
+
+# =============================================================================================
+# Figuras
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def generar_piedepagina(datos):
+    return \
+        f'Primera medición: {datos.primera_fecha}'                               +'\n'  + \
+        f'Última medición: {datos.ultima_fecha}'                                 +'\n'  + \
+        f'Rango de duración: {datos.duracion_minima} - {datos.duracion_maxima}'  + '\n' + \
+        f'Pausa máxima entre eventos: {datos.pausa_maxima}'                      + '\n' + \
+        f'Intensidad mínima de aguacero: {datos.intensidad_minima}'              + '\n' + \
+        f'Número de aguaceros: {datos.df_aguaceros.shape[0]}'                    + '\n' + \
+        f'Medición/Sensor: {datos.col_precipitacion}'
+
+# ---------------------------------------------------------------------------------------------
+def porcentajes_duracion(desplazamientos):
+    # % de duración de cada medición de cada aguacero, en el mismo arreglo plano de
+    # porcentajes_aguaceros: (i + 1) / conteo * 100 para la medición i del aguacero
+    conteos = np.diff(desplazamientos)
+    posiciones = np.arange(desplazamientos[-1]) - np.repeat(desplazamientos[:-1], conteos)
+    return (posiciones + 1) / np.repeat(conteos, conteos) * 100
+
+# ---------------------------------------------------------------------------------------------
+def interpolar_curvas(porcentajes, desplazamientos, puntos_x):
+    # % de precipitación de cada aguacero en los % de duración puntos_x (matriz aguaceros x
+    # puntos), interpolando linealmente sobre su curva, que inicia en (0, 0)
+    conteos = np.diff(desplazamientos)[:, None]
+    t = puntos_x[None, :] * conteos / 100
+    j = np.minimum(np.floor(t).astype(np.int64), conteos)
+    fraccion = t - j
+    inicios = desplazamientos[:-1, None]
+    anterior = np.where(j >= 1, porcentajes[inicios + np.maximum(j - 1, 0)], 0.0)
+    siguiente = porcentajes[inicios + np.minimum(j, conteos - 1)]
+    return anterior + (siguiente - anterior) * fraccion
+
+# ---------------------------------------------------------------------------------------------
+def figura_aguaceros(datos, modo='Curvas'):
+    # Todas las curvas en una sola LineCollection (o su densidad), desde los arreglos planos
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    porcentajes = datos.porcentajes_aguaceros
+    desplazamientos = datos.desplazamientos_aguaceros
+
+    if modo == 'Densidad':
+        # Cada aguacero aporta igual: su curva se evalúa en 100 puntos de % de duración y
+        # se cuenta en qué celda de % de precipitación cae en cada uno
+        puntos_x = np.arange(0.5, 100, 1.0)
+        curvas = interpolar_curvas(porcentajes, desplazamientos, puntos_x)
+        bordes = np.linspace(0, 100, 101)
+        celdas = np.clip(np.digitize(curvas, bordes) - 1, 0, 99)
+        densidad = np.zeros((100, 100))
+        np.add.at(densidad, (celdas, np.broadcast_to(np.arange(100), celdas.shape)), 1)
+        densidad *= 100 / max(curvas.shape[0], 1)
+
+        # Escala logarítmica: cerca de 0% y 100% todas las curvas coinciden
+        malla = ax.pcolormesh(
+            bordes, bordes, np.ma.masked_equal(densidad, 0),
+            cmap='viridis', norm=LogNorm(), shading='flat',
+        )
+        fig.colorbar(malla, ax=ax, label='% de aguaceros')
+        ax.plot(puntos_x, np.median(curvas, axis=0), color='orangered', linewidth=1.2,
+                label='Mediana')
+        ax.legend(loc='upper left', fontsize=8)
+    else:
+        xy = np.column_stack([porcentajes_duracion(desplazamientos), porcentajes])
+        colores = matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+        ax.add_collection(LineCollection(
+            np.split(xy, desplazamientos[1:-1]), colors=colores, linewidths=0.6
+        ))
+        ax.set_xlim(0, 101)
+        ax.set_ylim(-1, 101)
+
+    ax.set_xticks(range(0,101, 10))
+    ax.set_yticks(range(0,101, 10))
+    ax.grid(which='both', linestyle='--', linewidth=0.5)
+    ax.minorticks_on()
+    ax.grid(which='minor', linestyle=':', linewidth=0.5)
+    ax.set_xlabel('% duración')
+    ax.set_ylabel('% precipitación')
+
+    pie = generar_piedepagina(datos)
+    ax.text(100, 5,
+        pie, fontsize=6, ha='right',
+        bbox={'facecolor': 'white', 'alpha': 1, 'pad': 2}
+    )
+
+    ax.set_title(f'Curvas de aguaceros {datos.nombre}', fontsize=10)
+    return fig
+
+# ---------------------------------------------------------------------------------------------
+def preparar_curva_frecuencia(ax, df, columna):
+
+    # Curva general
+    valores       = df[[columna]].sort_values(columna, ascending=False)
+    num_valores   = valores.shape[0]
+    porcentajes_x = [(i + 1) / num_valores * 100 for i in range(num_valores)]
+    ax.plot(porcentajes_x, valores, label='General', linestyle='-', linewidth=1.2)
+
+    # Curvas por categoría Huff
+    categorias = df['Q_Huff'].unique()
+    categorias.sort()
+    for categoria in categorias:
+        valores       = df[df['Q_Huff'] == categoria][[columna]].sort_values(columna, ascending=False)
+        num_valores   = valores.shape[0]
+        porcentajes_x = [(i + 1) / num_valores * 100 for i in range(num_valores)]
+        ax.plot(porcentajes_x, valores, label=categoria, linewidth=0.9, linestyle='-.')
+
+    ax.set_ylabel(columna.capitalize())
+    ax.set_xlabel('Probabilidad')
+    ax.legend(fontsize=8)
+    ax.grid(which='both', linestyle='--', linewidth=0.5)
+    ax.minorticks_on()
+    ax.grid(which='minor', linestyle=':', linewidth=0.5)
+
+    return
+
+# ---------------------------------------------------------------------------------------------
+def figura_curvas_frecuencia(datos):
+    fig = Figure(figsize=(8, 4))
+    ax_duracion, ax_precipit = fig.subplots(1, 2)
+
+    preparar_curva_frecuencia(ax_duracion, datos.df_aguaceros, 'duracion')
+    preparar_curva_frecuencia(ax_precipit, datos.df_aguaceros, 'precipitacion_acumulada')
+
+    fig.suptitle(f'Curvas de frecuencia {datos.nombre}', fontsize=10, ha='center')
+    pie = generar_piedepagina(datos)
+
+    fig.text(0.5, -0.125,
+        pie, fontsize=5, ha='center',
+        bbox={'facecolor': 'white', 'alpha': 1, 'pad': 2}
+    )
+    return fig
+
+# ---------------------------------------------------------------------------------------------
+def figura_curvas_huff(datos, intervalo_percentiles):
+    curvas_huff = datos.calcular_curvas_huff(intervalo=intervalo_percentiles)
+    valores_eje_x = range(0, 101, intervalo_percentiles)
+
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    marcas = "vDo^"
+    for indice, curva in curvas_huff.iterrows():
+        ax.plot(
+            valores_eje_x,
+            list(curva['valores_percentiles']),
+            label=curva['Q'],
+            marker=marcas[indice]
+        )
+
+    ax.set_xticks(range(0, 101, intervalo_percentiles))
+    ax.set_yticks(range(0, 101, 5))
+
+    ax.grid(which='both', linestyle='--', linewidth=0.5)
+    ax.grid(which='minor', linestyle=':', linewidth=0.5)
+
+    ax.set_xlabel('% duración')
+    ax.set_ylabel('% precipitación')
+    ax.legend()
+
+    ax.set_title(f'Curvas de Huff {datos.nombre}', fontsize=10)
+    pie = generar_piedepagina(datos)
+    ax.text(100, 5,
+        pie, fontsize=6, ha='right',
+        bbox={'facecolor': 'white', 'alpha': 1, 'pad': 2}
+    )
+    return fig
+
+# ---------------------------------------------------------------------------------------------
+def rango_intensidades(datos):
+    # Intensidad mínima y máxima (enteras) de los aguaceros, para los rangos de intensidad
+    return floor(datos.df_aguaceros['intensidad'].min()), \
+        ceil(datos.df_aguaceros['intensidad'].max())
+
+# ---------------------------------------------------------------------------------------------
+def figura_rangos_intensidad(datos, num_rangos):
+    intensidad_min, intensidad_max = rango_intensidades(datos)
+
+    tamaño_rango = (intensidad_max - intensidad_min) / num_rangos
+    limites_rangos = \
+        [trunc(intensidad_min + i * tamaño_rango) for i in range(num_rangos + 1)]
+    rangos = \
+        [(limites_rangos[i], limites_rangos[i + 1]) for i in range(num_rangos)]
+
+    df = datos.df_aguaceros[['Q_Huff', 'intensidad']].copy()
+
+    df['rango'] = cut(
+        datos.df_aguaceros['intensidad'],
+        bins=limites_rangos,
+        labels=[f'{t}' for t in rangos],
+    )
+
+    conteo_por_categoria = df.groupby(['Q_Huff', 'rango'], observed=False).size()
+    categorias = df['Q_Huff'].unique()
+    categorias.sort()
+
+    fig = Figure(figsize=(7, 4))
+    ax = fig.subplots()
+    colores = ['lightblue', 'cyan', 'blue', 'navy']
+    for i, categoria in enumerate(categorias):
+        ax.bar(
+            [p + i * 0.15 for p in range(num_rangos)],
+            conteo_por_categoria.loc[categoria],
+            width=0.15,
+            label=categoria,
+            color=colores[i]
+        )
+
+    ax.legend(title='Cuartil', loc='upper left', bbox_to_anchor=(1, 1))
+    ax.set_xticks(range(num_rangos))
+    ax.set_xticklabels(rangos, rotation=45, fontsize=8)
+    ax.set_xlabel('Rangos de intensidad')
+    ax.set_ylabel('Frecuencia')
+    ax.grid(which='both', linestyle='--', linewidth=0.5, axis='y')
+    ax.grid(which='minor', linestyle=':', linewidth=0.5, axis='y')
+
+    pie = generar_piedepagina(datos)
+    fig.text(1, 0.3,
+        pie, fontsize=5, ha='center',
+        bbox={'facecolor': 'white', 'alpha': 1, 'pad': 2}
+    )
+    ax.set_title(
+        f'Distribución rangos de intensidad por cuartil Huff\n{datos.nombre}',
+    )
+    return fig
+
+
+# Figuras disponibles por nombre: nombre -> función(datos, *parámetros)
+FIGURAS = {
+    'curvas_huff'        : figura_curvas_huff,
+    'rangos_intensidad'  : figura_rangos_intensidad,
+    'curvas_frecuencia'  : figura_curvas_frecuencia,
+    'curvas_aguaceros'   : figura_aguaceros,
+}
+
+
+# =============================================================================================
+# Dibujo en procesos y escritura de imágenes
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def figuras_estacion(datos, intervalo_huff=10, num_rangos=4):
+    """
+    Pedidos (nombre, parámetros) de todas las figuras que admiten los aguaceros detectados,
+    con los mismos valores por defecto de la página de gráficas.
+    """
+    num_aguaceros = 0 if datos.df_aguaceros is None else datos.df_aguaceros.shape[0]
+    if num_aguaceros == 0:
+        return []
+
+    pedidos = [
+        ('curvas_huff', (intervalo_huff,)),
+        ('curvas_aguaceros', ('Curvas' if num_aguaceros <= 1000 else 'Densidad',)),
+    ]
+    if num_aguaceros > 1:
+        pedidos.append(('curvas_frecuencia', ()))
+    if num_aguaceros > 2:
+        intensidad_min, intensidad_max = rango_intensidades(datos)
+        intensidad_med = (intensidad_max - intensidad_min) // 2
+        if intensidad_med >= 2:
+            pedidos.append(('rangos_intensidad', (min(num_rangos, intensidad_med),)))
+    return pedidos
+
+# ---------------------------------------------------------------------------------------------
+def datos_graficables(datos):
+    """
+    Copia liviana de Precipitaciones con solo lo que usan las figuras: aguaceros (sin
+    las columnas de listas), arreglos planos de porcentajes, rejilla de Huff y criterios.
+    Es lo que se envía a otro proceso para dibujar, en lugar de las mediciones completas.
+    """
+    copia = Precipitaciones()
+    for atributo in ATRIBUTOS_GRAFICAS:
+        setattr(copia, atributo, getattr(datos, atributo))
+    copia.df_aguaceros = datos.df_aguaceros.drop(
+        columns=['mediciones', 'porcentaje_acumulado'], errors='ignore'
+    )
+    return copia
+
+# ---------------------------------------------------------------------------------------------
+def imagen_figura(figura, formato='png', dpi=200):
+    # Contenido del archivo .png o .svg de la figura
+    buffer = io.BytesIO()
+    figura.savefig(buffer, format=formato, dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
+# ---------------------------------------------------------------------------------------------
+def _dibujar(datos, pedidos, formatos, dpi):
+    # Dibuja cada figura una vez y la guarda en cada formato; retorna, por pedido, un
+    # diccionario formato -> imagen
+    imagenes = []
+    for nombre, parametros in pedidos:
+        figura = FIGURAS[nombre](datos, *parametros)
+        imagenes.append({formato: imagen_figura(figura, formato, dpi) for formato in formatos})
+    return imagenes
+
+# ---------------------------------------------------------------------------------------------
+def guardar_figuras(datos, directorio, formatos=('png',), prefijo=None, pedidos=None,
+                    dpi=200):
+    """
+    Escribe las figuras de una estación como <prefijo>_<figura>.<formato>.
+
+    Args:
+        datos: Precipitaciones con aguaceros detectados.
+        directorio: Directorio de salida (se crea si no existe).
+        formatos: 'png' y/o 'svg'.
+        prefijo: Inicio del nombre de cada archivo (por defecto, el nombre del archivo
+            de mediciones sin extensión).
+        pedidos: Lista de (nombre de figura, parámetros); por defecto, figuras_estacion.
+        dpi: Resolución de las imágenes PNG.
+
+    Returns:
+        Lista de rutas escritas.
+    """
+    if prefijo is None:
+        prefijo = os.path.splitext(os.path.basename(str(datos.nombre)))[0]
+    if pedidos is None:
+        pedidos = figuras_estacion(datos)
+
+    os.makedirs(directorio, exist_ok=True)
+    rutas = []
+    for (nombre, _), imagenes in zip(pedidos, _dibujar(datos, pedidos, formatos, dpi)):
+        for formato, imagen in imagenes.items():
+            ruta = os.path.join(directorio, f'{prefijo}_{nombre}.{formato}')
+            with open(ruta, 'wb') as archivo:
+                archivo.write(imagen)
+            rutas.append(ruta)
+    return rutas
+
+
+# ---------------------------------------------------------------------------------------------
+class ServicioFiguras:
+    """
+    Dibuja figuras de aguaceros fuera del hilo de la página de Streamlit: las que no están
+    en la cache (CacheFiguras) se reparten entre procesos, cada uno con su propio
+    matplotlib (API de objetos con lienzo Agg, sin el estado global de pyplot), y sus
+    imágenes quedan en la cache con la huella de los aguaceros, los parámetros, el formato
+    y la resolución. También escribe a disco todas las figuras de muchas estaciones.
+
+    Los grupos de procesos se crean al primer uso, uno por número de procesos, y se
+    comparten entre sesiones. Si un proceso muere (p.ej. por falta de memoria) el grupo
+    se descarta y se reintenta con uno nuevo; si vuelve a fallar, se dibuja en el hilo
+    que llama, igual que con un solo proceso o una sola figura pendiente.
+    """
+
+    _ejecutores = {}              # Número de procesos -> grupo común a todas las sesiones
+    _candado  = threading.Lock()
+
+    # -----------------------------------------------------------------------------------------
+    def __init__(self, cache, procesos=None, formato='png'):
+        self.cache    = cache                           # CacheFiguras
+        self.procesos = procesos or os.cpu_count()
+        self.formato  = formato                         # 'png' o 'svg'
+
+    # -----------------------------------------------------------------------------------------
+    def clave(self, datos, nombre, parametros=()):
+        # Identifica una imagen por los aguaceros graficados, la figura, sus parámetros,
+        # el formato y la resolución
+        return (nombre, datos.huella_aguaceros(), tuple(parametros), self.formato, self.cache.dpi)
+
+    # -----------------------------------------------------------------------------------------
+    def obtener(self, datos, pedidos):
+        """
+        Imágenes de las figuras pedidas, en el mismo orden.
+
+        Args:
+            datos: Precipitaciones con aguaceros detectados.
+            pedidos: Lista de (nombre de figura en FIGURAS, parámetros).
+
+        Returns:
+            Lista con el contenido de la imagen de cada pedido.
+        """
+        claves = [self.clave(datos, nombre, parametros) for nombre, parametros in pedidos]
+        imagenes = [self.cache.buscar(clave) for clave in claves]
+        pendientes = [i for i, imagen in enumerate(imagenes) if imagen is None]
+
+        if len(pendientes) > 1:
+            datos = datos_graficables(datos)
+        dibujadas = self._ejecutar(_dibujar, [
+            (datos, [pedidos[i]], [self.formato], self.cache.dpi) for i in pendientes
+        ])
+
+        for i, dibujada in zip(pendientes, dibujadas):
+            imagenes[i] = dibujada[0][self.formato]
+            self.cache.guardar(claves[i], imagenes[i])
+        return imagenes
+
+    # -----------------------------------------------------------------------------------------
+    def generar_lote(self, estaciones, directorio, formatos=('png', 'svg'),
+                     intervalo_huff=10):
+        """
+        Escribe a disco todas las figuras de cada estación (ver guardar_figuras), una
+        estación por tarea en los procesos.
+
+        Args:
+            estaciones: Diccionario nombre -> Precipitaciones con aguaceros detectados
+                (p.ej. RedEstaciones.estaciones); las que no tienen aguaceros se omiten.
+            directorio: Directorio de salida.
+            formatos: 'png' y/o 'svg'.
+            intervalo_huff: Intervalo de percentiles de las curvas de Huff.
+
+        Returns:
+            Diccionario nombre de estación -> lista de rutas escritas.
+        """
+        nombres = [
+            nombre for nombre, datos in estaciones.items()
+            if (datos.df_aguaceros is not None) and (datos.df_aguaceros.shape[0] > 0)
+        ]
+        argumentos = []
+        for nombre in nombres:
+            datos = estaciones[nombre]
+            argumentos.append((
+                datos_graficables(datos), directorio, formatos, str(nombre),
+                figuras_estacion(datos, intervalo_huff), self.cache.dpi,
+            ))
+
+        return dict(zip(nombres, self._ejecutar(guardar_figuras, argumentos)))
+
+    # -----------------------------------------------------------------------------------------
+    def _ejecutar(self, funcion, tareas):
+        # Resultado de funcion(*argumentos) para cada tarea, en orden: en los procesos si
+        # hay más de una tarea, con un reintento en un grupo nuevo si el grupo se rompió
+        if (self.procesos > 1) and (len(tareas) > 1):
+            for _ in range(2):
+                ejecutor = self._obtener_ejecutor()
+                try:
+                    futuros = [ejecutor.submit(funcion, *argumentos) for argumentos in tareas]
+                    return [futuro.result() for futuro in futuros]
+                except BrokenProcessPool:
+                    self._descartar_ejecutor(ejecutor)
+        return [funcion(*argumentos) for argumentos in tareas]
+
+    # -----------------------------------------------------------------------------------------
+    def _obtener_ejecutor(self):
+        with self._candado:
+            if self.procesos not in self._ejecutores:
+                self._ejecutores[self.procesos] = ProcessPoolExecutor(max_workers=self.procesos)
+            return self._ejecutores[self.procesos]
+
+    # -----------------------------------------------------------------------------------------
+    def _descartar_ejecutor(self, ejecutor):
+        # Otra sesión pudo haberlo reemplazado ya; solo se quita si sigue siendo el mismo
+        with self._candado:
+            if self._ejecutores.get(self.procesos) is ejecutor:
+                del self._ejecutores[self.procesos]
+        ejecutor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,141 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: Instrumentacion.py - Tiempo, memoria y filas de cada etapa del procesamiento
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import functools
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+
+# ---------------------------------------------------------------------------------------------
+def etapa(nombre, filas=None):
+    """
+    Decorador para métodos de Precipitaciones: si el objeto tiene instrumentación, mide
+    la llamada como una etapa. filas es el nombre del DataFrame del objeto cuyas filas 
+    se registran con ella, o una función filas(objeto, resultado) que retorna su número.
+    """
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltura(self, *args, **kwargs):
+            if self.instrumentacion is None:
+                return metodo(self, *args, **kwargs)
+            with self.instrumentacion.medir(nombre, archivo=self.nombre) as registro:
+                resultado = metodo(self, *args, **kwargs)
+                registro['archivo'] = self.nombre # Puede asignarse durante la llamada
+                if isinstance(filas, str):
+                    df = getattr(self, filas)
+                    registro['filas'] = 0 if df is None else df.shape[0]
+                elif filas is not None:
+                    registro['filas'] = filas(self, resultado)
+            return resultado
+        return envoltura
+    return decorador
+
+
+# ---------------------------------------------------------------------------------------------
+class Instrumentacion:
+    """
+    Registra duración, memoria pico (con tracemalloc, opcional porque hace más lento el
+    procesamiento) y filas de cada etapa medida. Los registros se consultan como
+    DataFrame y, si se indica archivo, se agregan a él como líneas JSON.
+
+    Las etapas pueden anidarse: la memoria pico de una etapa incluye la de sus internas.
+    """
+
+    # -----------------------------------------------------------------------------------------
+    def __init__(self, archivo=None, memoria=False, max_registros=1000):
+        self.archivo       = archivo       # Archivo .jsonl de registros (None: solo en memoria)
+        self.memoria       = memoria       # Medir memoria pico con tracemalloc
+        self.max_registros = max_registros # Registros conservados en memoria
+        self.registros     = []
+        self._pila         = []            # Etapas en curso (anidadas)
+        self._tracemalloc  = False         # tracemalloc iniciado por esta instrumentación
+
+    # -----------------------------------------------------------------------------------------
+    @contextmanager
+    def medir(self, nombre, **contexto):
+        registro = {
+            'etapa'           : nombre,
+            'nivel'           : len(self._pila),
+            'inicio'          : datetime.now().isoformat(timespec='milliseconds'),
+            **contexto,
+            'segundos'        : None,
+            'memoria_pico_mb' : None,
+            'filas'           : None,
+        }
+
+        memoria = self.memoria
+        if memoria:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracemalloc = True
+            # El pico previo pertenece a la etapa externa: conservarlo antes de reiniciarlo
+            base, pico = tracemalloc.get_traced_memory()
+            if len(self._pila) > 0:
+                self._pila[-1]['pico'] = max(self._pila[-1]['pico'], pico)
+            tracemalloc.reset_peak()
+        marco = {'pico': 0}
+        self._pila.append(marco)
+
+        t0 = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro['segundos'] = time.perf_counter() - t0
+            self._pila.pop()
+            if memoria and tracemalloc.is_tracing():
+                pico = max(tracemalloc.get_traced_memory()[1], marco['pico'])
+                registro['memoria_pico_mb'] = max(pico - base, 0) / 1024**2
+                if (len(self._pila) == 0) and self._tracemalloc:
+                    tracemalloc.stop()
+                    self._tracemalloc = False
+            self._registrar(registro)
+
+    # -----------------------------------------------------------------------------------------
+    def _registrar(self, registro):
+        self.registros.append(registro)
+        del self.registros[:-self.max_registros]
+        if self.archivo is None:
+            return
+        try:
+            with open(self.archivo, 'a', encoding='utf-8') as archivo:
+                archivo.write(json.dumps(registro, default=str) + '\n')
+        except OSError:
+            pass
+
+    # -----------------------------------------------------------------------------------------
+    def reporte(self):
+        # Un registro por llamada medida, en orden de terminación
+        return pd.DataFrame(self.registros)
+
+    # -----------------------------------------------------------------------------------------
+    def resumen(self):
+        # Totales por etapa: llamadas, duración, memoria pico y filas
+        df = self.reporte()
+        if df.shape[0] == 0:
+            return df
+        return df.groupby('etapa', sort=False).agg(
+            llamadas        = ('segundos', 'size'),
+            segundos        = ('segundos', 'sum'),
+            memoria_pico_mb = ('memoria_pico_mb', 'max'),
+            filas           = ('filas', 'max'),
+        )
+
+    # -----------------------------------------------------------------------------------------
+    def borrar(self):
+        self.registros = []
@@ -0,0 +1,306 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: PiramideMediciones.py - Acumulados de precipitación a varias resoluciones, para
+#          agrupar y graficar series largas sin recorrerlas de nuevo
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import pandas as pd
+import numpy as np
+
+from Class_SerieRegular import ubicar_en_rejilla, paso_intervalo
+
+
+# =============================================================================================
+# Reducción de puntos
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def reducir_min_max(fechas, valores, max_puntos):
+    """
+    Reduce una serie a lo sumo max_puntos conservando su forma: se divide en
+    max_puntos / 2 tramos y de cada uno se toman el mínimo y el máximo, en su orden.
+    Los picos de lluvia no se pierden, como sí pasaría tomando un punto de cada tramo.
+
+    Returns:
+        Tupla (fechas, valores) reducidos; los mismos arreglos si ya caben.
+    """
+    n = len(valores)
+    if n <= max_puntos:
+        return fechas, valores
+
+    tramos = max(max_puntos // 2, 1)
+    inicios = np.unique(np.arange(tramos) * n // tramos)
+    conteos = np.diff(np.r_[inicios, n])
+    tramo = np.repeat(np.arange(len(inicios)), conteos)
+
+    # Primera posición del mínimo y del máximo de cada tramo (sin contar NaN), sin ordenar
+    indices = []
+    for reduccion in [np.fmin, np.fmax]:
+        extremos = np.repeat(reduccion.reduceat(valores, inicios), conteos)
+        candidatas = np.flatnonzero(valores == extremos)
+        _, primeras = np.unique(tramo[candidatas], return_index=True)
+        indices.append(candidatas[primeras])
+
+    seleccion = np.unique(np.concatenate(indices))
+    return fechas[seleccion], valores[seleccion]
+
+
+# =============================================================================================
+# Periodos de acumulación
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def claves_periodo(fechas, frecuencia):
+    """
+    Número entero del periodo (hora, día, semana, mes o año) de cada marca de tiempo, 
+    consecutivo entre periodos consecutivos. Las semanas terminan en domingo, como 'W' 
+    en pandas.
+    """
+    fechas = np.asarray(fechas, dtype='datetime64[ns]')
+    if frecuencia == 'W':
+        # 1970-01-01 fue jueves: +3 días lleva los lunes a múltiplos de 7
+        return (fechas.astype('datetime64[D]').astype(np.int64) + 3) // 7
+    unidad = {'h': 'h', 'D': 'D', 'ME': 'M', 'YE': 'Y'}[frecuencia]
+    return fechas.astype(f'datetime64[{unidad}]').astype(np.int64)
+
+# ---------------------------------------------------------------------------------------------
+def etiquetas_periodo(claves, frecuencia):
+    # Marca de tiempo con que pandas (pd.Grouper) identifica cada periodo: inicio de la hora
+    # o del día; domingo de la semana; último día del mes o del año
+    claves = np.asarray(claves, dtype=np.int64)
+    if frecuencia == 'W':
+        etiquetas = (7 * claves + 3).astype('datetime64[D]')
+    elif frecuencia in ['ME', 'YE']:
+        unidad = 'M' if frecuencia == 'ME' else 'Y'
+        etiquetas = (claves + 1).astype(f'datetime64[{unidad}]').astype('datetime64[D]') \
+            - np.timedelta64(1, 'D')
+    else:
+        etiquetas = claves.astype(f'datetime64[{frecuencia}]')
+    return etiquetas.astype('datetime64[ns]')
+
+# =============================================================================================
+# Acumulados por periodo
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+class PiramideMediciones:
+    """
+    Estadísticas de precipitación por hora, día, semana, mes y año, calculadas una vez 
+    sobre todas las mediciones (con las mediciones originales como nivel base). Cada 
+    nivel se acumula desde el anterior, así que solo el horario recorre las mediciones.
+    Cualquier frecuencia y ventana de fechas se responde luego con un corte de arreglos.
+
+    Cada nivel es denso: incluye los periodos sin mediciones (con acumulado 0), como 
+    agrupar_mediciones. Por periodo se guardan:
+        suma:      precipitación acumulada (las faltantes, NaN o <0, no suman)
+        conteo:    mediciones válidas
+        maximo:    mayor medición válida (NaN si no hay)
+        faltantes: mediciones esperadas según el intervalo que no hay o no son válidas
+                   (sin intervalo: solo las no válidas)
+
+    Para graficar una ventana se elige el nivel más detallado que no exceda un máximo de
+    puntos de origen y, si aún supera el ancho disponible, se reduce con mínimo/máximo 
+    por tramo.
+    """
+
+    # Niveles de menor a mayor periodo: nombre -> nivel desde el que se acumula
+    NIVELES = {'h': 'base', 'D': 'h', 'W': 'D', 'ME': 'D', 'YE': 'ME'}
+
+    # -----------------------------------------------------------------------------------------
+    def __init__(self, fechas, valores, intervalo=None):
+        fechas = np.asarray(fechas, dtype='datetime64[ns]')
+        valores = np.asarray(valores, dtype=float)
+        if (len(fechas) > 1) and (np.diff(fechas) < np.timedelta64(0)).any():
+            orden = np.argsort(fechas, kind='stable')
+            fechas, valores = fechas[orden], valores[orden]
+        self.intervalo = intervalo
+
+        # Nivel base: cada medición es su propio periodo (suma con los valores originales,
+        # para graficarlos tal cual)
+        validas = valores >= 0
+        self.niveles = {'base': {
+            'fechas':    fechas,
+            'suma':      valores,
+            'conteo':    validas.astype(np.int64),
+            'maximo':    np.where(validas, valores, np.nan),
+            'faltantes': (~validas).astype(np.int64),
+        }}
+        if len(fechas) == 0:
+            for nombre in self.NIVELES:
+                self.niveles[nombre] = \
+                    {clave: datos[:0] for clave, datos in self.niveles['base'].items()}
+            return
+
+        # Un solo recorrido de las mediciones (nivel horario); los demás desde el anterior.
+        # Con intervalo conocido, las faltantes por hora incluyen las posiciones sin medición
+        for nombre, origen in self.NIVELES.items():
+            nivel = self._acumular(self.niveles[origen], nombre)
+            if (nombre == 'h') and (intervalo is not None):
+                esperadas = self._esperadas(nivel['fechas'], fechas[0], fechas[-1])
+                nivel['faltantes'] = np.maximum(esperadas - nivel['conteo'], 0)
+            self.niveles[nombre] = nivel
+
+    # -----------------------------------------------------------------------------------------
+    def _acumular(self, origen, frecuencia):
+        # Un nivel a partir de otro más detallado: como las fechas están ordenadas, cada
+        # periodo es un tramo contiguo del origen y se reduce con reduceat
+        claves = claves_periodo(origen['fechas'], frecuencia)
+        inicios = np.r_[0, np.flatnonzero(np.diff(claves)) + 1]
+        posiciones = claves[inicios] - claves[0]
+        longitud = int(claves[-1] - claves[0]) + 1
+
+        nivel = {'fechas': etiquetas_periodo(claves[0] + np.arange(longitud), frecuencia)}
+        sumables = np.where(origen['suma'] > 0, origen['suma'], 0.0)
+        for estadistica, reduccion, vacio, datos in [
+            ('suma',      np.add,  0.0,    sumables),
+            ('conteo',    np.add,  0,      origen['conteo']),
+            ('maximo',    np.fmax, np.nan, origen['maximo']),
+            ('faltantes', np.add,  0,      origen['faltantes']),
+        ]:
+            denso = np.full(longitud, vacio, dtype=datos.dtype)
+            denso[posiciones] = reduccion.reduceat(datos, inicios)
+            nivel[estadistica] = denso
+        return nivel
+
+    # -----------------------------------------------------------------------------------------
+    def _esperadas(self, horas, primera, ultima):
+        # Posiciones de la rejilla regular entre primera y última medición en cada hora:
+        # las anteriores al fin de la hora menos las anteriores a su inicio
+        paso = paso_intervalo(self.intervalo).astype(np.int64)
+        total = (ultima - primera).astype(np.int64) // paso + 1
+        def anteriores(limites):
+            desfases = (limites - primera).astype(np.int64)
+            return np.clip(-(-desfases // paso), 0, total)
+        return anteriores(horas + np.timedelta64(1, 'h')) - anteriores(horas)
+
+    # -----------------------------------------------------------------------------------------
+    def _ventana(self, nombre, inicio, fin):
+        # Rango [desde, hasta) del nivel con los periodos que tocan [inicio, fin]
+        fechas = self.niveles[nombre]['fechas']
+        if (nombre == 'base') or (len(fechas) == 0):
+            desde = 0 if inicio is None else np.searchsorted(fechas, inicio, 'left')
+            hasta = len(fechas) if fin is None else np.searchsorted(fechas, fin, 'right')
+            return desde, hasta
+
+        # Niveles densos: la posición del periodo es su número menos el del primero
+        primero = claves_periodo(fechas[:1], nombre)[0]
+        desde = 0 if inicio is None else \
+            int(np.clip(claves_periodo([inicio], nombre)[0] - primero, 0, len(fechas)))
+        hasta = len(fechas) if fin is None else \
+            int(np.clip(claves_periodo([fin], nombre)[0] - primero + 1, 0, len(fechas)))
+        return desde, max(desde, hasta)
+
+    # -----------------------------------------------------------------------------------------
+    def agregados(self, frecuencia='D', inicio=None, fin=None):
+        """
+        Estadísticas por periodo de la frecuencia ('h', 'D', 'W', 'ME' o 'YE') en la 
+        ventana [inicio, fin] (None: toda la serie).
+
+        Returns:
+            DataFrame indexado por fechahora (etiquetas de pd.Grouper) con columnas suma,
+            conteo, maximo y faltantes.
+        """
+        if frecuencia not in self.NIVELES:
+            raise ValueError(f'Frecuencia sin acumulados: {frecuencia}')
+        columnas = ['suma', 'conteo', 'maximo', 'faltantes']
+        desde, hasta = self._ventana(frecuencia, _fecha(inicio), _fecha(fin))
+        nivel = self.niveles[frecuencia]
+        return pd.DataFrame(
+            {columna: nivel[columna][desde:hasta] for columna in columnas},
+            index=pd.DatetimeIndex(nivel['fechas'][desde:hasta], name='fechahora'),
+        )
+
+    # -----------------------------------------------------------------------------------------
+    def laminas_maximas(self, duraciones=(15, 30, 60), frecuencia='D', inicio=None,
+                        fin=None):
+        """
+        Mayor lámina precipitada en ventanas móviles de cada duración, por periodo de la 
+        frecuencia (p.ej. máximo de 15, 30 y 60 minutos de cada día).
+
+        Las mediciones se ubican en la rejilla regular del intervalo (las posiciones 
+        faltantes cuentan como 0) y la lámina de cada ventana es una diferencia de la suma
+        acumulada. Cada ventana se asigna al periodo en que inicia. Las duraciones se 
+        redondean a un número entero de intervalos.
+
+        Returns:
+            DataFrame indexado como agregados(), con una columna lamina_<duración>min (mm)
+            por duración.
+        """
+        if self.intervalo is None:
+            raise ValueError('Se requiere el intervalo entre mediciones')
+        if frecuencia not in self.NIVELES:
+            raise ValueError(f'Frecuencia sin acumulados: {frecuencia}')
+
+        df = self.agregados(frecuencia, inicio, fin)[[]]
+        desde, _ = self._ventana(frecuencia, _fecha(inicio), _fecha(fin))
+
+        # Suma acumulada sobre la rejilla y periodo de cada posición (relativo al primero)
+        acumulada, claves = np.zeros(1), np.zeros(0, dtype=np.int64)
+        fechas, valores = self.niveles['base']['fechas'], self.niveles['base']['suma']
+        if len(fechas) > 0:
+            primera, longitud, ocupadas, indices, _ = ubicar_en_rejilla(fechas, self.intervalo)
+            rejilla = np.zeros(longitud)
+            rejilla[ocupadas] = np.where(valores[indices] > 0, valores[indices], 0.0)
+            acumulada = np.r_[0.0, np.cumsum(rejilla)]
+            paso = paso_intervalo(self.intervalo)
+            claves = claves_periodo(primera + np.arange(longitud) * paso, frecuencia)
+            claves -= claves[0]
+        cortes = np.r_[0, np.flatnonzero(np.diff(claves)) + 1] if len(claves) > 0 else claves
+
+        for duracion in duraciones:
+            anchura = max(int(round(duracion / self.intervalo)), 1)
+            num_ventanas = len(acumulada) - anchura
+            maximos = np.full(len(self.niveles[frecuencia]['fechas']), np.nan)
+            if num_ventanas > 0:
+                laminas = acumulada[anchura:] - acumulada[:num_ventanas]
+                inicios = cortes[cortes < num_ventanas]
+                maximos[claves[inicios]] = np.maximum.reduceat(laminas, inicios)
+            df[f'lamina_{duracion:g}min'] = maximos[desde:desde + len(df)]
+
+        return df
+
+    # -----------------------------------------------------------------------------------------
+    def consultar(self, inicio=None, fin=None, max_puntos=1000, max_origen=200000, nivel=None):
+        """
+        Serie para graficar en la ventana [inicio, fin].
+
+        Args:
+            inicio, fin: Límites de la ventana (None: toda la serie).
+            max_puntos: Puntos a enviar al gráfico (p.ej. su ancho en pixeles).
+            max_origen: Máximo de puntos del nivel elegido dentro de la ventana.
+            nivel: 'base', 'h', 'D', 'W', 'ME' o 'YE'; None para elegirlo según la ventana.
+
+        Returns:
+            Tupla (DataFrame con columnas fechahora y precipitacion, nivel usado).
+        """
+        inicio, fin = _fecha(inicio), _fecha(fin)
+
+        # Candidatos en orden de detalle; la semana no, pues no encaja en meses ni años
+        candidatos = [nivel] if nivel is not None else \
+            [nombre for nombre in self.niveles if nombre != 'W']
+        for nombre in candidatos:
+            desde, hasta = self._ventana(nombre, inicio, fin)
+            if (hasta - desde <= max_origen) or (nombre == candidatos[-1]):
+                break
+
+        fechas, valores = reducir_min_max(
+            self.niveles[nombre]['fechas'][desde:hasta], 
+            self.niveles[nombre]['suma'][desde:hasta], 
+            max_puntos,
+        )
+        return pd.DataFrame({'fechahora': fechas, 'precipitacion': valores}), nombre
+
+
+# ---------------------------------------------------------------------------------------------
+def _fecha(fecha):
+    # Límite de ventana como datetime64[ns] (o None)
+    return None if fecha is None else np.datetime64(pd.Timestamp(fecha), 'ns')
@@ -16,26 +16,421 @@
 import pandas as pd
 import numpy as np
 import re
+import itertools
+import contextlib
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from Class_SerieRegular import SerieRegular, ubicar_en_rejilla, rellenar_huecos, paso_intervalo, \
+    ubicar_lagunas
+from Class_Instrumentacion import etapa
+from Class_PiramideMediciones import PiramideMediciones
+from Class_AnalisisIntervalos import AnalisisIntervalos
+from Class_TablasArrow import tabla_arrow
+from Class_ExportacionResultados import exportar_tablas
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    guess_datetime_format = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+# =============================================================================================
+# Constantes
+# =============================================================================================
+
+# Formatos de fecha-hora frecuentes en archivos de estaciones, probados si pandas no 
+# logra deducir uno que sirva para toda la muestra
+FORMATOS_FECHAHORA = [
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M',
+    '%Y/%m/%d %H:%M:%S', '%Y/%m/%d %H:%M', 
+    '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d-%m-%Y %H:%M:%S', '%d-%m-%Y %H:%M',
+    '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M',
+]
+
+# Valores usados por registradores para indicar medición faltante
+VALORES_CENTINELA = [-999, -9999, -99.9]
+
+# Paso (en % de duración) de la rejilla de porcentaje acumulado que se calcula para cada
+# aguacero; las curvas de Huff con intervalos múltiplos de este paso se toman de ella
+PASO_REJILLA_HUFF = 5
+
+# Número de dígitos de cada directiva en formatos numéricos de ancho fijo
+ANCHOS_FECHAHORA = {'%Y': 4, '%m': 2, '%d': 2, '%H': 2, '%M': 2, '%S': 2}
+
+
+# =============================================================================================
+# Conversión de fecha-hora
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def _convertir_fechahora_ancho_fijo(serie, formato):
+    # Convierte texto con formato numérico de ancho fijo (p.ej. '%d/%m/%Y %H:%M') leyendo 
+    # los dígitos de todas las filas a la vez como bytes. Retorna None si el formato o 
+    # algún valor no se ajusta, para que la conversión la haga pandas (y reporte el error).
+    # ISO 8601 (año-mes-día) se deja a pandas, que lo convierte más rápido
+    if (formato is None) or formato.startswith('%Y-%m-%d'):
+        return None
+
+    campos, literales, ancho = {}, [], 0
+    for token in re.findall(r'%.|.', formato):
+        if token in ANCHOS_FECHAHORA:
+            campos[token] = (ancho, ANCHOS_FECHAHORA[token])
+            ancho += ANCHOS_FECHAHORA[token]
+        elif token.startswith('%') or not token.isascii():
+            return None
+        else:
+            literales.append((ancho, ord(token)))
+            ancho += 1
+
+    # Un byte adicional para detectar textos más largos que el formato
+    try:
+        texto = np.array(serie.to_numpy(), dtype=f'S{ancho + 1}')
+    except (UnicodeEncodeError, ValueError, TypeError):
+        return None
+    caracteres = texto.view(np.uint8).reshape(len(texto), ancho + 1)
+    if (caracteres[:, ancho] != 0).any() or (caracteres[:, ancho - 1] == 0).any():
+        return None
+    for posicion, codigo in literales:
+        if (caracteres[:, posicion] != codigo).any():
+            return None
+
+    valores = {'%Y': 1970, '%m': 1, '%d': 1, '%H': 0, '%M': 0, '%S': 0}
+    for directiva, (posicion, digitos) in campos.items():
+        cifras = caracteres[:, posicion:posicion + digitos].astype(np.int64) - ord('0')
+        if ((cifras < 0) | (cifras > 9)).any():
+            return None
+        valores[directiva] = cifras @ (10 ** np.arange(digitos - 1, -1, -1))
+
+    Y, m, d = valores['%Y'], valores['%m'], valores['%d']
+    H, M, S = valores['%H'], valores['%M'], valores['%S']
+    if np.any((m < 1) | (m > 12) | (d < 1) | (H > 23) | (M > 59) | (S > 59)):
+        return None
+
+    # Días a partir del mes; un día inexistente (31 de abril) cae en el mes siguiente
+    meses = np.asarray((Y - 1970) * 12 + (m - 1)).astype('datetime64[M]')
+    dias = meses.astype('datetime64[D]') + np.asarray(d - 1).astype('timedelta64[D]')
+    if np.any(dias.astype('datetime64[M]') != meses):
+        return None
+
+    segundos = np.asarray(H * 3600 + M * 60 + S).astype('timedelta64[s]')
+    return pd.Series(
+        (dias.astype('datetime64[s]') + segundos).astype('datetime64[ns]'), 
+        index=serie.index,
+        name=serie.name,
+    )
+
+
+# ---------------------------------------------------------------------------------------------
+def _convertir_numeros(serie, centinelas=VALORES_CENTINELA, tipo='float64'):
+    # Convierte texto a número en una pasada sobre toda la columna: coma decimal, 
+    # separador de miles, vacíos y valores centinela. Los no convertibles quedan NaN.
+    # Retorna columna y conteo de valores reemplazados por NaN, según motivo
+    conteos = {'vacios': 0, 'no_numericos': 0, 'centinelas': 0}
+
+    if pd.api.types.is_numeric_dtype(serie.dtype):
+        valores = pd.to_numeric(serie)
+        conteos['vacios'] = int(valores.isna().sum())
+    else:
+        try:
+            # Vía rápida: cambiar comas por puntos en los bytes y convertir todo en C
+            texto = np.array(serie.to_numpy(), dtype='S')
+            caracteres = texto.view(np.uint8)
+            caracteres[caracteres == ord(',')] = ord('.')
+            valores = pd.Series(texto.astype('float64'), index=serie.index, name=serie.name)
+            conteos['vacios'] = int(valores.isna().sum())
+        except (ValueError, TypeError, UnicodeEncodeError):
+            # Hay vacíos, separador de miles o texto no numérico
+            valores = pd.to_numeric(serie.str.replace(',', '.', regex=False), errors='coerce')
+            fallidos = valores.isna() & serie.notna()
+            vacios = valores.isna() & ~fallidos
+            if fallidos.any():
+                # Con separador de miles: el último separador es el decimal
+                texto = serie[fallidos].str.strip()
+                vacios |= (texto == '').reindex(serie.index, fill_value=False)
+                texto = texto.str.replace(r'[.,](?=\d{3}[.,])', '', regex=True)
+                valores[fallidos] = pd.to_numeric(
+                    texto.str.replace(',', '.', regex=False), errors='coerce'
+                )
+            conteos['vacios'] = int(vacios.sum())
+            conteos['no_numericos'] = int(valores.isna().sum()) - conteos['vacios']
+
+    centinela = np.isin(valores.to_numpy(), centinelas)
+    if centinela.any():
+        conteos['centinelas'] = int(centinela.sum())
+        valores = valores.mask(centinela)
+
+    return valores.astype(tipo, copy=False), conteos
+
+
+# =============================================================================================
+# Segmentación de mediciones en secuencias con lluvia / sin lluvia
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def _recorrer_secuencias(valores):
+    # Un recorrido por las mediciones: inicio, número de valores no faltantes y suma de 
+    # cada secuencia de mediciones con lluvia (!= 0, incluye NaN) o sin lluvia.
+    # La suma es compensada (Kahan), igual a la de groupby de pandas: con una suma simple
+    # 0.1 + ... da 0.9999999999999999 y un aguacero justo en intensidad_minima se descarta
+    n = len(valores)
+    inicios = np.empty(n, dtype=np.int64)
+    conteos = np.empty(n, dtype=np.int64)
+    sumas = np.empty(n, dtype=np.float64)
+    compensacion = 0.0
+    k = -1
+    humedo_previo = False
+    for i in range(n):
+        valor = valores[i]
+        humedo = valor != 0
+        if (i == 0) or (humedo != humedo_previo):
+            k += 1
+            inicios[k] = i
+            conteos[k] = 0
+            sumas[k] = 0.0
+            compensacion = 0.0
+            humedo_previo = humedo
+        if not np.isnan(valor):
+            conteos[k] += 1
+            y = valor - compensacion
+            t = sumas[k] + y
+            compensacion = t - sumas[k] - y
+            if np.isnan(compensacion):
+                compensacion = 0.0 # Valores infinitos
+            sumas[k] = t
+    return inicios[:k + 1], conteos[:k + 1], sumas[:k + 1]
+
+# Versión compilada si numba está instalado
+_recorrer_secuencias_compilado = \
+    numba.njit(cache=True, nogil=True)(_recorrer_secuencias) if numba is not None else None
+
+# ---------------------------------------------------------------------------------------------
+def _segmentar_secuencias(valores):
+    """
+    Divide las mediciones en secuencias consecutivas con lluvia o sin lluvia.
+
+    Args:
+        valores: Arreglo float de precipitación (NaN para faltantes).
+
+    Returns:
+        Tupla de arreglos (inicio de cada secuencia, conteo de valores no faltantes, suma).
+    """
+    if _recorrer_secuencias_compilado is not None:
+        return _recorrer_secuencias_compilado(valores)
+
+    # Sin numba: cambios de estado con lluvia / sin lluvia, y sumas por tramo
+    humedo = valores != 0
+    inicios = np.flatnonzero(np.r_[len(valores) > 0, humedo[1:] != humedo[:-1]])
+    if len(inicios) == 0:
+        return inicios, np.empty(0, dtype=np.int64), np.empty(0)
+    validos = ~np.isnan(valores)
+    conteos = np.add.reduceat(validos.astype(np.int64), inicios)
+    return inicios, conteos, _sumar_segmentos(valores, inicios)
+
+# ---------------------------------------------------------------------------------------------
+def _sumar_segmentos(valores, inicios):
+    # Suma de cada tramo [inicios[i], inicios[i + 1]) sin contar NaN, compensada (Kahan)
+    # como la de groupby de pandas, que es la que se usa para agrupar
+    if len(inicios) == 0:
+        return np.empty(0)
+    grupos = np.repeat(np.arange(len(inicios)), np.diff(np.r_[inicios, len(valores)]))
+    return pd.Series(valores).groupby(grupos).sum().to_numpy()
+
+
+# =============================================================================================
+# Operaciones por segmentos sobre arreglos planos
+# Cada segmento i ocupa valores[desplazamientos[i]:desplazamientos[i + 1]]
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def _indices_segmentos(inicios, conteos):
+    # Índices para extraer segmentos [inicio, inicio + conteo) en un solo arreglo contiguo
+    desplazamientos = np.r_[0, np.cumsum(conteos)].astype(np.int64)
+    indices = \
+        np.repeat(inicios - desplazamientos[:-1], conteos) + np.arange(desplazamientos[-1])
+    return indices, desplazamientos
+
+# ---------------------------------------------------------------------------------------------
+def _acumular_segmentos(valores, desplazamientos, factor=100, limite_corto=256):
+    # Suma acumulada de cada segmento, normalizada por su total.
+    # Los segmentos cortos se recorren por posición (todos a la vez), de modo que las 
+    # sumas se hacen en el mismo orden que una suma acumulada por cada lista; los pocos
+    # segmentos largos se acumulan uno por uno
+    conteos = np.diff(desplazamientos)
+    acumulado = np.empty(len(valores))
+    totales = np.empty(len(conteos))
+
+    for i in np.flatnonzero(conteos > limite_corto):
+        inicio, fin = desplazamientos[i], desplazamientos[i + 1]
+        acumulado[inicio:fin] = np.cumsum(valores[inicio:fin])
+        totales[i] = acumulado[fin - 1]
+
+    cortos = np.flatnonzero(conteos <= limite_corto)
+    orden = cortos[np.argsort(-conteos[cortos], kind='stable')]
+    inicios = desplazamientos[:-1][orden]
+    conteos_descendentes = -conteos[orden]
+    suma = np.zeros(len(orden))
+    for posicion in range(-conteos_descendentes[0] if len(orden) > 0 else 0):
+        activos = np.searchsorted(conteos_descendentes, -posicion, side='left')
+        indices = inicios[:activos] + posicion
+        suma[:activos] += valores[indices]
+        acumulado[indices] = suma[:activos]
+    totales[orden] = suma
+
+    return acumulado * factor / np.repeat(totales, conteos)
+
+# ---------------------------------------------------------------------------------------------
+def _percentiles_segmentos(valores, desplazamientos, percentiles):
+    # Equivalente a np.percentile (interpolación lineal) aplicado a cada segmento.
+    # Los segmentos deben estar ordenados; si no lo están se ordenan todos a la vez
+    conteos = np.diff(desplazamientos)
+    segmento = np.repeat(np.arange(len(conteos)), conteos)
+    if np.any(np.diff(valores)[np.diff(segmento) == 0] < 0):
+        valores = valores[np.lexsort((valores, segmento))]
+
+    # Índice virtual, vecinos e interpolación calculados igual que en np.percentile
+    q = np.asarray(percentiles) / 100
+    n = conteos[:, None]
+    indice_virtual = (n - 1) * q
+    inferior = np.clip(np.floor(indice_virtual), 0, n - 1).astype(np.int64)
+    superior = np.minimum(inferior + 1, n - 1)
+    gamma = indice_virtual - inferior
+
+    base = desplazamientos[:-1, None]
+    a = valores[base + inferior]
+    b = valores[base + superior]
+    return np.where(gamma >= 0.5, b - (b - a) * (1 - gamma), a + (b - a) * gamma)
+
+# ---------------------------------------------------------------------------------------------
+def _clasificar_cuartil_huff(Q):
+    # Misma regla de determinar_cuartil_huff, para una matriz de cuartiles (n x 3)
+    deltas = np.column_stack([
+        Q[:, 0],
+        Q[:, 1] - Q[:, 0],
+        Q[:, 2] - Q[:, 1],
+        100 - Q[:, 2],
+    ])
+    return np.array(['Q1', 'Q2', 'Q3', 'Q4'])[np.argmax(deltas, axis=1)]
+
+# ---------------------------------------------------------------------------------------------
+def _dividir_segmentos(valores, desplazamientos):
+    # Serie de objetos con una vista (no copia) de cada segmento
+    segmentos = np.empty(len(desplazamientos) - 1, dtype=object)
+    for i in range(len(segmentos)):
+        segmentos[i] = valores[desplazamientos[i]:desplazamientos[i + 1]]
+    return segmentos
+
+
+# =============================================================================================
+# Arreglos en memoria compartida, para procesos que trabajan sobre los mismos eventos
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def _publicar_arreglos(arreglos):
+    # Copia cada arreglo a un bloque de memoria compartida. Retorna los bloques (para 
+    # liberarlos al terminar) y un descriptor liviano que los procesos usan para abrirlos
+    bloques, descriptor = [], {}
+    for nombre, arreglo in arreglos.items():
+        bloque = shared_memory.SharedMemory(create=True, size=max(arreglo.nbytes, 1))
+        np.ndarray(arreglo.shape, dtype=arreglo.dtype, buffer=bloque.buf)[:] = arreglo
+        bloques.append(bloque)
+        descriptor[nombre] = (bloque.name, arreglo.shape, arreglo.dtype.str)
+    return bloques, descriptor
+
+# ---------------------------------------------------------------------------------------------
+def _abrir_arreglos(descriptor):
+    # Arreglos sobre los bloques compartidos, sin copiar su contenido
+    bloques, arreglos = [], {}
+    for nombre, (nombre_bloque, forma, tipo) in descriptor.items():
+        bloque = shared_memory.SharedMemory(name=nombre_bloque)
+        bloques.append(bloque)
+        arreglos[nombre] = np.ndarray(forma, dtype=tipo, buffer=bloque.buf)
+    return bloques, arreglos
+
+# ---------------------------------------------------------------------------------------------
+def _barrer_pausa(descriptor, parametros, pausa_maxima, combinaciones, intervalo_huff):
+    # Evalúa en un proceso las combinaciones de criterios que comparten pausa_maxima; 
+    # los eventos se consolidan una sola vez y cada combinación es solo un filtro
+    bloques, arreglos = _abrir_arreglos(descriptor)
+    try:
+        datos = Precipitaciones()
+        datos.intervalo_mediciones = parametros['intervalo_mediciones']
+        datos.primera_fecha        = parametros['primera_fecha']
+        datos.ultima_fecha         = parametros['ultima_fecha']
+        datos.valores_eventos      = arreglos.pop('valores_eventos')
+        datos.df_eventos           = pd.DataFrame(arreglos, copy=False)
+        datos.pausa_maxima         = pausa_maxima
+
+        filas = []
+        for combinacion in combinaciones:
+            for criterio, valor in combinacion.items():
+                setattr(datos, criterio, valor)
+            datos.detectar_aguaceros()
+            filas.extend(datos._resumir_aguaceros(combinacion, intervalo_huff))
+        return filas
+    finally:
+        datos = arreglos = None
+        for bloque in bloques:
+            bloque.close()
 
 
 # ---------------------------------------------------------------------------------------------
 class Precipitaciones:
 
     # -----------------------------------------------------------------------------------------
-    def __init__(self):
-        self.nombre    = None # Nombre de archivo de lecturas
-        self.df_origen = None # Dataframe con contenido de archivo
+    def __init__(self, cache=None, instrumentacion=None):
+        self.nombre     = None # Nombre de archivo de lecturas
+        self.df_origen  = None # Dataframe con contenido de archivo (o muestra, si es por partes)
+        self.archivo_io = None # Archivo pendiente de lectura por partes (None si se leyó todo)
+
+        # Cache en disco opcional (CacheMediciones) y huella del contenido del archivo
+        self.cache  = cache
+        self.huella = None
+
+        # Medición opcional (Instrumentacion) de tiempo, memoria y filas de cada etapa
+        self.instrumentacion = instrumentacion
+
+        # Columnas fecha-hora ya convertidas y formatos deducidos, por (archivo, columna)
+        self._cache_fechahora    = {}
+        self._formatos_fechahora = {}
         self.inicializa_lecturas()
 
     # -----------------------------------------------------------------------------------------
     def inicializa_lecturas(self):
         self.df_mediciones        = None # Mediciones individuales según columnas seleccionadas
+        self.serie_compacta       = None # Mediciones compactadas (SerieRegular), opcional
         self.df_eventos           = None # Eventos de precipitación con inicio y fin
         self.df_aguaceros         = None # Aguaceros detectados segpun criterios especificados
 
+        # Mediciones en arreglos contiguos (estilo CSR): valores planos + desplazamientos
+        self.valores_eventos           = None # Valores de precipitación de todos los eventos
+        self.mediciones_aguaceros      = None # Mediciones de aguaceros, concatenadas
+        self.porcentajes_aguaceros     = None # Porcentaje acumulado de aguaceros, concatenado
+        self.desplazamientos_aguaceros = None # Inicio de cada aguacero en arreglos planos
+        self.rejilla_huff              = None # % acumulado de aguaceros cada PASO_REJILLA_HUFF %
+
+        # Aguaceros candidatos ya consolidados, por valor de pausa_maxima. Los demás 
+        # criterios (duración, intensidad, fechas) se aplican como filtros sobre ellos
+        self._cache_candidatos = {}
+
         self.col_fechahora        = None # Columna elegida para marca de tiempo
         self.col_precipitacion    = None # Columna elegida para valor de medida
         self.intervalo_mediciones = None # Intervalo en minutos entre medidas
+        self.valor_relleno        = None # Valor con que se rellenaron faltantes (None: sin relleno)
+        self.opciones_relleno     = None # Interpolación y política fuera de rejilla del relleno
+        self.reporte_relleno      = None # Conteo de duplicadas, fuera de rejilla, rellenas...
+        self.lagunas_relleno      = None # Lagunas (arreglos_lagunas) antes de rellenar faltantes
+        self.intervalo_remuestreo = None # Intervalo común si se remuestreó (None: sin remuestreo)
+
+        # Valores de precipitación reemplazados por faltante (NaN) al convertir, por motivo
+        self.conversion_precipitacion = {'vacios': 0, 'no_numericos': 0, 'centinelas': 0}
 
         # Criterios de aguacero por defecto
         self.duracion_minima   = 15
@@ -47,80 +442,291 @@ class Precipitaciones:
         self.ultima_fecha      = None
 
     # -----------------------------------------------------------------------------------------
-    def obtener_lecturas(self, archivo_io):
+    # Mediciones como DataFrame; si están compactadas se construye al consultarlo
+    @property
+    def df_mediciones(self):
+        if self.serie_compacta is not None:
+            return self.serie_compacta.a_dataframe(self.col_fechahora, self.col_precipitacion)
+        return self._df_mediciones
+
+    @df_mediciones.setter
+    def df_mediciones(self, df):
+        self._df_mediciones = df
+        self.serie_compacta = None
+        self.olvidar_resultados()
+
+    # -----------------------------------------------------------------------------------------
+    def _memorizado(self, clave, calcular):
+        # Resultado ya calculado para clave (se calcula la primera vez). El primer elemento
+        # de la clave es el grupo: 'mediciones' o 'aguaceros', según de qué depende
+        if clave not in self._memoria:
+            self._memoria[clave] = calcular()
+        return self._memoria[clave]
+
+    # -----------------------------------------------------------------------------------------
+    def olvidar_resultados(self, grupo=None):
+        """
+        Descarta resultados memorizados del grupo indicado ('mediciones' o 'aguaceros'),
+        o todos. Se llama al cambiar mediciones, columnas, relleno o criterios de
+        aguacero; así cada nueva ejecución de una página de Streamlit reutiliza intervalo,
+        lagunas, rango de fechas, agrupaciones y curvas sin volver a recorrer la serie.
+        """
+        if grupo is None:
+            self._memoria = {}
+        else:
+            self._memoria = {k: v for k, v in self._memoria.items() if k[0] != grupo}
+
+    # -----------------------------------------------------------------------------------------
+    @property
+    def tiene_mediciones(self):
+        return (self.serie_compacta is not None) or (self._df_mediciones is not None)
+
+    # -----------------------------------------------------------------------------------------
+    def rango_mediciones(self):
+        # Primera y última marca de tiempo de las mediciones
+        return self._memorizado(('mediciones', 'rango'), self._rango_mediciones)
+
+    def _rango_mediciones(self):
+        if self.serie_compacta is not None:
+            return self.serie_compacta.rango_fechas()
+        fechas = self._df_mediciones[self.col_fechahora]
+        return fechas.min(), fechas.max()
+
+    # -----------------------------------------------------------------------------------------
+    def _contar_mediciones(self):
+        # Número de mediciones (posiciones, si están compactadas), sin construir DataFrame
+        if self.serie_compacta is not None:
+            return len(self.serie_compacta)
+        return 0 if self._df_mediciones is None else self._df_mediciones.shape[0]
+
+    # -----------------------------------------------------------------------------------------
+    def medir(self, nombre):
+        # Contexto para medir una etapa externa (p.ej. una gráfica) con la instrumentación
+        if self.instrumentacion is None:
+            return contextlib.nullcontext({})
+        return self.instrumentacion.medir(nombre, archivo=self.nombre)
+
+    # -----------------------------------------------------------------------------------------
+    def _valores_mediciones(self):
+        # Precipitación de todas las mediciones como arreglo float, sin construir DataFrame
+        if self.serie_compacta is not None:
+            faltantes = self.serie_compacta.faltantes
+            return self.serie_compacta.valores[~faltantes].astype(float)
+        return self._df_mediciones[self.col_precipitacion].to_numpy(dtype=float)
+
+    # -----------------------------------------------------------------------------------------
+    def _fechas_mediciones(self, indices):
+        # Marcas de tiempo de las mediciones indicadas (por número de fila)
+        if self.serie_compacta is not None:
+            faltantes = self.serie_compacta.faltantes
+            if faltantes.any():
+                indices = np.flatnonzero(~faltantes)[indices]
+            return self.serie_compacta.fechas(indices)
+        return self._df_mediciones[self.col_fechahora].to_numpy()[indices]
+
+    # -----------------------------------------------------------------------------------------
+    @etapa('compactar', filas=lambda datos, _: datos._contar_mediciones())
+    def compactar_mediciones(self, tipo='float32', escala=0.1, fuera_rejilla='ajustar'):
+        """
+        Reemplaza df_mediciones por una SerieRegular: marca de tiempo inicial, intervalo
+        y valores float32 (o int16 escalado) con máscara de faltantes.
+
+        df_mediciones sigue disponible, pero se construye cada vez que se consulta; 
+        lagunas, relleno, intervalo y rango de fechas se calculan sobre la serie compacta.
+        Con 'int16' los valores múltiplos de escala se recuperan exactos; con 'float32' 
+        difieren en la séptima cifra, lo que puede cambiar el cuartil de Huff de aguaceros 
+        que están justo en el límite entre dos cuartiles.
+
+        Args:
+            tipo: 'float32', o 'int16' para guardar enteros escalados.
+            escala: Resolución de los valores cuando tipo es 'int16' (p.ej. 0.1 mm).
+            fuera_rejilla: 'ajustar' o 'descartar' mediciones que no caen en la rejilla.
+
+        Returns:
+            True si se compactaron las mediciones.
+        """
+        if self.serie_compacta is not None:
+            return True
+        if (self._df_mediciones is None) or (self._df_mediciones.shape[0] == 0):
+            return False
+        if (self.intervalo_mediciones is None) and not self.estimar_intervalo_mediciones():
+            return False
+
+        serie = SerieRegular.desde_mediciones(
+            self._df_mediciones[self.col_fechahora].to_numpy(),
+            self._df_mediciones[self.col_precipitacion].to_numpy(),
+            self.intervalo_mediciones,
+            tipo=tipo,
+            escala=escala,
+            fuera_rejilla=fuera_rejilla,
+        )
+        self.df_mediciones  = None
+        self.serie_compacta = serie
+        return True
+
+    # -----------------------------------------------------------------------------------------
+    @etapa('lectura', filas='df_origen')
+    def obtener_lecturas(self, archivo_io, por_partes=False, filas_muestra=1000):
         self.inicializa_lecturas()
+        self.archivo_io = None
+        self._cache_fechahora    = {}
+        self._formatos_fechahora = {}
+
+        # Si el contenido ya fue procesado antes, basta con leer una muestra
+        self.huella = None
+        if (self.cache is not None) and self.cache.habilitada:
+            self.huella = self.cache.calcular_huella(archivo_io)
+            por_partes = por_partes or self.cache.contiene(self.huella)
 
         # TODO: Deteccion de encoding
         try:
-            self.df_origen = pd.read_csv(archivo_io)
+            if por_partes:
+                # Leer solo encabezado y una muestra; las columnas elegidas se leen 
+                # por partes al asignarlas, sin cargar el resto del archivo en memoria
+                self.df_origen = pd.read_csv(archivo_io, nrows=filas_muestra)
+                self.archivo_io = archivo_io
+            else:
+                self.df_origen = pd.read_csv(archivo_io)
             self.nombre = archivo_io.name
         except:
             self.df_origen = None
+            self.archivo_io = None
 
     # -----------------------------------------------------------------------------------------
-    # Retorna True si obtuvo columna, False si no la obtuvo
-    def _obtener_columna_fechahora(self, nombre_columna):
-
-        # ------------------------------------------------------------------------------------
-        def extraer(mensaje_error):
-            buscar_fechas_fallidas = re.findall(r'\"(.*?)\"', mensaje_error)
-            if len(buscar_fechas_fallidas) > 0:
-                fecha_fallida = buscar_fechas_fallidas[0]
-                position = re.findall(r'position (\d+)', mensaje_error)[0]
-                return fecha_fallida, int(position)
-            else:
-                return mensaje_error, 0
+    # Retorna columna convertida y mensaje de error (vacío si la obtuvo).
+    # Si se especifica serie, se convierte esta en lugar de la columna de df_origen
+    @etapa('fecha-hora', filas=lambda datos, r: len(r[0]) if r[0] is not None else 0)
+    def _obtener_columna_fechahora(self, nombre_columna, serie=None):
 
         if nombre_columna is None:
             return None, 'Nombre vacío'
         if nombre_columna not in self.df_origen.columns:
             return None, 'Columna inexistente'
-        tipo_columna = self.df_origen[nombre_columna].dtype
+
+        # Columna completa ya convertida en una selección previa
+        clave = (self.nombre, nombre_columna)
+        if (serie is None) and (clave in self._cache_fechahora):
+            return self._cache_fechahora[clave], ''
+
+        guardar = (serie is None) and (self.archivo_io is None)
+        if serie is None:
+            serie = self.df_origen[nombre_columna]
+        tipo_columna = serie.dtype
         if tipo_columna not in  ['object', 'datetime64']:
             return None, f'Tipo {tipo_columna} no compatible con fecha-hora'
 
-        try:
-            columna = pd.to_datetime(self.df_origen[nombre_columna])
-            return columna, ''
-        except ValueError as ve:
-            val, pos = extraer(str(ve))
-            return None, f'{val} en registro {pos}'
-        except Exception as e:
-            return None, str(e)
+        # Deducir formatos posibles una vez por columna (con la muestra, si es por partes)
+        if clave not in self._formatos_fechahora:
+            self._formatos_fechahora[clave] = \
+                self._deducir_formatos_fechahora(self.df_origen[nombre_columna])
+
+        # Usar el primer formato que convierta toda la serie; si uno falla, se descarta 
+        # (p.ej. mes/día cuando aparece un día mayor que 12)
+        formatos = self._formatos_fechahora[clave]
+        primer_error = None
+        for i, formato in enumerate(formatos):
+            columna = _convertir_fechahora_ancho_fijo(serie, formato)
+            if columna is not None:
+                self._formatos_fechahora[clave] = formatos[i:]
+                break
+            try:
+                columna = pd.to_datetime(serie, format=formato, errors='coerce')
+            except Exception as e:
+                return None, str(e)
+
+            # Valores que no se pudieron convertir (los vacíos se mantienen como NaT)
+            fallidas = columna.isna()
+            if fallidas.any():
+                fallidas &= serie.notna()
+            if not fallidas.any():
+                self._formatos_fechahora[clave] = formatos[i:]
+                break
+            if primer_error is None:
+                indice = fallidas.idxmax()
+                primer_error = f'{serie[indice]} en registro {indice}'
+        else:
+            return None, primer_error
+
+        if guardar:
+            self._cache_fechahora[clave] = columna
+        return columna, ''
+
+    # -----------------------------------------------------------------------------------------
+    # Retorna formatos que convierten toda la muestra, [None] para que pandas lo deduzca
+    def _deducir_formatos_fechahora(self, serie, tamaño_muestra=200):
+        # Muestra repartida a lo largo de la serie, no solo las primeras filas
+        if len(serie) == 0:
+            return [None]
+        posiciones = np.unique(np.linspace(0, len(serie) - 1, tamaño_muestra).astype(int))
+        muestra = serie.iloc[posiciones].dropna().astype(str)
+        if len(muestra) == 0:
+            return [None]
+
+        candidatos = list(FORMATOS_FECHAHORA)
+        if guess_datetime_format is not None:
+            candidatos.insert(0, guess_datetime_format(muestra.iloc[0]))
+
+        formatos = []
+        for formato in candidatos:
+            if (formato is None) or (formato in formatos):
+                continue
+            convertidas = pd.to_datetime(muestra, format=formato, errors='coerce')
+            if convertidas.notna().all():
+                formatos.append(formato)
+
+        return formatos if len(formatos) > 0 else [None]
 
     # -----------------------------------------------------------------------------------------
-    # Retorna True si obtuvo columna, False si no la obtuvo
-    def _obtener_columna_precipitacion(self, nombre_columna):
+    # Retorna columna convertida, None si no la obtuvo.
+    # Si se especifica serie, se convierte esta en lugar de la columna de df_origen
+    def _obtener_columna_precipitacion(self, nombre_columna, serie=None):
 
         if nombre_columna is None:
             return None
         if nombre_columna not in self.df_origen.columns:
             return None
-        tipo_columna = self.df_origen[nombre_columna].dtype
-        if tipo_columna == 'object':
-            try:
-                columna = self.df_origen[nombre_columna].apply(
-                    lambda x: float(x.replace(',', '.'))
-                )
-                return columna
-            except:
-                return None
-        else:
-            try:
-                columna = pd.to_numeric(self.df_origen[nombre_columna])
-                return columna
-            except ValueError:
-                return None
-        
+        if serie is None:
+            serie = self.df_origen[nombre_columna]
+        try:
+            columna, conteos = _convertir_numeros(serie)
+        except (ValueError, TypeError, AttributeError):
+            return None
+
+        # Columna sin ningún valor numérico: no es de precipitación
+        if (conteos['no_numericos'] > 0) and columna.isna().all():
+            return None
+
+        for motivo, conteo in conteos.items():
+            self.conversion_precipitacion[motivo] += conteo
+
+        return columna
+
     # -----------------------------------------------------------------------------------------
+    @etapa('columnas', filas=lambda datos, _: datos._contar_mediciones())
     def asignar_columnas_seleccionadas(self, col_fechahora, col_precipitacion):
         self.inicializa_lecturas()
 
-        fechashoras, msg  = self._obtener_columna_fechahora(col_fechahora)
-        precipitaciones = self._obtener_columna_precipitacion(col_precipitacion)
+        # Mediciones ya convertidas en una sesión anterior
+        self.col_fechahora = col_fechahora
+        self.col_precipitacion = col_precipitacion
+        df, metadatos = self._cargar_cache('mediciones')
+        if df is not None:
+            self.df_mediciones = df
+            self.conversion_precipitacion.update(metadatos)
+            return True, None
+        self.col_fechahora = None
+        self.col_precipitacion = None
+
+        if self.archivo_io is not None:
+            fechashoras, precipitaciones, msg = \
+                self._leer_columnas_por_partes(col_fechahora, col_precipitacion)
+        else:
+            fechashoras, msg  = self._obtener_columna_fechahora(col_fechahora)
+            msg = f'columna fecha-hora: {msg}'
+            precipitaciones = self._obtener_columna_precipitacion(col_precipitacion)
 
         if (fechashoras is None):
-            return False, f'columna fecha-hora: {msg}'
+            return False, msg
         
         if (precipitaciones is None):
             return False, 'columna de precipitación'
@@ -130,31 +736,202 @@ class Precipitaciones:
         self.df_mediciones = pd.DataFrame(
             {col_fechahora : fechashoras, col_precipitacion : precipitaciones}
         )
+        self._guardar_cache('mediciones', self.df_mediciones, self.conversion_precipitacion)
 
         return True, None
 
     # -----------------------------------------------------------------------------------------
+    def _opciones_cache(self, tipo):
+        # Opciones de procesamiento de las que depende cada tabla guardada en cache
+        opciones = (self.col_fechahora, self.col_precipitacion)
+        if tipo != 'mediciones':
+            opciones += (self.valor_relleno, self.opciones_relleno, self.intervalo_mediciones,
+                         self.intervalo_remuestreo)
+            if self.serie_compacta is not None:
+                # Valores guardados como float32 o int16 a cierta escala: otros eventos
+                opciones += ('compacta', self.serie_compacta.tipo, self.serie_compacta.escala)
+        return opciones
+
+    # -----------------------------------------------------------------------------------------
+    def _cargar_cache(self, tipo):
+        if (self.cache is None) or (self.huella is None):
+            return None, None
+        return self.cache.cargar(self.huella, tipo, self._opciones_cache(tipo))
+
+    # -----------------------------------------------------------------------------------------
+    def _guardar_cache(self, tipo, df, metadatos=None):
+        if (self.cache is None) or (self.huella is None):
+            return
+        self.cache.guardar(df, self.huella, tipo, self._opciones_cache(tipo), metadatos)
+
+    # -----------------------------------------------------------------------------------------
+    def _leer_columnas_por_partes(self, col_fechahora, col_precipitacion, filas_por_bloque=500000):
+        """
+        Lee del archivo solo las columnas elegidas, por bloques de filas.
+
+        Cada bloque se convierte a fecha-hora y número antes de leer el siguiente, de modo 
+        que la memoria requerida es proporcional a las dos columnas numéricas resultantes 
+        y no al contenido completo del archivo.
+
+        Args:
+            col_fechahora: Columna con marca de tiempo.
+            col_precipitacion: Columna con valor de medida.
+            filas_por_bloque: Número de filas leídas en cada bloque.
+
+        Returns:
+            Tupla (fechas-horas, precipitaciones, mensaje de error); None en la columna fallida
+            (en ambas si el archivo no se pudo leer).
+        """
+
+        # Validar columnas con la muestra leída al cargar el archivo
+        _, msg = self._obtener_columna_fechahora(col_fechahora)
+        if msg:
+            return None, None, f'columna fecha-hora: {msg}'
+        muestra_precipitacion = self._obtener_columna_precipitacion(col_precipitacion)
+        if muestra_precipitacion is None:
+            return pd.Series(dtype='datetime64[ns]'), None, 'columna de precipitación'
+        self.conversion_precipitacion = dict.fromkeys(self.conversion_precipitacion, 0)
+
+        # Si la fecha-hora ya se convirtió en una selección previa, leer solo precipitación
+        clave = (self.nombre, col_fechahora)
+        fechas_previas = self._cache_fechahora.get(clave)
+        columnas = [col_precipitacion]
+        if fechas_previas is None:
+            columnas.insert(0, col_fechahora)
+
+        # Ambas columnas como texto: la muestra no garantiza que la precipitación sea 
+        # numérica en todo el archivo (coma decimal o texto después de la fila 1000); cada
+        # bloque se convierte con _convertir_numeros, como la columna completa
+        tipos = {col_fechahora: str, col_precipitacion: str}
+
+        if hasattr(self.archivo_io, 'seek'):
+            self.archivo_io.seek(0)
+
+        formatos = self._formatos_fechahora.get(clave)
+        fechas, valores = [], []
+        try:
+            bloques = pd.read_csv(
+                self.archivo_io, 
+                usecols=columnas, 
+                dtype={columna: tipos[columna] for columna in columnas}, 
+                chunksize=filas_por_bloque,
+            )
+            for bloque in bloques:
+                if fechas_previas is None:
+                    columna, msg = \
+                        self._obtener_columna_fechahora(col_fechahora, bloque[col_fechahora])
+                    if columna is None:
+                        return None, None, f'columna fecha-hora: {msg}'
+                    # Si el bloque descartó el formato usado en bloques anteriores, 
+                    # estos pudieron quedar mal interpretados: leer de nuevo
+                    if self._formatos_fechahora[clave] is not formatos:
+                        if formatos[0] != self._formatos_fechahora[clave][0]:
+                            bloques.close()
+                            return self._leer_columnas_por_partes(
+                                col_fechahora, col_precipitacion, filas_por_bloque
+                            )
+                        formatos = self._formatos_fechahora[clave]
+                    fechas.append(columna.to_numpy())
+
+                columna, conteos = _convertir_numeros(bloque[col_precipitacion])
+                for motivo, conteo in conteos.items():
+                    self.conversion_precipitacion[motivo] += conteo
+                valores.append(columna.to_numpy(dtype=float))
+        except ValueError as e:
+            # Error de lectura del archivo (formato, codificación, columnas), no de la 
+            # conversión de precipitación, que no falla: los no convertibles quedan NaN
+            return None, None, f'lectura del archivo: {e}'
+
+        if len(valores) == 0:
+            return None, None, 'Archivo sin mediciones'
+
+        # Columna sin ningún valor numérico en todo el archivo: no es de precipitación
+        valores = np.concatenate(valores)
+        if (self.conversion_precipitacion['no_numericos'] > 0) and np.isnan(valores).all():
+            return pd.Series(dtype='datetime64[ns]'), None, 'columna de precipitación'
+
+        if fechas_previas is None:
+            fechas_previas = pd.Series(np.concatenate(fechas))
+            self._cache_fechahora[clave] = fechas_previas
+
+        return fechas_previas, pd.Series(valores), ''
+
+    # -----------------------------------------------------------------------------------------
+    @etapa('agrupación', filas=lambda datos, r: len(r) if r is not None else 0)
     def agrupar_mediciones(self, df=None, frecuencia="D"):
         if (self.col_fechahora is None) or (self.col_precipitacion is None):
             return None
         
-        if df is None:
-            df = self.df_mediciones
-        
         frecuencias_validas = ['min', 'h', 'D', 'W', 'ME', 'YE'] 
         if frecuencia not in frecuencias_validas:
             frecuencia = 'D'
 
+        # Desde hora hasta año: corte de los acumulados ya calculados
+        if (df is None) and (frecuencia in PiramideMediciones.NIVELES):
+            df = self.piramide_mediciones().agregados(frecuencia)[['suma']]
+            return df.rename_axis(self.col_fechahora) \
+                .rename(columns={'suma': self.col_precipitacion})
+
+        if df is None:
+            return self._memorizado(
+                ('mediciones', 'agrupacion', frecuencia),
+                lambda: self._agrupar(self.df_mediciones, frecuencia),
+            ).copy()
+        return self._agrupar(df, frecuencia)
+
+    def _agrupar(self, df, frecuencia):
         agrupacion = pd.Grouper(key=self.col_fechahora, freq=frecuencia)
         funcion_agregacion = {self.col_precipitacion: 'sum'}  
         return df.groupby(agrupacion).agg(funcion_agregacion)
         
     # -----------------------------------------------------------------------------------------
+    def piramide_mediciones(self):
+        """
+        Acumulados, conteos, máximos y faltantes por hora, día, semana, mes y año 
+        (PiramideMediciones), calculados una vez por mediciones e intervalo; de ellos salen
+        agrupar_mediciones, el gráfico de series largas y las láminas máximas.
+        """
+        def calcular():
+            valores = self._valores_mediciones()
+            return PiramideMediciones(
+                self._fechas_mediciones(np.arange(len(valores))), valores,
+                intervalo=self.intervalo_mediciones,
+            )
+        return self._memorizado(
+            ('mediciones', 'piramide', self.intervalo_mediciones), calcular
+        )
+
+    # -----------------------------------------------------------------------------------------
+    def laminas_maximas(self, duraciones=(15, 30, 60), frecuencia='D'):
+        # Mayor lámina en ventanas móviles de cada duración (minutos) por periodo
+        if self.intervalo_mediciones is None:
+            return None
+        return self._memorizado(
+            ('mediciones', 'laminas', self.intervalo_mediciones, tuple(duraciones), frecuencia),
+            lambda: self.piramide_mediciones().laminas_maximas(duraciones, frecuencia),
+        ).copy()
+
+    # -----------------------------------------------------------------------------------------
+    @etapa('intervalo', filas=lambda datos, _: datos._contar_mediciones())
     def estimar_intervalo_mediciones(self):
+        # Mientras no cambien las mediciones se reutiliza el intervalo ya estimado
+        clave = ('mediciones', 'intervalo')
+        if clave not in self._memoria:
+            self._estimar_intervalo()
+            self._memoria[clave] = self.intervalo_mediciones
+        self.intervalo_mediciones = self._memoria[clave]
+        return self.intervalo_mediciones is not None
+
+    def _estimar_intervalo(self):
         # Iniciar asumiendo que no hay intervalo válido
         self.intervalo_mediciones = None
 
-        if self.df_mediciones is None:
+        # La serie compacta ya está sobre una rejilla de intervalo conocido
+        if self.serie_compacta is not None:
+            self.intervalo_mediciones = self.serie_compacta.intervalo
+            return True
+
+        if self._df_mediciones is None:
             return False
         
         es_intervalo_detectable = \
@@ -165,17 +942,9 @@ class Precipitaciones:
         if not es_intervalo_detectable:
             return False
         
-        # Intenta calcular intervalo con la moda de los delta_t entre los primeros registros
-        try:
-            s_delta_t = pd.to_timedelta(
-                self.df_mediciones[self.col_fechahora].head(1000).diff().fillna(0)
-            )
-            intervalo = s_delta_t.mode()[0]
-            detectado = intervalo.total_seconds() / 60
-        except:
-            return False
-
-        if detectado <= 0:
+        # Delta más frecuente entre mediciones consecutivas de toda la serie
+        detectado = self.analizar_intervalos().intervalo
+        if (detectado is None) or (detectado <= 0):
             return False
 
         self.intervalo_mediciones = detectado
@@ -183,77 +952,196 @@ class Precipitaciones:
         return True
 
     # -----------------------------------------------------------------------------------------
+    @etapa('análisis de intervalos', filas=lambda datos, _: datos._contar_mediciones())
+    def analizar_intervalos(self):
+        """
+        Histograma de deltas, tramos con intervalo distinto, duplicadas, desorden y 
+        marcas fuera de rejilla de todas las mediciones (AnalisisIntervalos).
+        """
+        def calcular():
+            serie = self.serie_compacta
+            if serie is not None:
+                fechas = serie.fechas(np.flatnonzero(~serie.faltantes))
+            else:
+                fechas = self._df_mediciones[self.col_fechahora].to_numpy()
+            return AnalisisIntervalos(fechas)
+        if not self.tiene_mediciones:
+            return None
+        return self._memorizado(('mediciones', 'analisis_intervalos'), calcular)
+
+    # -----------------------------------------------------------------------------------------
+    @etapa('remuestreo', filas=lambda datos, _: datos._contar_mediciones())
+    def remuestrear_mediciones(self, intervalo=None):
+        """
+        Lleva mediciones con tramos de intervalo distinto a una rejilla común, sumando las
+        de cada periodo (AnalisisIntervalos.remuestrear). Por defecto, al mayor intervalo
+        de los tramos. Luego se estiman de nuevo intervalo y lagunas.
+        """
+        # La serie compacta ya es regular
+        if self.serie_compacta is not None:
+            return
+
+        analisis = self.analizar_intervalos()
+        fechas, valores = analisis.remuestrear(
+            self._df_mediciones[self.col_fechahora].to_numpy(),
+            self._df_mediciones[self.col_precipitacion].to_numpy(dtype=float),
+            intervalo,
+        )
+        self.intervalo_remuestreo = \
+            float(analisis.df_segmentos['intervalo'].max()) if intervalo is None else intervalo
+        self.df_mediciones = pd.DataFrame({
+            self.col_fechahora     : fechas,
+            self.col_precipitacion : valores,
+        })
+
+    # -----------------------------------------------------------------------------------------
+    @etapa('lagunas', filas=lambda datos, r: r[0])
     def detectar_lagunas(self):
-        # Asumir valores <0 como mediciones faltantes
-        df_tmp = self.df_mediciones[self.df_mediciones[self.col_precipitacion] >= 0].copy()
+        num_lagunas, df_lagunas = self._memorizado(
+            ('mediciones', 'lagunas', self.intervalo_mediciones), self._detectar_lagunas
+        )
+        return num_lagunas, None if df_lagunas is None else df_lagunas.copy()
 
-        delta = pd.Timedelta(minutes=self.intervalo_mediciones)
-        vacios = df_tmp[self.col_fechahora].diff() > delta
-        vacios_indices = df_tmp.loc[vacios, self.col_fechahora]
-        
-        num_lagunas = len(vacios_indices)
+    def _detectar_lagunas(self):
+        lagunas = self.arreglos_lagunas()
+        num_lagunas = len(lagunas['inicia'])
         if num_lagunas <= 0:
             return 0, None
-        
-        inicia  = df_tmp.loc[vacios.shift(-1, fill_value=False), self.col_fechahora].tolist()
-        termina = df_tmp.loc[vacios, self.col_fechahora].tolist()
-        df_lagunas = pd.DataFrame({
-            'inicia'  : inicia, 
-            'termina' : termina,
-        })
-        df_lagunas['duracion'] = \
-            (df_lagunas['termina'] - df_lagunas['inicia']).dt.total_seconds() // 60
+        return num_lagunas, pd.DataFrame(lagunas)[
+            ['inicia', 'termina', 'duracion', 'faltantes', 'humeda']
+        ]
 
-        return num_lagunas, df_lagunas
+    # -----------------------------------------------------------------------------------------
+    def arreglos_lagunas(self):
+        # Inicio, fin, faltantes, duración y si llovía en sus bordes de cada laguna, como
+        # arreglos NumPy (ubicar_lagunas); <0 y NaN se asumen mediciones faltantes
+        def calcular():
+            if self.serie_compacta is not None:
+                fechas, valores = self.serie_compacta.fechas(), self.serie_compacta.valores
+            else:
+                fechas = self._df_mediciones[self.col_fechahora].to_numpy()
+                valores = self._df_mediciones[self.col_precipitacion].to_numpy(dtype=float)
+            return ubicar_lagunas(fechas, valores, self.intervalo_mediciones)
+        return self._memorizado(
+            ('mediciones', 'arreglos_lagunas', self.intervalo_mediciones), calcular
+        )
 
     # -----------------------------------------------------------------------------------------
-    def rellenar_faltantes(self, valor_relleno=0):
-        # Asumir valores <0 como mediciones faltantes
-        self.df_mediciones = self.df_mediciones[self.df_mediciones[self.col_precipitacion] >= 0]
+    @etapa('reporte de lagunas', filas=lambda datos, r: r['lagunas'] if r else 0)
+    def reporte_lagunas(self, frecuencia='ME'):
+        """
+        Estadísticas de calidad de la serie a partir de las lagunas y de los acumulados
+        por periodo (piramide_mediciones), sin recorrer de nuevo las mediciones.
+
+        Args:
+            frecuencia: Periodo de la tabla de completitud ('D', 'W', 'ME' o 'YE').
+
+        Returns:
+            Diccionario con número de lagunas, posiciones faltantes, laguna más larga 
+            (minutos y fecha de inicio), lagunas húmedas (con lluvia en sus bordes), 
+            completitud de toda la serie (fracción de posiciones con medición válida) y
+            df_completitud: mediciones, faltantes y completitud por periodo. None si no
+            hay intervalo estimado.
+        """
+        if self.intervalo_mediciones is None:
+            return None
+
+        lagunas = self.arreglos_lagunas()
+        df = self.piramide_mediciones().agregados(frecuencia)[['conteo', 'faltantes']]
+        esperadas = df['conteo'] + df['faltantes']
+        df['completitud'] = df['conteo'] / esperadas.where(esperadas > 0)
+
+        num_lagunas = len(lagunas['duracion'])
+        mas_larga = int(np.argmax(lagunas['duracion'])) if num_lagunas > 0 else None
+        total = esperadas.sum()
+        return {
+            'lagunas'          : num_lagunas,
+            'faltantes'        : int(df['faltantes'].sum()),
+            'laguna_mas_larga' : 0.0 if mas_larga is None else float(lagunas['duracion'][mas_larga]),
+            'inicia_mas_larga' : None if mas_larga is None else lagunas['inicia'][mas_larga],
+            'lagunas_humedas'  : int(lagunas['humeda'].sum()),
+            'completitud'      : float(df['conteo'].sum() / total) if total > 0 else np.nan,
+            'df_completitud'   : df,
+        }
+
+    # -----------------------------------------------------------------------------------------
+    @etapa('relleno', filas=lambda datos, _: datos._contar_mediciones())
+    def rellenar_faltantes(self, valor_relleno=0, max_interpolar=0, fuera_rejilla='ajustar'):
+        """
+        Completa la serie sobre una rejilla regular con el intervalo de mediciones.
+
+        Cada medición se ubica por su posición entera en la rejilla y se copia a un 
+        arreglo ya reservado (sin concatenar ni ordenar). Duplicadas y marcas fuera de 
+        rejilla quedan contadas en reporte_relleno.
+
+        Args:
+            valor_relleno: Valor para posiciones faltantes (0, o np.nan para dejarlas vacías).
+            max_interpolar: Huecos de hasta este número de posiciones se interpolan 
+                linealmente en lugar de usar valor_relleno (0: no interpolar).
+            fuera_rejilla: 'ajustar' a la posición más cercana o 'descartar' las 
+                mediciones que no caen exactas en la rejilla. Con serie compacta la 
+                política es la que se usó al compactar.
+        """
+        self.valor_relleno = valor_relleno
+        self.opciones_relleno = (max_interpolar, fuera_rejilla)
+        self.lagunas_relleno = self.arreglos_lagunas()
+
+        # Serie compacta: las posiciones faltantes ya existen, basta con asignarlas
+        if self.serie_compacta is not None:
+            self.reporte_relleno = {
+                **self.serie_compacta.reporte, 
+                **self.serie_compacta.rellenar(valor_relleno, max_interpolar),
+            }
+            self.olvidar_resultados()
+            return
 
-        rango_completo = pd.date_range(
-            start=self.df_mediciones[self.col_fechahora].min(), 
-            end=self.df_mediciones[self.col_fechahora].max(), 
-            freq=f'{self.intervalo_mediciones}min'
+        df, metadatos = self._cargar_cache('rellenas')
+        if df is not None:
+            self.df_mediciones = df
+            self.reporte_relleno = metadatos
+            return
+
+        # Asumir valores <0 como mediciones faltantes
+        valores = self.df_mediciones[self.col_precipitacion].to_numpy(dtype=float)
+        validas = valores >= 0
+        inicio, longitud, posiciones, seleccion, reporte = ubicar_en_rejilla(
+            self.df_mediciones[self.col_fechahora].to_numpy()[validas],
+            self.intervalo_mediciones,
+            fuera_rejilla,
         )
-        timestamps_faltantes = rango_completo.difference(self.df_mediciones[self.col_fechahora])
-        df_faltantes = pd.DataFrame(timestamps_faltantes, columns=[self.col_fechahora])
 
-        df_faltantes[self.col_precipitacion] = valor_relleno
-        self.df_mediciones = \
-            pd.concat([self.df_mediciones, df_faltantes]).sort_values(by=self.col_fechahora)
+        completos = np.full(longitud, np.nan)
+        completos[posiciones] = valores[validas][seleccion]
+        faltantes = np.ones(longitud, dtype=bool)
+        faltantes[posiciones] = False
+        reporte.update(rellenar_huecos(completos, faltantes, valor_relleno, max_interpolar))
 
-        self.df_mediciones.reset_index(drop=True, inplace=True)
+        self.df_mediciones = pd.DataFrame({
+            self.col_fechahora     : 
+                inicio + np.arange(longitud) * paso_intervalo(self.intervalo_mediciones),
+            self.col_precipitacion : completos,
+        })
+        self.reporte_relleno = reporte
+        self._guardar_cache('rellenas', self.df_mediciones, reporte)
 
         return
     
     # -----------------------------------------------------------------------------------------
+    @etapa('eventos', filas='df_eventos')
     def calcular_eventos_precipitacion(self):
         if self.intervalo_mediciones is None:
             self.df_eventos = None
             return
-        
-        self.df_eventos = self.df_mediciones.copy()
-
-        # Crear una columna adicional para marcar los cambios de 0 a otro valor y viceversa
-        self.df_eventos['cambio'] = \
-            (self.df_eventos[self.col_precipitacion] != 0) != \
-            (self.df_eventos[self.col_precipitacion] != 0).shift(1)
-        self.df_eventos['grupo'] = self.df_eventos['cambio'].cumsum()
-
-        # Realizar la agregación basada en el grupo
-        self.df_eventos = self.df_eventos.groupby('grupo').agg(
-            inicia                  = (self.col_fechahora, 'first'),
-            termina                 = (self.col_fechahora, 'last'),
-            conteo                  = (self.col_precipitacion, 'count'),
-            precipitacion_acumulada = (self.col_precipitacion, 'sum'),
-            mediciones              = (self.col_precipitacion, lambda p: p.tolist()),
-        ).reset_index(drop=True)
 
-        # Agregar coiumna de duracion
-        self.df_eventos['duracion'] = self.intervalo_mediciones + \
-            (self.df_eventos['termina'] - self.df_eventos['inicia']).dt.total_seconds() // 60
-        
+        # Las mediciones de cada evento no se copian en listas: se guarda el arreglo 
+        # contiguo de valores y la posición donde inicia cada evento dentro de él
+        self.valores_eventos = self._valores_mediciones()
+        self.df_eventos, _ = self._cargar_cache('eventos')
+        if self.df_eventos is None:
+            self._segmentar_eventos(self.valores_eventos)
+            self._guardar_cache('eventos', self.df_eventos)
+        self._cache_candidatos = {}
+
         # Estimar duracion tope e inicializar maxima en ese mismo valor
         # Diferente de la maxima: "maxima" define el criterio de deteccion,
         # "tope" estima el valor tope que puede tomar la duracion con los datos.
@@ -267,33 +1155,229 @@ class Precipitaciones:
         self.duracion_maxima = self.duracion_tope
 
     # -----------------------------------------------------------------------------------------
+    def _segmentar_eventos(self, valores):
+        # Eventos: secuencias consecutivas de mediciones con lluvia o sin lluvia
+        inicios, conteos, sumas = _segmentar_secuencias(valores)
+        finales = np.r_[inicios[1:], len(valores)] - 1
+
+        self.df_eventos = pd.DataFrame({
+            'inicia'                  : self._fechas_mediciones(inicios),
+            'termina'                 : self._fechas_mediciones(finales),
+            'conteo'                  : conteos,
+            'precipitacion_acumulada' : sumas,
+            'posicion'                : inicios, # Inicio en el arreglo contiguo de mediciones
+        })
+
+        # Agregar coiumna de duracion
+        self.df_eventos['duracion'] = self.intervalo_mediciones + \
+            (self.df_eventos['termina'] - self.df_eventos['inicia']).dt.total_seconds() // 60
+
+    # -----------------------------------------------------------------------------------------
+    @etapa('aguaceros', filas='df_aguaceros')
     def detectar_aguaceros(self):
+        # Aguaceros candidatos para la pausa máxima elegida (se recalculan solo si cambia)
+        df, mediciones, porcentajes, desplazamientos, rejilla = \
+            self._obtener_candidatos(self.pausa_maxima)
+
+        # Filtrar por rango de fechas, duración e intensidad: solo mascaras sobre candidatos
+        seleccion = (
+            (df['termina'] >= pd.to_datetime(self.primera_fecha))   & \
+            (df['termina'] <= pd.to_datetime(self.ultima_fecha))    & \
+            (df['duracion'] >= self.duracion_minima)                & \
+            (df['duracion'] <= self.duracion_maxima)                & \
+            (df['intensidad'] >= self.intensidad_minima)
+        ).to_numpy()
+        df = df[seleccion].reset_index(drop=True)
+
+        # Extraer mediciones y porcentajes de los aguaceros seleccionados
+        indices, desplazamientos = _indices_segmentos(
+            desplazamientos[:-1][seleccion], np.diff(desplazamientos)[seleccion]
+        )
+        mediciones  = mediciones[indices]
+        porcentajes = porcentajes[indices]
+
+        # Listas por aguacero como vistas sobre los arreglos planos, sin copiar valores
+        df['mediciones'] = _dividir_segmentos(mediciones, desplazamientos)
+        df['porcentaje_acumulado'] = _dividir_segmentos(porcentajes, desplazamientos)
 
-        # -------------------------------------------------------------------------------------
-        def calcular_acumulados(lista_mediciones, factor=100):
-            return  \
-                (pd.Series(lista_mediciones).cumsum() * factor \
-                 / sum(lista_mediciones)).to_list()
+        self.mediciones_aguaceros      = mediciones
+        self.porcentajes_aguaceros     = porcentajes
+        self.desplazamientos_aguaceros = desplazamientos
+        self.rejilla_huff              = rejilla[seleccion]
+
+        # Reordenar columnas
+        self.olvidar_resultados('aguaceros')
+        self.df_aguaceros = df[[
+            'inicia', 'termina', 'duracion', 
+            'intensidad', 'precipitacion_acumulada', 'conteo', 
+            'mediciones', 'porcentaje_acumulado', 'Q_Huff',
+        ]]
+
+    # -----------------------------------------------------------------------------------------
+    def tabla_aguaceros(self, listas=True):
+        """
+        df_aguaceros como tabla Arrow: mediciones y porcentaje_acumulado son columnas de
+        listas nativas construidas sobre los arreglos planos de aguaceros, así que la
+        tabla se muestra o se descarga sin convertir un objeto por fila. Se construye una
+        vez por aguaceros detectados; con listas=False se omiten esas columnas.
+        """
+        if self.df_aguaceros is None:
+            return None
+
+        def calcular():
+            listas = {
+                'mediciones'           : self.mediciones_aguaceros,
+                'porcentaje_acumulado' : self.porcentajes_aguaceros,
+            }
+            return tabla_arrow(
+                self.df_aguaceros.drop(columns=list(listas)),
+                {nombre: (valores, self.desplazamientos_aguaceros)
+                 for nombre, valores in listas.items()},
+                orden=self.df_aguaceros.columns,
+            )
+        tabla = self._memorizado(('aguaceros', 'tabla_arrow'), calcular)
+        return tabla if listas else tabla.drop_columns(['mediciones', 'porcentaje_acumulado'])
+
+    # -----------------------------------------------------------------------------------------
+    def detalle_aguacero(self, indice):
+        # Mediciones y porcentaje acumulado de un aguacero (fila de df_aguaceros), desde
+        # los arreglos planos, con los minutos transcurridos al final de cada medición
+        desde, hasta = self.desplazamientos_aguaceros[indice:indice + 2]
+        return pd.DataFrame({
+            'minuto'               : self.intervalo_mediciones * np.arange(1, hasta - desde + 1),
+            'medicion'             : self.mediciones_aguaceros[desde:hasta],
+            'porcentaje_acumulado' : self.porcentajes_aguaceros[desde:hasta],
+        })
+
+    # -----------------------------------------------------------------------------------------
+    def parametros_ejecucion(self, intervalo_huff=None):
+        # Archivo, columnas, intervalo, relleno y criterios con que se obtuvieron los
+        # resultados, para acompañarlos al exportarlos
+        return {
+            'archivo'                  : self.nombre,
+            'col_fechahora'            : self.col_fechahora,
+            'col_precipitacion'        : self.col_precipitacion,
+            'intervalo_mediciones'     : self.intervalo_mediciones,
+            'intervalo_remuestreo'     : self.intervalo_remuestreo,
+            'valor_relleno'            : self.valor_relleno,
+            'opciones_relleno'         : self.opciones_relleno,
+            'reporte_relleno'          : self.reporte_relleno,
+            'conversion_precipitacion' : self.conversion_precipitacion,
+            'primera_fecha'            : self.primera_fecha,
+            'ultima_fecha'             : self.ultima_fecha,
+            'duracion_minima'          : self.duracion_minima,
+            'duracion_maxima'          : self.duracion_maxima,
+            'pausa_maxima'             : self.pausa_maxima,
+            'intensidad_minima'        : self.intensidad_minima,
+            'intervalo_huff'           : intervalo_huff,
+            'huella_aguaceros'         : 
+                None if self.df_aguaceros is None else self.huella_aguaceros(),
+        }
+
+    # -----------------------------------------------------------------------------------------
+    def exportar_resultados(self, directorio, formatos=('parquet',), prefijo=None, 
+                            intervalo_huff=10, filas_por_bloque=100_000):
+        """
+        Escribe los resultados para usarlos sin volver a detectar aguaceros:
+
+            <prefijo>_aguaceros:            catálogo (una fila por aguacero) con la
+                                            posición de sus mediciones (desplazamiento)
+            <prefijo>_mediciones_aguaceros: mediciones y porcentaje acumulado de todos los
+                                            aguaceros, concatenados (arreglos planos)
+            <prefijo>_curvas_huff:          curva media por cuartil (columnas P0..P100)
+            <prefijo>_lagunas:              lagunas de la serie antes de rellenarla
+            <prefijo>_parametros.json:      columnas, intervalo, relleno y criterios
+
+        Args:
+            directorio: Directorio de salida.
+            formatos: 'parquet', 'csv' y/o 'netcdf' (un solo .nc con todo).
+            prefijo: Inicio de los nombres (por defecto, el nombre del archivo leído).
+            intervalo_huff: Paso en % de los percentiles de las curvas de Huff.
+            filas_por_bloque: Filas escritas por bloque.
+
+        Returns:
+            Lista de rutas escritas.
+        """
+        if self.df_aguaceros is None:
+            raise ValueError('No hay aguaceros detectados para exportar')
+        if prefijo is None:
+            prefijo = os.path.splitext(os.path.basename(self.nombre or 'hyetiascan'))[0]
+
+        desplazamientos = self.desplazamientos_aguaceros
+        catalogo = self.tabla_aguaceros(listas=False)
+        catalogo = catalogo.append_column('desplazamiento', [desplazamientos[:-1]])
+
+        curvas = self.calcular_curvas_huff(intervalo=intervalo_huff)
+        percentiles = range(0, 101, intervalo_huff)
+        df_curvas = pd.DataFrame(
+            curvas['valores_percentiles'].tolist(), columns=[f'P{p}' for p in percentiles]
+        )
+        df_curvas.insert(0, 'Q', curvas['Q'].to_numpy())
+
+        lagunas = self.lagunas_relleno
+        if lagunas is None:
+            lagunas = self.arreglos_lagunas()
+
+        tablas = {
+            'aguaceros'            : catalogo,
+            'mediciones_aguaceros' : {
+                'aguacero'             : np.repeat(
+                    np.arange(len(desplazamientos) - 1), np.diff(desplazamientos)
+                ),
+                'mediciones'           : self.mediciones_aguaceros,
+                'porcentaje_acumulado' : self.porcentajes_aguaceros,
+            },
+            'curvas_huff'          : df_curvas,
+            'lagunas'              : lagunas,
+        }
+        return exportar_tablas(
+            tablas, self.parametros_ejecucion(intervalo_huff), directorio, prefijo, 
+            formatos, filas_por_bloque,
+        )
+
+    # -----------------------------------------------------------------------------------------
+    def _obtener_candidatos(self, pausa_maxima):
+        """
+        Consolida eventos en aguaceros candidatos según la pausa máxima.
+
+        Calcula duración, intensidad, porcentaje acumulado, rejilla de Huff y cuartil de 
+        Huff de todas las secuencias con lluvia. Solo depende de df_eventos y de pausa_maxima, por lo que
+        el resultado se guarda para reutilizarlo mientras cambien los demás criterios.
+
+        Args:
+            pausa_maxima: Duracion máxima de una pausa entre eventos de lluvia.
+
+        Returns:
+            Tupla (DataFrame de candidatos, mediciones, porcentajes, desplazamientos, 
+            rejilla de Huff).
+        """
+        if pausa_maxima in self._cache_candidatos:
+            return self._cache_candidatos[pausa_maxima]
 
         # Consolidar eventos que se consideren contiguos
         df = self._unir_precipitaciones(
-            self.df_eventos.copy(),
-            self.pausa_maxima,
+            self.df_eventos[['precipitacion_acumulada', 'duracion']].copy(),
+            pausa_maxima,
         )
 
+        # Ubicar primer y último evento de cada secuencia, sin agrupar listas de mediciones
+        secuencia = df['secuencia'].to_numpy()
+        primeros  = np.flatnonzero(np.r_[True, secuencia[1:] != secuencia[:-1]])
+        ultimos   = np.r_[primeros[1:], len(secuencia)] - 1
+        posicion  = self.df_eventos['posicion'].to_numpy()[primeros]
+
         # Realizar la agregación basada en la secuencia de evento
-        df = df.groupby('secuencia').agg(
-            inicia                  = ('inicia', 'first'),
-            termina                 = ('termina', 'last'),
-            mediciones              = ('mediciones', lambda p: sum(p, [])),
-            precipitacion_acumulada = ('precipitacion_acumulada', 'sum'),
-        )
+        df = pd.DataFrame({
+            'inicia'                  : self.df_eventos['inicia'].to_numpy()[primeros],
+            'termina'                 : self.df_eventos['termina'].to_numpy()[ultimos],
+            'precipitacion_acumulada' : 
+                _sumar_segmentos(df['precipitacion_acumulada'].to_numpy(), primeros),
+            'posicion'                : posicion,
+            'conteo'                  : np.diff(np.r_[posicion, len(self.valores_eventos)]),
+        })
 
-        # Filtrar por rango de fechas deseadas
-        df = df.loc[
-            (df['termina'] >= pd.to_datetime(self.primera_fecha)) & \
-            (df['termina'] <= pd.to_datetime(self.ultima_fecha))
-        ]
+        # Solo secuencias con lluvia pueden ser aguaceros
+        df = df[df['precipitacion_acumulada'] != 0].reset_index(drop=True)
 
         # Recalcular columna de duracion
         df['duracion'] = \
@@ -303,35 +1387,29 @@ class Precipitaciones:
         # Agregar intensidad
         df['intensidad'] = \
             60 * df['precipitacion_acumulada'] / df['duracion']
-        
-        # Agregar conteo de mediciones
-        df['conteo'] = df['mediciones'].apply(len)
-
-        # Filtrar precipitaciones por duración
-        df = df[
-            (df['duracion'] >= self.duracion_minima) & \
-            (df['duracion'] <= self.duracion_maxima) & \
-            (df['precipitacion_acumulada'] != 0)
-        ]
 
-        # Filtrar por intensidad minima
-        df = df[(df['intensidad'] >= self.intensidad_minima)]
+        # Extraer mediciones en un solo arreglo y calcular porcentaje acumulado
+        indices, desplazamientos = \
+            _indices_segmentos(df['posicion'].to_numpy(), df['conteo'].to_numpy())
+        mediciones  = self.valores_eventos[indices]
+        porcentajes = _acumular_segmentos(mediciones, desplazamientos, factor=100)
 
-        # Calcular y agregar porcentaje acumulado de mediciones
-        df['porcentaje_acumulado'] = df['mediciones'].apply(calcular_acumulados)
+        # Porcentaje acumulado en una rejilla fija de duración (percentiles de cada 
+        # aguacero), de la que se toman cuartil de Huff y curvas de Huff
+        rejilla = _percentiles_segmentos(
+            porcentajes, desplazamientos, np.arange(0, 101, PASO_REJILLA_HUFF)
+        )
+        df['Q_Huff'] = _clasificar_cuartil_huff(
+            rejilla[:, [25 // PASO_REJILLA_HUFF, 50 // PASO_REJILLA_HUFF, 75 // PASO_REJILLA_HUFF]]
+        )
 
-        # Calcular y agregar cuartil de Huff
-        df['Q_Huff'] = \
-            df['porcentaje_acumulado'].apply(self.determinar_cuartil_huff)
-        
-        # Reordenar columnas
-        df = df[[
-            'inicia', 'termina', 'duracion', 
-            'intensidad', 'precipitacion_acumulada', 'conteo', 
-            'mediciones', 'porcentaje_acumulado', 'Q_Huff',
-        ]]
+        # Conservar pocas combinaciones: cada una ocupa tanto como las mediciones con lluvia
+        if len(self._cache_candidatos) >= 4:
+            self._cache_candidatos.pop(next(iter(self._cache_candidatos)))
+        self._cache_candidatos[pausa_maxima] = \
+            (df, mediciones, porcentajes, desplazamientos, rejilla)
 
-        self.df_aguaceros = df.reset_index(drop=True)
+        return self._cache_candidatos[pausa_maxima]
 
     # -----------------------------------------------------------------------------------------
     def _unir_precipitaciones(self, df, pausa_maxima):
@@ -386,26 +1464,147 @@ class Precipitaciones:
         return Qname
 
     # ---------------------------------------------------------------------------------------------
+    def huella_aguaceros(self):
+        """
+        Huella del contenido de los aguaceros detectados y de los criterios con que se
+        detectaron. Identifica resultados derivados de ellos (p.ej. gráficas) aunque
+        provengan de otra sesión con el mismo archivo y criterios.
+        """
+        def calcular():
+            columnas = [c for c in self.df_aguaceros.columns
+                        if c not in ['mediciones', 'porcentaje_acumulado']]
+            huella = hashlib.blake2b(digest_size=16)
+            huella.update(
+                pd.util.hash_pandas_object(self.df_aguaceros[columnas], index=False).to_numpy()
+            )
+            if self.porcentajes_aguaceros is not None:
+                huella.update(np.ascontiguousarray(self.porcentajes_aguaceros))
+            return huella.hexdigest()
+
+        criterios = (
+            self.nombre, self.col_precipitacion, self.primera_fecha, self.ultima_fecha,
+            self.duracion_minima, self.duracion_maxima, self.pausa_maxima, 
+            self.intensidad_minima,
+        )
+        return self._memorizado(('aguaceros', 'huella'), calcular) + \
+            hashlib.blake2b(repr(criterios).encode(), digest_size=8).hexdigest()
+
+    # ---------------------------------------------------------------------------------------------
+    @etapa('curvas de Huff', filas='df_aguaceros')
     def calcular_curvas_huff(self, intervalo=5):
-        datos_huff = pd.DataFrame()
+        # Percentiles de porcentaje_acumulado de cada aguacero, según intervalo especificado
+        # (se reutilizan mientras no se vuelvan a detectar aguaceros)
+        return self._memorizado(
+            ('aguaceros', 'curvas_huff', intervalo), lambda: self._calcular_curvas_huff(intervalo)
+        ).copy()
+
+    def _calcular_curvas_huff(self, intervalo):
+        # Si el intervalo es múltiplo del paso de la rejilla ya calculada, se toman de ella
+        percentiles = np.arange(intervalo, 101, intervalo)
+        if (self.rejilla_huff is not None) and (intervalo % PASO_REJILLA_HUFF == 0):
+            valores_percentiles = self.rejilla_huff[:, percentiles // PASO_REJILLA_HUFF]
+        else:
+            valores_percentiles = _percentiles_segmentos(
+                self.porcentajes_aguaceros, self.desplazamientos_aguaceros, percentiles
+            )
 
-        # Generar percentiles a partir de porcentaje_acumulado de aguaceros
-        # Usar intervalo especificado como argumento de la función
-        datos_huff['valores_percentiles'] = self.df_aguaceros['porcentaje_acumulado'].apply(
-            lambda p: np.percentile(p, range(intervalo, 101, intervalo))
-        )
+        # Agrupar aguaceros por cuartil (orden estable) y promediar cada percentil
+        Q = self.df_aguaceros['Q_Huff'].to_numpy()
+        orden = np.argsort(Q, kind='stable')
+        cuartiles, primeros = np.unique(Q[orden], return_index=True)
+        grupos = np.split(valores_percentiles[orden], primeros[1:]) if len(Q) > 0 else []
+
+        # Agregar un cero al principio de cada curva
+        return pd.DataFrame({
+            'Q'                   : cuartiles,
+            'valores_percentiles' : [
+                [0] + list(np.ascontiguousarray(grupo.T).mean(axis=1)) for grupo in grupos
+            ],
+        })
 
-        # Determinar cuartil de cada curva
-        datos_huff['Q'] = self.df_aguaceros['Q_Huff']
+    # ---------------------------------------------------------------------------------------------
+    def barrer_criterios(self, rejilla, procesos=None, intervalo_huff=10):
+        """
+        Detecta aguaceros para todas las combinaciones de criterios de una rejilla.
 
-        # Calcular curvas Huff como promedio de cada correspondiente valor de valores_percentiles
-        curvas_huff = datos_huff.groupby('Q').agg(
-            {'valores_percentiles': lambda x: np.mean(list(zip(*x)), axis=1)}
-        ).reset_index()
+        Los eventos ya calculados se publican una vez en memoria compartida y las 
+        combinaciones se reparten entre procesos agrupadas por pausa_maxima, de modo que 
+        la consolidación de eventos se hace una vez por valor de pausa.
 
-        # Agregar un cero al principio de cada lista en 'valores_percentiles'
-        curvas_huff['valores_percentiles'] = curvas_huff['valores_percentiles'].apply(
-            lambda x: [0] + list(x)
-        )
+        Args:
+            rejilla: Diccionario criterio -> lista de valores (duracion_minima, 
+                duracion_maxima, pausa_maxima, intensidad_minima). Los criterios 
+                omitidos conservan su valor actual.
+            procesos: Número de procesos (por defecto, uno por CPU).
+            intervalo_huff: Intervalo de percentiles para las curvas de Huff.
 
-        return curvas_huff
+        Returns:
+            DataFrame con una fila por combinación y cuartil: criterios, total de 
+            aguaceros, conteo del cuartil y su curva de Huff (valores_percentiles).
+        """
+        if self.df_eventos is None:
+            return None
+
+        criterios = ['duracion_minima', 'duracion_maxima', 'pausa_maxima', 'intensidad_minima']
+        valores = [list(rejilla.get(c, [getattr(self, c)])) for c in criterios]
+        combinaciones = [dict(zip(criterios, v)) for v in itertools.product(*valores)]
+
+        # Agrupar por pausa; si hay más procesos que pausas, partir cada grupo
+        procesos = procesos or os.cpu_count()
+        pausas = list(dict.fromkeys(c['pausa_maxima'] for c in combinaciones))
+        partes = max(1, procesos // len(pausas))
+        tareas = []
+        for pausa in pausas:
+            grupo = [c for c in combinaciones if c['pausa_maxima'] == pausa]
+            for i in range(min(partes, len(grupo))):
+                tareas.append((pausa, grupo[i::partes]))
+
+        parametros = {
+            'intervalo_mediciones' : self.intervalo_mediciones,
+            'primera_fecha'        : self.primera_fecha,
+            'ultima_fecha'         : self.ultima_fecha,
+        }
+        arreglos = {
+            columna: self.df_eventos[columna].to_numpy()
+            for columna in ['inicia', 'termina', 'precipitacion_acumulada', 'duracion', 'posicion']
+        }
+        arreglos['valores_eventos'] = self.valores_eventos
+
+        bloques, descriptor = _publicar_arreglos(arreglos)
+        try:
+            with ProcessPoolExecutor(max_workers=min(procesos, len(tareas))) as ejecutor:
+                resultados = ejecutor.map(
+                    _barrer_pausa,
+                    itertools.repeat(descriptor),
+                    itertools.repeat(parametros),
+                    [pausa for pausa, _ in tareas],
+                    [grupo for _, grupo in tareas],
+                    itertools.repeat(intervalo_huff),
+                )
+                filas = list(itertools.chain.from_iterable(resultados))
+        finally:
+            for bloque in bloques:
+                bloque.close()
+                bloque.unlink()
+
+        return pd.DataFrame(filas).sort_values(criterios + ['Q']).reset_index(drop=True)
+
+    # ---------------------------------------------------------------------------------------------
+    def _resumir_aguaceros(self, combinacion, intervalo_huff):
+        # Filas (una por cuartil) con conteo y curva de Huff de los aguaceros detectados
+        conteos = self.df_aguaceros['Q_Huff'].value_counts()
+        curvas = {}
+        if self.df_aguaceros.shape[0] > 0:
+            curvas_huff = self.calcular_curvas_huff(intervalo=intervalo_huff)
+            curvas = dict(zip(curvas_huff['Q'], curvas_huff['valores_percentiles']))
+
+        return [
+            {
+                **combinacion,
+                'aguaceros'           : self.df_aguaceros.shape[0],
+                'Q'                   : Q,
+                'conteo'              : int(conteos.get(Q, 0)),
+                'valores_percentiles' : curvas.get(Q),
+            }
+            for Q in ['Q1', 'Q2', 'Q3', 'Q4']
+        ]
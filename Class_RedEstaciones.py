@@ -0,0 +1,259 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: RedEstaciones.py - Procesamiento conjunto de varias estaciones
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from Class_Precipitaciones import Precipitaciones
+from Class_CacheFiguras import CacheFiguras
+from Class_GraficasAguaceros import ServicioFiguras
+
+
+# ---------------------------------------------------------------------------------------------
+def _procesar_estacion(datos, parametros):
+    # Procesamiento completo de una estación; retorna el objeto procesado (desde otro
+    # proceso llega como copia), su resumen y sus lagunas
+    resumen = {
+        'mediciones' : datos.df_mediciones.shape[0],
+        'intervalo'  : None,
+        'lagunas'    : 0,
+        'aguaceros'  : 0,
+        'estado'     : 'OK',
+    }
+    df_lagunas = None
+    try:
+        if not datos.estimar_intervalo_mediciones():
+            raise ValueError('error en intervalo entre mediciones')
+        resumen['intervalo'] = datos.intervalo_mediciones
+        resumen['lagunas'], df_lagunas = datos.detectar_lagunas()
+        resumen['completitud'] = datos.reporte_lagunas()['completitud']
+        datos.rellenar_faltantes(parametros['valor_relleno'])
+        datos.calcular_eventos_precipitacion()
+        datos.primera_fecha, datos.ultima_fecha = datos.rango_mediciones()
+        for criterio, valor in parametros['criterios'].items():
+            setattr(datos, criterio, valor)
+        datos.detectar_aguaceros()
+        resumen['aguaceros'] = datos.df_aguaceros.shape[0]
+    except Exception as e:
+        resumen['estado'] = str(e)
+
+    return datos, resumen, df_lagunas
+
+# ---------------------------------------------------------------------------------------------
+def _revisar_estacion(datos, frecuencia):
+    # Solo intervalo y lagunas (sin rellenar ni detectar aguaceros); retorna resumen de
+    # calidad y completitud por periodo
+    resumen = {'mediciones': datos.df_mediciones.shape[0], 'intervalo': None, 'estado': 'OK'}
+    df_completitud = None
+    try:
+        if not datos.estimar_intervalo_mediciones():
+            raise ValueError('error en intervalo entre mediciones')
+        resumen['intervalo'] = datos.intervalo_mediciones
+        reporte = datos.reporte_lagunas(frecuencia)
+        df_completitud = reporte.pop('df_completitud')
+        reporte['inicia_mas_larga'] = pd.Timestamp(reporte['inicia_mas_larga'])
+        resumen.update(reporte)
+    except Exception as e:
+        resumen['estado'] = str(e)
+
+    return resumen, df_completitud
+
+
+# ---------------------------------------------------------------------------------------------
+class RedEstaciones:
+    """
+    Conjunto de estaciones de una red, cada una con su serie de precipitación (un objeto
+    Precipitaciones por estación). Todas se procesan con los mismos criterios en una sola
+    llamada, en paralelo, y los resultados se reúnen en tablas indexadas por estación.
+
+    Las estaciones se crean desde un archivo en formato ancho (una columna de
+    precipitación por estación) o largo (columna con identificador de estación).
+    """
+
+    # -----------------------------------------------------------------------------------------
+    def __init__(self):
+        self.estaciones   = {}   # Nombre de estación -> Precipitaciones
+        self.df_resumen   = None # Mediciones, intervalo, lagunas, aguaceros y estado por estación
+        self.df_lagunas   = None # Lagunas de todas las estaciones (índice: estación, laguna)
+        self.df_aguaceros = None # Aguaceros de todas las estaciones (índice: estación, aguacero)
+
+    # -----------------------------------------------------------------------------------------
+    def agregar_estacion(self, nombre, fechas, valores, col_fechahora='fechahora',
+                         col_precipitacion='precipitacion'):
+        datos = Precipitaciones()
+        datos.nombre = nombre
+        datos.col_fechahora = col_fechahora
+        datos.col_precipitacion = col_precipitacion
+        datos.df_mediciones = pd.DataFrame({
+            col_fechahora     : pd.Series(fechas).to_numpy(),
+            col_precipitacion : pd.Series(valores).to_numpy(dtype=float),
+        })
+        self.estaciones[nombre] = datos
+
+    # -----------------------------------------------------------------------------------------
+    @classmethod
+    def desde_archivo(cls, archivo_io, col_fechahora, columnas=None, col_estacion=None,
+                      col_precipitacion=None):
+        """
+        Crea la red a partir de un archivo .csv.
+
+        Args:
+            archivo_io: Archivo abierto (o cargado en Streamlit).
+            col_fechahora: Columna fecha-hora, común a todas las estaciones.
+            columnas: Formato ancho: columnas de precipitación, una por estación (por
+                defecto, todas las que se conviertan a número).
+            col_estacion: Formato largo: columna con el identificador de estación.
+            col_precipitacion: Formato largo: columna de precipitación.
+
+        Returns:
+            Tupla (RedEstaciones, mensaje de error); None si no se pudo crear.
+        """
+        lector = Precipitaciones()
+        lector.obtener_lecturas(archivo_io)
+        if lector.df_origen is None:
+            return None, 'archivo no legible'
+
+        fechas, msg = lector._obtener_columna_fechahora(col_fechahora)
+        if fechas is None:
+            return None, f'columna fecha-hora: {msg}'
+
+        red = cls()
+        if col_estacion is not None:
+            valores = lector._obtener_columna_precipitacion(col_precipitacion)
+            if valores is None:
+                return None, 'columna de precipitación'
+            grupos = lector.df_origen.groupby(col_estacion, sort=False).indices
+            for estacion, indices in grupos.items():
+                red.agregar_estacion(
+                    estacion, fechas.iloc[indices], valores.iloc[indices],
+                    col_fechahora, col_precipitacion,
+                )
+        else:
+            if columnas is None:
+                columnas = [c for c in lector.df_origen.columns if c != col_fechahora]
+            for columna in columnas:
+                valores = lector._obtener_columna_precipitacion(columna)
+                if valores is not None:
+                    red.agregar_estacion(columna, fechas, valores, col_fechahora, columna)
+
+        if len(red.estaciones) == 0:
+            return None, 'ninguna columna de precipitación'
+        return red, ''
+
+    # -----------------------------------------------------------------------------------------
+    def procesar(self, criterios=None, valor_relleno=0, procesos=None):
+        """
+        Estima intervalo, detecta lagunas, rellena faltantes, calcula eventos y detecta
+        aguaceros en todas las estaciones.
+
+        Args:
+            criterios: Diccionario de criterios de aguacero (duracion_minima,
+                duracion_maxima, pausa_maxima, intensidad_minima); los omitidos usan el
+                valor por defecto de cada estación.
+            valor_relleno: Valor para mediciones faltantes.
+            procesos: Número de procesos (por defecto, uno por CPU; 1 procesa en este).
+
+        Returns:
+            DataFrame de resumen indexado por estación.
+        """
+        parametros = {'criterios': criterios or {}, 'valor_relleno': valor_relleno}
+        nombres = list(self.estaciones)
+        procesos = min(procesos or os.cpu_count(), max(len(nombres), 1))
+
+        if procesos == 1:
+            resultados = [_procesar_estacion(self.estaciones[n], parametros) for n in nombres]
+        else:
+            with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+                resultados = list(ejecutor.map(
+                    _procesar_estacion,
+                    [self.estaciones[n] for n in nombres],
+                    [parametros] * len(nombres),
+                ))
+
+        resumenes, lagunas, aguaceros = {}, {}, {}
+        for nombre, (datos, resumen, df_lagunas) in zip(nombres, resultados):
+            self.estaciones[nombre] = datos
+            resumenes[nombre] = resumen
+            if df_lagunas is not None:
+                lagunas[nombre] = df_lagunas
+            if datos.df_aguaceros is not None:
+                aguaceros[nombre] = datos.df_aguaceros
+
+        self.df_resumen = pd.DataFrame.from_dict(resumenes, orient='index')
+        self.df_resumen.index.name = 'estacion'
+        self.df_lagunas = self._reunir(lagunas)
+        self.df_aguaceros = self._reunir(aguaceros)
+        return self.df_resumen
+
+    # -----------------------------------------------------------------------------------------
+    def revisar_calidad(self, frecuencia='YE', procesos=None):
+        """
+        Revisión de calidad de datos de todas las estaciones, sin procesarlas por completo:
+        intervalo, lagunas (número, faltantes, más larga, húmedas) y completitud.
+
+        Args:
+            frecuencia: Periodo de la tabla de completitud ('D', 'W', 'ME' o 'YE').
+            procesos: Número de procesos (por defecto, uno por CPU; 1 procesa en este).
+
+        Returns:
+            Tupla (DataFrame de calidad indexado por estación, DataFrame de completitud 
+            indexado por estación y periodo).
+        """
+        nombres = list(self.estaciones)
+        procesos = min(procesos or os.cpu_count(), max(len(nombres), 1))
+
+        if procesos == 1:
+            resultados = [_revisar_estacion(self.estaciones[n], frecuencia) for n in nombres]
+        else:
+            with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+                resultados = list(ejecutor.map(
+                    _revisar_estacion,
+                    [self.estaciones[n] for n in nombres],
+                    [frecuencia] * len(nombres),
+                ))
+
+        calidad = {nombre: resumen for nombre, (resumen, _) in zip(nombres, resultados)}
+        completitud = {
+            nombre: df for nombre, (_, df) in zip(nombres, resultados) if df is not None
+        }
+        df_calidad = pd.DataFrame.from_dict(calidad, orient='index')
+        df_calidad.index.name = 'estacion'
+        return df_calidad, self._reunir(completitud)
+
+    # -----------------------------------------------------------------------------------------
+    def calcular_curvas_huff(self, intervalo=5):
+        # Curvas de Huff de cada estación con aguaceros, indexadas por estación
+        curvas = {
+            nombre: datos.calcular_curvas_huff(intervalo=intervalo)
+            for nombre, datos in self.estaciones.items()
+            if (datos.df_aguaceros is not None) and (datos.df_aguaceros.shape[0] > 0)
+        }
+        return self._reunir(curvas)
+
+    # -----------------------------------------------------------------------------------------
+    def generar_figuras(self, directorio, formatos=('png', 'svg'), intervalo_huff=10,
+                        procesos=None):
+        # Todas las figuras de cada estación con aguaceros, escritas en paralelo como
+        # <estacion>_<figura>.<formato>; retorna estación -> rutas
+        servicio = ServicioFiguras(CacheFiguras(), procesos=procesos)
+        return servicio.generar_lote(self.estaciones, directorio, formatos, intervalo_huff)
+
+    # -----------------------------------------------------------------------------------------
+    def _reunir(self, tablas):
+        # Concatena tablas por estación con la estación como primer nivel del índice
+        if len(tablas) == 0:
+            return None
+        return pd.concat(tablas, names=['estacion', None])
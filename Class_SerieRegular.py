@@ -0,0 +1,269 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: SerieRegular.py - Representación compacta de mediciones a intervalo fijo
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import pandas as pd
+import numpy as np
+
+
+# =============================================================================================
+# Rejilla regular de mediciones
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def paso_intervalo(intervalo):
+    # Intervalo en minutos como timedelta64 exacto en nanosegundos
+    return np.timedelta64(int(round(intervalo * 60 * 1e9)), 'ns')
+
+# ---------------------------------------------------------------------------------------------
+def ubicar_en_rejilla(fechas, intervalo, fuera_rejilla='ajustar'):
+    """
+    Calcula la posición entera de cada marca de tiempo en una rejilla regular que inicia
+    en la primera de ellas, sin ordenar. 
+
+    Las marcas que no caen exactas en la rejilla se llevan a la posición más cercana 
+    (fuera_rejilla='ajustar') o se descartan ('descartar'). Si varias mediciones quedan 
+    en la misma posición se conserva la última del archivo.
+
+    Args:
+        fechas: Marcas de tiempo (datetime64) de las mediciones.
+        intervalo: Minutos entre posiciones de la rejilla.
+        fuera_rejilla: 'ajustar' o 'descartar'.
+
+    Returns:
+        Tupla (inicio, longitud de la rejilla, posiciones ocupadas en orden creciente, 
+        índice en fechas de la medición que ocupa cada una, reporte de conteos).
+    """
+    if fuera_rejilla not in ['ajustar', 'descartar']:
+        raise ValueError(f'Política fuera_rejilla desconocida: {fuera_rejilla}')
+
+    fechas = np.asarray(fechas, dtype='datetime64[ns]')
+    paso = paso_intervalo(intervalo).astype(np.int64)
+    inicio = fechas.min()
+    desfases = (fechas - inicio).astype(np.int64)
+    posiciones = (desfases + paso // 2) // paso
+
+    fuera = (desfases % paso) != 0
+    reporte = {'duplicadas': 0, 'fuera_rejilla': int(fuera.sum()), 'descartadas': 0}
+    indices = np.arange(len(fechas))
+    if fuera_rejilla == 'descartar':
+        indices = indices[~fuera]
+        posiciones = posiciones[~fuera]
+        reporte['descartadas'] = reporte['fuera_rejilla']
+
+    # Última medición en cada posición: un recorrido sobre la rejilla, sin ordenar
+    longitud = int(posiciones.max()) + 1 if len(posiciones) > 0 else 0
+    ocupante = np.full(longitud, -1, dtype=np.int64)
+    np.maximum.at(ocupante, posiciones, indices)
+    ocupadas = np.flatnonzero(ocupante >= 0)
+    reporte['duplicadas'] = len(posiciones) - len(ocupadas)
+
+    return inicio, longitud, ocupadas, ocupante[ocupadas], reporte
+
+# ---------------------------------------------------------------------------------------------
+def ubicar_lagunas(fechas, valores, intervalo):
+    """
+    Lagunas entre mediciones válidas consecutivas (las <0 y NaN cuentan como faltantes)
+    separadas más que el intervalo, en un recorrido vectorizado y sin DataFrames.
+
+    Args:
+        fechas: Marcas de tiempo (datetime64) de las mediciones, en orden.
+        valores: Precipitación de cada medición.
+        intervalo: Minutos entre mediciones.
+
+    Returns:
+        Diccionario de arreglos, uno por laguna: inicia y termina (mediciones válidas que
+        la limitan), faltantes (posiciones sin medición válida), duracion (minutos entre
+        inicia y termina) y humeda (llovía en inicia o en termina: la laguna pudo cortar
+        un aguacero).
+    """
+    valores = np.asarray(valores, dtype=float)
+    validas = np.flatnonzero(valores >= 0)
+    tiempos = np.asarray(fechas, dtype='datetime64[ns]')[validas]
+    paso = paso_intervalo(intervalo).astype(np.int64)
+
+    deltas = np.diff(tiempos).astype(np.int64)
+    saltos = np.flatnonzero(deltas > paso)
+    inicia, termina = tiempos[saltos], tiempos[saltos + 1]
+    return {
+        'inicia'    : inicia,
+        'termina'   : termina,
+        'faltantes' : (deltas[saltos] + paso // 2) // paso - 1,
+        'duracion'  : (deltas[saltos] // 60_000_000_000).astype(float),
+        'humeda'    : (valores[validas[saltos]] > 0) | (valores[validas[saltos + 1]] > 0),
+    }
+
+# ---------------------------------------------------------------------------------------------
+def rellenar_huecos(valores, faltantes, valor_relleno=0, max_interpolar=0):
+    """
+    Asigna valores a las posiciones faltantes de un arreglo float, en el mismo arreglo.
+
+    Los huecos de hasta max_interpolar posiciones entre dos mediciones se interpolan 
+    linealmente; los demás toman valor_relleno (0, o NaN para dejarlos como faltantes).
+
+    Returns:
+        Diccionario con número de posiciones interpoladas y rellenas.
+    """
+    presentes = np.flatnonzero(~faltantes)
+    interpoladas = 0
+    if (max_interpolar > 0) and (len(presentes) > 1):
+        huecos = np.diff(presentes) - 1
+        cortos = (huecos > 0) & (huecos <= max_interpolar)
+        conteos = huecos[cortos]
+        desplazamientos = np.cumsum(conteos) - conteos
+        indices = np.repeat(presentes[:-1][cortos] + 1 - desplazamientos, conteos) + \
+            np.arange(conteos.sum())
+        valores[indices] = np.interp(indices, presentes, valores[presentes])
+        faltantes[indices] = False
+        interpoladas = len(indices)
+
+    valores[faltantes] = valor_relleno
+    return {'interpoladas': interpoladas, 'rellenas': int(faltantes.sum())}
+
+
+# ---------------------------------------------------------------------------------------------
+class SerieRegular:
+    """
+    Serie de mediciones a intervalo fijo: en lugar de guardar la marca de tiempo de cada
+    medición se guarda solo la inicial y el intervalo. Los valores se guardan como
+    float32, o como int16 escalado (valor = entero * escala), con una máscara de
+    faltantes de un bit por posición. Ocupa 2 a 4 bytes por medición en lugar de 16.
+    """
+
+    # -----------------------------------------------------------------------------------------
+    def __init__(self, inicio, intervalo, valores, faltantes, escala=None):
+        self.inicio    = np.datetime64(inicio, 'ns') # Marca de tiempo de la posición 0
+        self.intervalo = intervalo                   # Minutos entre posiciones
+        self.escala    = escala                      # None si valores es float32
+        self._valores  = valores                     # float32 o int16 escalado
+        self._faltantes = np.packbits(faltantes)     # Un bit por posición
+        self._longitud = len(valores)
+        self.reporte   = {}                          # Duplicadas y fuera de rejilla al ubicar
+
+    # -----------------------------------------------------------------------------------------
+    @classmethod
+    def desde_mediciones(cls, fechas, valores, intervalo, tipo='float32', escala=0.1,
+                         fuera_rejilla='ajustar'):
+        """
+        Construye la serie ubicando cada medición en su posición de la rejilla regular.
+
+        Args:
+            fechas: Marcas de tiempo (datetime64) de las mediciones.
+            valores: Valores de las mediciones; NaN se toma como faltante.
+            intervalo: Minutos entre mediciones.
+            tipo: 'float32', o 'int16' para guardar enteros escalados.
+            escala: Resolución de los valores cuando tipo es 'int16' (p.ej. 0.1 mm).
+            fuera_rejilla: 'ajustar' o 'descartar' mediciones que no caen en la rejilla.
+
+        Returns:
+            SerieRegular con las posiciones sin medición marcadas como faltantes.
+        """
+        valores = np.asarray(valores, dtype=float)
+        validos = ~np.isnan(valores)
+        inicio, longitud, posiciones, seleccion, reporte = \
+            ubicar_en_rejilla(np.asarray(fechas)[validos], intervalo, fuera_rejilla)
+        valores = valores[validos][seleccion]
+
+        # Ubicar valores en un arreglo ya reservado: O(n), sin ordenar
+        faltantes = np.ones(longitud, dtype=bool)
+        faltantes[posiciones] = False
+        if tipo == 'int16':
+            enteros = np.rint(valores / escala)
+            if np.abs(enteros).max(initial=0) > np.iinfo(np.int16).max:
+                raise ValueError(f'Valores fuera del rango de int16 con escala {escala}')
+            compactos = np.zeros(longitud, dtype=np.int16)
+            compactos[posiciones] = enteros
+        else:
+            escala = None
+            compactos = np.full(longitud, np.nan, dtype=np.float32)
+            compactos[posiciones] = valores
+
+        serie = cls(inicio, intervalo, compactos, faltantes, escala)
+        serie.reporte = reporte
+        return serie
+
+    # -----------------------------------------------------------------------------------------
+    def __len__(self):
+        return self._longitud
+
+    # -----------------------------------------------------------------------------------------
+    @property
+    def nbytes(self):
+        return self._valores.nbytes + self._faltantes.nbytes
+
+    # -----------------------------------------------------------------------------------------
+    @property
+    def tipo(self):
+        # 'float32' o 'int16' (escalado), según se construyó la serie
+        return self._valores.dtype.name
+
+    # -----------------------------------------------------------------------------------------
+    @property
+    def paso(self):
+        return paso_intervalo(self.intervalo)
+
+    # -----------------------------------------------------------------------------------------
+    @property
+    def faltantes(self):
+        return np.unpackbits(self._faltantes, count=self._longitud).astype(bool)
+
+    # -----------------------------------------------------------------------------------------
+    @property
+    def valores(self):
+        # Valores con NaN en las posiciones faltantes. Los enteros escalados se convierten
+        # a float64 dividiendo (3 / 10 es 0.3; 3 * 0.1 no), igual al valor leído del archivo
+        if self.escala is None:
+            return self._valores
+        valores = self._valores / (1 / self.escala)
+        valores[self.faltantes] = np.nan
+        return valores
+
+    # -----------------------------------------------------------------------------------------
+    def fechas(self, posiciones=None):
+        # Marcas de tiempo de las posiciones indicadas (todas, si no se indican)
+        if posiciones is None:
+            posiciones = np.arange(self._longitud)
+        return self.inicio + np.asarray(posiciones, dtype=np.int64) * self.paso
+
+    # -----------------------------------------------------------------------------------------
+    def rango_fechas(self):
+        presentes = np.flatnonzero(~self.faltantes)
+        if len(presentes) == 0:
+            return None, None
+        primera, ultima = self.fechas(presentes[[0, -1]])
+        return pd.Timestamp(primera), pd.Timestamp(ultima)
+
+    # -----------------------------------------------------------------------------------------
+    def rellenar(self, valor_relleno=0, max_interpolar=0):
+        # Asignar valor a las posiciones faltantes (y valores <0); ver rellenar_huecos.
+        # Con valor_relleno NaN esas posiciones siguen marcadas como faltantes
+        valores = self.valores.astype(float)
+        faltantes = self.faltantes | (valores < 0)
+        conteos = rellenar_huecos(valores, faltantes, valor_relleno, max_interpolar)
+
+        faltantes = np.isnan(valores)
+        if self.escala is None:
+            self._valores[:] = valores
+        else:
+            self._valores[:] = np.rint(np.where(faltantes, 0, valores) / self.escala)
+        self._faltantes = np.packbits(faltantes)
+        return conteos
+
+    # -----------------------------------------------------------------------------------------
+    def a_dataframe(self, col_fechahora, col_precipitacion):
+        # DataFrame equivalente (sin filas para posiciones faltantes)
+        presentes = np.flatnonzero(~self.faltantes)
+        return pd.DataFrame({
+            col_fechahora     : self.fechas(presentes),
+            col_precipitacion : self.valores[presentes].astype(float),
+        })
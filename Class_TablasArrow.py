@@ -0,0 +1,70 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: TablasArrow.py - Tablas de resultados en formato Arrow, con columnas de listas
+#          construidas sobre los arreglos planos (valores + desplazamientos) sin copiarlos
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import numpy as np
+
+# pyarrow viene con streamlit; el procesamiento sin interfaz no lo requiere
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+# =============================================================================================
+# Procedimientos y funciones
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def arreglo_listas(valores, desplazamientos):
+    """
+    Columna Arrow de listas: la lista i son los valores entre desplazamientos[i] y
+    desplazamientos[i + 1]. Los valores se usan como buffer de Arrow sin copiarlos (ni
+    crear un objeto por fila); solo se convierten los desplazamientos a int32 (o se usa
+    large_list si no caben).
+    """
+    valores = pa.array(np.ascontiguousarray(valores))
+    desplazamientos = np.asarray(desplazamientos)
+    if (len(desplazamientos) > 0) and (desplazamientos[-1] > np.iinfo(np.int32).max):
+        return pa.LargeListArray.from_arrays(pa.array(desplazamientos.astype(np.int64)), valores)
+    return pa.ListArray.from_arrays(pa.array(desplazamientos.astype(np.int32)), valores)
+
+# ---------------------------------------------------------------------------------------------
+def tabla_arrow(df, listas=None, orden=None):
+    """
+    Tabla Arrow con las columnas escalares de df más columnas de listas.
+
+    Args:
+        df: DataFrame con las columnas escalares (sin columnas de objetos por fila).
+        listas: Diccionario nombre -> (valores, desplazamientos) para cada columna de
+            listas, en el formato de los arreglos planos de Precipitaciones.
+        orden: Orden final de las columnas (por defecto, escalares y luego listas).
+
+    Returns:
+        pyarrow.Table
+    """
+    if pa is None:
+        raise ImportError('Se requiere pyarrow para tablas Arrow')
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    for nombre, (valores, desplazamientos) in (listas or {}).items():
+        tabla = tabla.append_column(nombre, arreglo_listas(valores, desplazamientos))
+    return tabla if orden is None else tabla.select(list(orden))
+
+# ---------------------------------------------------------------------------------------------
+def tabla_parquet(tabla):
+    # Contenido de un archivo .parquet con la tabla (las listas quedan como listas)
+    buffer = pa.BufferOutputStream()
+    pq.write_table(tabla, buffer)
+    return buffer.getvalue().to_pybytes()
@@ -15,7 +15,12 @@
 
 from Class_AppConfig import AppConfig
 from Class_Precipitaciones import Precipitaciones
+from Class_CacheMediciones import CacheMediciones
+from Class_Instrumentacion import Instrumentacion
+from Class_CacheFiguras import CacheFiguras
+from Class_GraficasAguaceros import ServicioFiguras
 import streamlit as st
+import os
 
 
 # =============================================================================================
@@ -24,7 +29,14 @@ import streamlit as st
 if 'appconfig' not in st.session_state:
     st.session_state['appconfig'] = AppConfig()
 if 'precipitaciones' not in st.session_state:
-    st.session_state['precipitaciones'] = Precipitaciones()
+    st.session_state['precipitaciones'] = Precipitaciones(
+        cache=CacheMediciones(),
+        instrumentacion=Instrumentacion(archivo=os.environ.get('HYETIASCAN_METRICAS')),
+    )
+if 'figuras' not in st.session_state:
+    st.session_state['figuras'] = ServicioFiguras(CacheFiguras(
+        compartida=os.environ.get('HYETIASCAN_COMPARTIR_FIGURAS') == '1'
+    ))
 
 # Variables de nombre breve para acceso a datos de sesión
 apcfg = st.session_state['appconfig']
@@ -46,8 +58,13 @@ st.caption(
 )
 
 archivo_io = st.file_uploader('Selección de archivo:', type=['csv'])
+por_partes = st.toggle(
+    'Leer por partes?', 
+    help='Para archivos grandes: lee solo las columnas elegidas, por bloques de filas. '
+         'El contenido visible es una muestra de las primeras filas.',
+)
 if archivo_io is not None:
-    datos.obtener_lecturas(archivo_io)
+    datos.obtener_lecturas(archivo_io, por_partes=por_partes)
 
 # Descripción
 st.caption(
@@ -60,4 +77,6 @@ st.caption(
 
 # Visualizar?
 if st.toggle('Ver contenido', disabled=datos.df_origen is None):
-    st.dataframe(datos.df_origen)
\ No newline at end of file
+    apcfg.mostrar_tabla_paginada(datos.df_origen, clave='pagina_origen')
+
+apcfg.mostrar_instrumentacion(datos)
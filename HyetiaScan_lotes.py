@@ -0,0 +1,245 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: HyetiaScan_lotes.py - Procesamiento por lotes de archivos de estaciones, sin interfaz
+#
+# Uso:
+#     python HyetiaScan_lotes.py <directorio|patrón> --salida <directorio> [opciones]
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from Class_Precipitaciones import Precipitaciones
+from Class_CacheMediciones import CacheMediciones
+from Class_Instrumentacion import Instrumentacion
+from Class_GraficasAguaceros import guardar_figuras, figuras_estacion
+
+
+# =============================================================================================
+# Procedimientos y funciones
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def listar_archivos(entrada):
+    if os.path.isdir(entrada):
+        entrada = os.path.join(entrada, '*.csv')
+    return sorted(glob.glob(entrada))
+
+# ---------------------------------------------------------------------------------------------
+def elegir_columnas(datos, col_fechahora, col_precipitacion):
+    # Sin columna fecha-hora indicada, usar la primera que se convierta
+    candidatas = [col_fechahora] if col_fechahora else list(datos.df_origen.columns)
+    columnas_ok, msg = False, 'columna fecha-hora: Columna inexistente'
+    for fechahora in candidatas:
+        if fechahora == col_precipitacion:
+            continue
+        columnas_ok, msg = datos.asignar_columnas_seleccionadas(fechahora, col_precipitacion)
+        if columnas_ok or not msg.startswith('columna fecha-hora'):
+            break
+    return columnas_ok, msg
+
+# ---------------------------------------------------------------------------------------------
+def procesar_archivo(ruta, parametros):
+    """
+    Ejecuta el procesamiento completo de un archivo de estación y guarda sus resultados.
+
+    Args:
+        ruta: Ruta del archivo .csv de mediciones.
+        parametros: Diccionario con columnas, criterios de aguacero y directorio de salida.
+
+    Returns:
+        Diccionario con resumen del procesamiento (estado, conteos y tiempos).
+    """
+    resumen = {'archivo': ruta, 'estado': 'OK', 'mediciones': 0, 'lagunas': 0, 'aguaceros': 0}
+    t0 = time.perf_counter()
+
+    try:
+        cache = CacheMediciones(parametros['cache']) if parametros['cache'] else None
+        instrumentacion = None
+        if parametros['metricas']:
+            instrumentacion = Instrumentacion(
+                archivo=parametros['metricas'], memoria=parametros['medir_memoria']
+            )
+        datos = Precipitaciones(cache=cache, instrumentacion=instrumentacion)
+        with open(ruta, 'rb') as archivo_io:
+            datos.obtener_lecturas(archivo_io, por_partes=parametros['por_partes'])
+            if datos.df_origen is None:
+                raise ValueError('archivo no legible')
+
+            columnas_ok, msg = elegir_columnas(
+                datos, parametros['fechahora'], parametros['precipitacion']
+            )
+        if not columnas_ok:
+            raise ValueError(f'error en {msg}')
+        resumen['mediciones'] = datos.df_mediciones.shape[0]
+        resumen['s_lectura'] = time.perf_counter() - t0
+
+        if not datos.estimar_intervalo_mediciones():
+            raise ValueError('error en intervalo entre mediciones')
+        if parametros['compactar']:
+            datos.compactar_mediciones(tipo=parametros['compactar'], escala=parametros['escala'])
+        resumen['lagunas'], _ = datos.detectar_lagunas()
+        calidad = datos.reporte_lagunas()
+        resumen['completitud'] = calidad['completitud']
+        resumen['laguna_mas_larga'] = calidad['laguna_mas_larga']
+        datos.rellenar_faltantes()
+
+        t1 = time.perf_counter()
+        datos.calcular_eventos_precipitacion()
+        datos.primera_fecha, datos.ultima_fecha = datos.rango_mediciones()
+        criterios = ['duracion_minima', 'duracion_maxima', 'pausa_maxima', 'intensidad_minima']
+        for criterio in criterios:
+            if parametros[criterio] is not None:
+                setattr(datos, criterio, parametros[criterio])
+        datos.detectar_aguaceros()
+        resumen['aguaceros'] = datos.df_aguaceros.shape[0]
+        resumen['s_deteccion'] = time.perf_counter() - t1
+
+        # Resultados por estación: catálogo, mediciones, curvas de Huff, lagunas, parámetros
+        estacion = os.path.splitext(os.path.basename(ruta))[0]
+        datos.exportar_resultados(
+            parametros['salida'], 
+            formatos=parametros['formatos'], 
+            prefijo=estacion,
+            intervalo_huff=parametros['intervalo_huff'],
+        )
+        if parametros['figuras']:
+            resumen['figuras'] = len(guardar_figuras(
+                datos, 
+                parametros['salida'], 
+                formatos=parametros['figuras'], 
+                prefijo=estacion,
+                pedidos=figuras_estacion(datos, intervalo_huff=parametros['intervalo_huff']),
+            ))
+
+    except Exception as e:
+        resumen['estado'] = str(e)
+
+    resumen['s_total'] = time.perf_counter() - t0
+    return resumen
+
+# ---------------------------------------------------------------------------------------------
+def leer_argumentos(argumentos=None):
+    parser = argparse.ArgumentParser(
+        description='Detecta aguaceros y curvas de Huff en muchos archivos de estaciones.'
+    )
+    parser.add_argument(
+        'entrada', help='Directorio con archivos .csv o patrón (p.ej. "datos/*.csv")'
+    )
+    parser.add_argument('--salida', required=True, help='Directorio para resultados')
+    parser.add_argument('--fechahora', help='Columna fecha-hora (por defecto se detecta)')
+    parser.add_argument('--precipitacion', required=True, help='Columna de precipitación')
+    parser.add_argument('--duracion-minima', type=int, help='Minutos (por defecto 15)')
+    parser.add_argument(
+        '--duracion-maxima', type=int, help='Minutos (por defecto el tope de los datos)'
+    )
+    parser.add_argument('--pausa-maxima', type=int, help='Minutos (por defecto 5)')
+    parser.add_argument('--intensidad-minima', type=float, help='mm/h (por defecto 2)')
+    parser.add_argument(
+        '--intervalo-huff', type=int, default=10, help='Intervalo de percentiles Huff'
+    )
+    parser.add_argument(
+        '--procesos', type=int, default=os.cpu_count(), help='Procesos simultáneos'
+    )
+    parser.add_argument('--por-partes', action='store_true', help='Leer archivos por partes')
+    parser.add_argument('--cache', help='Directorio de cache de mediciones ya procesadas')
+    parser.add_argument(
+        '--compactar', choices=['float32', 'int16'], 
+        help='Guardar mediciones en memoria como serie regular compacta'
+    )
+    parser.add_argument(
+        '--escala', type=float, default=0.1, help='Resolución en mm para --compactar int16'
+    )
+    parser.add_argument(
+        '--formatos', nargs='+', choices=['csv', 'parquet', 'netcdf'], default=['csv'],
+        help='Formatos de resultados por estación (netcdf requiere netCDF4)',
+    )
+    parser.add_argument(
+        '--figuras', nargs='+', choices=['png', 'svg'],
+        help='Guardar también las figuras de cada estación en estos formatos',
+    )
+    parser.add_argument(
+        '--metricas', help='Archivo .jsonl donde agregar tiempo y filas de cada etapa'
+    )
+    parser.add_argument(
+        '--medir-memoria', action='store_true', help='Incluir memoria pico en --metricas'
+    )
+    return parser.parse_args(argumentos)
+
+
+# =============================================================================================
+# Sección principal
+# =============================================================================================
+
+def main(argumentos=None):
+    args = leer_argumentos(argumentos)
+
+    archivos = listar_archivos(args.entrada)
+    if len(archivos) == 0:
+        print(f'No hay archivos en {args.entrada}', file=sys.stderr)
+        return 1
+    os.makedirs(args.salida, exist_ok=True)
+
+    parametros = {
+        'salida'            : args.salida,
+        'fechahora'         : args.fechahora,
+        'precipitacion'     : args.precipitacion,
+        'duracion_minima'   : args.duracion_minima,
+        'duracion_maxima'   : args.duracion_maxima,
+        'pausa_maxima'      : args.pausa_maxima,
+        'intensidad_minima' : args.intensidad_minima,
+        'intervalo_huff'    : args.intervalo_huff,
+        'formatos'          : args.formatos,
+        'figuras'           : args.figuras,
+        'por_partes'        : args.por_partes,
+        'cache'             : args.cache,
+        'compactar'         : args.compactar,
+        'escala'            : args.escala,
+        'metricas'          : args.metricas,
+        'medir_memoria'     : args.medir_memoria,
+    }
+
+    # Repartir archivos entre procesos e informar a medida que terminan
+    t0 = time.perf_counter()
+    resumenes = []
+    with ProcessPoolExecutor(max_workers=args.procesos) as ejecutor:
+        tareas = [ejecutor.submit(procesar_archivo, ruta, parametros) for ruta in archivos]
+        for tarea in as_completed(tareas):
+            resumen = tarea.result()
+            resumenes.append(resumen)
+            print(
+                f'[{len(resumenes):>4}/{len(archivos)}] {resumen["s_total"]:7.2f} s  '
+                f'{resumen["mediciones"]:>9} mediciones  {resumen["aguaceros"]:>6} aguaceros  '
+                f'{os.path.basename(resumen["archivo"])}: {resumen["estado"]}'
+            )
+    duracion = time.perf_counter() - t0
+
+    df_resumen = pd.DataFrame(resumenes).sort_values('archivo')
+    df_resumen.to_csv(os.path.join(args.salida, 'resumen.csv'), index=False)
+
+    exitosos = (df_resumen['estado'] == 'OK').sum()
+    mediciones = df_resumen['mediciones'].sum()
+    print(
+        f'\n{exitosos}/{len(archivos)} archivos procesados en {duracion:.2f} s '
+        f'({len(archivos) / duracion:.2f} archivos/s, {mediciones / duracion:,.0f} mediciones/s)'
+    )
+    return 0 if exitosos == len(archivos) else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: bench_detectar_aguaceros.py - Comparación de detección con arreglos planos vs listas
+#
+# Uso (desde la raíz del repositorio):
+#     python -m benchmarks.bench_detectar_aguaceros [años ...]
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import sys
+import time
+import pandas as pd
+import numpy as np
+
+from Class_Precipitaciones import Precipitaciones
+from benchmarks.generador_sintetico import generar_serie
+
+
+# =============================================================================================
+# Implementación previa (listas de Python por evento), como referencia
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def calcular_eventos_listas(datos):
+    df = datos.df_mediciones.copy()
+    df['cambio'] = \
+        (df[datos.col_precipitacion] != 0) != (df[datos.col_precipitacion] != 0).shift(1)
+    df['grupo'] = df['cambio'].cumsum()
+    df = df.groupby('grupo').agg(
+        inicia                  = (datos.col_fechahora, 'first'),
+        termina                 = (datos.col_fechahora, 'last'),
+        conteo                  = (datos.col_precipitacion, 'count'),
+        precipitacion_acumulada = (datos.col_precipitacion, 'sum'),
+        mediciones              = (datos.col_precipitacion, lambda p: p.tolist()),
+    ).reset_index(drop=True)
+    df['duracion'] = datos.intervalo_mediciones + \
+        (df['termina'] - df['inicia']).dt.total_seconds() // 60
+    return df
+
+# ---------------------------------------------------------------------------------------------
+def detectar_aguaceros_listas(datos, df_eventos):
+
+    def calcular_acumulados(lista_mediciones, factor=100):
+        return (pd.Series(lista_mediciones).cumsum() * factor / sum(lista_mediciones)).to_list()
+
+    df = datos._unir_precipitaciones(df_eventos.copy(), datos.pausa_maxima)
+    df = df.groupby('secuencia').agg(
+        inicia                  = ('inicia', 'first'),
+        termina                 = ('termina', 'last'),
+        mediciones              = ('mediciones', lambda p: sum(p, [])),
+        precipitacion_acumulada = ('precipitacion_acumulada', 'sum'),
+    )
+    df = df.loc[
+        (df['termina'] >= pd.to_datetime(datos.primera_fecha)) & \
+        (df['termina'] <= pd.to_datetime(datos.ultima_fecha))
+    ]
+    df['duracion'] = \
+        (df['termina'] - df['inicia']).dt.total_seconds() // 60 + datos.intervalo_mediciones
+    df['intensidad'] = 60 * df['precipitacion_acumulada'] / df['duracion']
+    df['conteo'] = df['mediciones'].apply(len)
+    df = df[
+        (df['duracion'] >= datos.duracion_minima) & \
+        (df['duracion'] <= datos.duracion_maxima) & \
+        (df['precipitacion_acumulada'] != 0)
+    ]
+    df = df[(df['intensidad'] >= datos.intensidad_minima)]
+    df['porcentaje_acumulado'] = df['mediciones'].apply(calcular_acumulados)
+    df['Q_Huff'] = df['porcentaje_acumulado'].apply(datos.determinar_cuartil_huff)
+    return df.reset_index(drop=True)
+
+
+# =============================================================================================
+# Comparación
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def preparar(num_mediciones, intervalo=5):
+    datos = Precipitaciones()
+    datos.nombre = 'sintetico'
+    datos.df_mediciones = generar_serie(num_mediciones, intervalo=intervalo)
+    datos.col_fechahora, datos.col_precipitacion = datos.df_mediciones.columns
+    datos.estimar_intervalo_mediciones()
+    datos.calcular_eventos_precipitacion()
+    datos.primera_fecha = datos.df_mediciones[datos.col_fechahora].min()
+    datos.ultima_fecha  = datos.df_mediciones[datos.col_fechahora].max()
+    return datos
+
+# ---------------------------------------------------------------------------------------------
+def medir(funcion, *args):
+    t0 = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - t0
+
+# ---------------------------------------------------------------------------------------------
+def resultados_iguales(df, df_listas):
+    # Mismos aguaceros (fechas, conteo, cuartil) y mismos totales y porcentajes acumulados
+    return \
+        df[['inicia', 'termina', 'conteo', 'Q_Huff']].equals(
+            df_listas[['inicia', 'termina', 'conteo', 'Q_Huff']]) and \
+        np.allclose(df['precipitacion_acumulada'], df_listas['precipitacion_acumulada']) and \
+        np.allclose(
+            np.concatenate(df['porcentaje_acumulado'].tolist() or [[]]),
+            np.concatenate(df_listas['porcentaje_acumulado'].tolist() or [[]]),
+        )
+
+# ---------------------------------------------------------------------------------------------
+def comparar(años, intervalo=5):
+    num_mediciones = int(años * 365 * 24 * 60 / intervalo)
+    datos = preparar(num_mediciones, intervalo)
+
+    df_eventos_listas, t_eventos_listas = medir(calcular_eventos_listas, datos)
+    df_listas, t_listas = medir(detectar_aguaceros_listas, datos, df_eventos_listas)
+    _, t_eventos = medir(datos.calcular_eventos_precipitacion)
+    datos.duracion_maxima = datos.duracion_tope
+    _, t_planos = medir(datos.detectar_aguaceros)
+
+    # Los resultados deben coincidir con la implementación previa
+    df = datos.df_aguaceros
+    iguales = resultados_iguales(df, df_listas)
+
+    print(
+        f'{años:>4} años | {num_mediciones:>9} mediciones | {len(df):>6} aguaceros | '
+        f'listas: {t_eventos_listas:7.3f} + {t_listas:7.3f} s | '
+        f'planos: {t_eventos:7.3f} + {t_planos:7.3f} s | '
+        f'x{t_listas / t_planos:6.1f} | {"OK" if iguales else "DIFERENTES"}'
+    )
+
+
+# =============================================================================================
+# Sección principal
+# =============================================================================================
+
+if __name__ == '__main__':
+    for años in [float(a) for a in sys.argv[1:]] or [1, 5, 10]:
+        comparar(años)
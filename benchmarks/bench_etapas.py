@@ -0,0 +1,210 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: bench_etapas.py - Tiempo, memoria y mediciones/s de cada etapa del procesamiento
+#          completo (archivo .csv -> curvas de Huff), sobre series sintéticas de varios tamaños
+#
+# Uso (desde la raíz del repositorio):
+#     python -m benchmarks.bench_etapas [--tamaños 10000 100000 ...] [--memoria]
+#         [--coma-decimal] [--comparar benchmarks/resultados/etapas_<commit>_<fecha>.csv]
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from Class_Precipitaciones import Precipitaciones
+from Class_Instrumentacion import Instrumentacion
+from benchmarks.generador_sintetico import generar_serie, archivo_csv
+
+
+# =============================================================================================
+# Procedimientos y funciones
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def version_codigo():
+    # Commit actual (con '+' si hay cambios sin confirmar), para comparar entre versiones
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        cambios = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'sin_git'
+    return commit + ('+' if cambios else '')
+
+# ---------------------------------------------------------------------------------------------
+def procesar(archivo_io, instrumentacion):
+    # Procesamiento completo, como en la aplicación, con criterios de aguacero por defecto
+    datos = Precipitaciones(instrumentacion=instrumentacion)
+    archivo_io.seek(0)
+    datos.obtener_lecturas(archivo_io)
+    columnas_ok, msg = datos.asignar_columnas_seleccionadas('Fecha', 'Lluvia')
+    if not columnas_ok:
+        raise ValueError(f'error en {msg}')
+    if not datos.estimar_intervalo_mediciones():
+        raise ValueError('error en intervalo entre mediciones')
+    datos.detectar_lagunas()
+    datos.rellenar_faltantes()
+    datos.calcular_eventos_precipitacion()
+    datos.primera_fecha, datos.ultima_fecha = datos.rango_mediciones()
+    datos.detectar_aguaceros()
+    datos.calcular_curvas_huff()
+    datos.agrupar_mediciones(frecuencia='D')
+    return datos
+
+# ---------------------------------------------------------------------------------------------
+def medir_tamaño(num_mediciones, args):
+    """
+    Procesa una serie sintética de num_mediciones y retorna un registro por etapa (y uno
+    'total'): mejor tiempo de las repeticiones, mediciones/s y memoria pico.
+    """
+    df = generar_serie(
+        num_mediciones,
+        intervalo=args.intervalo,
+        fraccion_humeda=args.fraccion_humeda,
+        fraccion_faltante=args.fraccion_faltante,
+        tasa_lagunas=args.tasa_lagunas,
+        semilla=args.semilla,
+    )
+    archivo_io = archivo_csv(df, coma_decimal=args.coma_decimal)
+
+    # Tiempos: mejor de varias repeticiones, sin tracemalloc (lo hace más lento)
+    mejores = None
+    for _ in range(args.repeticiones):
+        instrumentacion = Instrumentacion()
+        t0 = time.perf_counter()
+        datos = procesar(archivo_io, instrumentacion)
+        total = time.perf_counter() - t0
+
+        etapas = instrumentacion.resumen()
+        etapas.loc['total', ['llamadas', 'segundos']] = [1, total]
+        etapas.loc['total', 'filas'] = len(df)
+        if mejores is None:
+            mejores = etapas
+        else:
+            mejores['segundos'] = mejores['segundos'].combine(etapas['segundos'], min)
+
+    # Memoria pico: una ejecución aparte con tracemalloc
+    mejores['memoria_pico_mb'] = float('nan')
+    if args.memoria:
+        instrumentacion = Instrumentacion(memoria=True)
+        with instrumentacion.medir('total'):
+            procesar(archivo_io, instrumentacion)
+        mejores['memoria_pico_mb'] = instrumentacion.resumen()['memoria_pico_mb']
+
+    resultados = mejores.reset_index()
+    resultados.insert(0, 'tamaño', num_mediciones)
+    resultados['filas'] = resultados['filas'].astype('Int64')
+    resultados['mediciones_s'] = num_mediciones / resultados['segundos']
+    resultados['aguaceros'] = datos.df_aguaceros.shape[0]
+    return resultados
+
+# ---------------------------------------------------------------------------------------------
+def comparar(df, ruta_previa):
+    # Razón de tiempos respecto a resultados guardados (>1: más lento ahora)
+    previos = pd.read_csv(ruta_previa)
+    df = df.merge(
+        previos[['tamaño', 'etapa', 'segundos']], on=['tamaño', 'etapa'], how='left',
+        suffixes=('', '_previo'),
+    )
+    df['razon'] = df['segundos'] / df['segundos_previo']
+    return df
+
+# ---------------------------------------------------------------------------------------------
+def leer_argumentos(argumentos=None):
+    parser = argparse.ArgumentParser(
+        description='Mide cada etapa del procesamiento sobre series sintéticas.'
+    )
+    parser.add_argument(
+        '--tamaños', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+        help='Número de mediciones de cada serie (hasta 10000000)',
+    )
+    parser.add_argument('--intervalo', type=float, default=5, help='Minutos entre mediciones')
+    parser.add_argument(
+        '--fraccion-humeda', type=float, default=0.08, help='Fracción de mediciones con lluvia'
+    )
+    parser.add_argument(
+        '--fraccion-faltante', type=float, default=0.01,
+        help='Fracción de mediciones eliminadas al azar',
+    )
+    parser.add_argument(
+        '--tasa-lagunas', type=float, default=1e-4,
+        help='Probabilidad de inicio de una laguna larga en cada medición',
+    )
+    parser.add_argument(
+        '--coma-decimal', action='store_true', help='Escribir el .csv con coma decimal'
+    )
+    parser.add_argument('--semilla', type=int, default=0, help='Semilla del generador')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Se toma el mejor tiempo')
+    parser.add_argument(
+        '--memoria', action='store_true', help='Medir memoria pico (ejecución adicional)'
+    )
+    parser.add_argument(
+        '--salida', default=os.path.join('benchmarks', 'resultados'),
+        help='Directorio de resultados (etapas_<commit>_<fecha>.csv)',
+    )
+    parser.add_argument('--comparar', help='Resultados previos (.csv) para comparar tiempos')
+    return parser.parse_args(argumentos)
+
+
+# =============================================================================================
+# Sección principal
+# =============================================================================================
+
+def main(argumentos=None):
+    args = leer_argumentos(argumentos)
+    version = version_codigo()
+
+    resultados = []
+    for num_mediciones in args.tamaños:
+        df = medir_tamaño(num_mediciones, args)
+        resultados.append(df)
+        total = df[df['etapa'] == 'total'].iloc[0]
+        print(
+            f'{num_mediciones:>10} mediciones | {total["segundos"]:8.3f} s | '
+            f'{total["mediciones_s"]:>12,.0f} mediciones/s | {total["aguaceros"]:>6} aguaceros'
+        )
+
+    df = pd.concat(resultados, ignore_index=True)
+    parametros = ['intervalo', 'fraccion_humeda', 'fraccion_faltante', 'tasa_lagunas',
+                  'coma_decimal', 'semilla']
+    for parametro in parametros:
+        df[parametro] = getattr(args, parametro)
+    df.insert(0, 'version', version)
+    fecha = datetime.now()
+    df.insert(1, 'fecha', fecha.isoformat(timespec='seconds'))
+
+    os.makedirs(args.salida, exist_ok=True)
+    ruta = os.path.join(args.salida, f'etapas_{version}_{fecha:%Y%m%d-%H%M%S}.csv')
+    df.to_csv(ruta, index=False)
+
+    columnas = ['tamaño', 'etapa', 'segundos', 'mediciones_s', 'memoria_pico_mb', 'filas']
+    if args.comparar:
+        df = comparar(df, args.comparar)
+        columnas += ['segundos_previo', 'razon']
+    with pd.option_context('display.width', 160, 'display.max_rows', None):
+        print(df[columnas].to_string(index=False, float_format='{:.4g}'.format))
+    print(f'Resultados en {ruta}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
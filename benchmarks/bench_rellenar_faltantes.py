@@ -0,0 +1,84 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: bench_rellenar_faltantes.py - Relleno por posición en rejilla vs concatenar y ordenar
+#
+# Uso (desde la raíz del repositorio):
+#     python -m benchmarks.bench_rellenar_faltantes [años ...]
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import sys
+import time
+import pandas as pd
+
+from Class_Precipitaciones import Precipitaciones
+from benchmarks.generador_sintetico import generar_serie
+
+
+# =============================================================================================
+# Implementación previa (concatenar faltantes y ordenar), como referencia
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def rellenar_concatenando(datos, valor_relleno=0):
+    df = datos.df_mediciones[datos.df_mediciones[datos.col_precipitacion] >= 0]
+    rango_completo = pd.date_range(
+        start=df[datos.col_fechahora].min(), 
+        end=df[datos.col_fechahora].max(), 
+        freq=f'{datos.intervalo_mediciones}min'
+    )
+    timestamps_faltantes = rango_completo.difference(df[datos.col_fechahora])
+    df_faltantes = pd.DataFrame(timestamps_faltantes, columns=[datos.col_fechahora])
+    df_faltantes[datos.col_precipitacion] = valor_relleno
+    df = pd.concat([df, df_faltantes]).sort_values(by=datos.col_fechahora)
+    return df.reset_index(drop=True)
+
+
+# =============================================================================================
+# Comparación
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def comparar(años, intervalo=5, fraccion_faltante=0.05):
+    num_mediciones = int(años * 365 * 24 * 60 / intervalo)
+    df = generar_serie(num_mediciones, intervalo=intervalo, fraccion_faltante=fraccion_faltante)
+
+    datos = Precipitaciones()
+    datos.df_mediciones = df
+    datos.col_fechahora, datos.col_precipitacion = df.columns
+    datos.intervalo_mediciones = intervalo
+
+    t0 = time.perf_counter()
+    df_concatenado = rellenar_concatenando(datos)
+    t_concatenar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    datos.rellenar_faltantes()
+    t_rejilla = time.perf_counter() - t0
+
+    # Mismo resultado que la implementación previa
+    iguales = datos.df_mediciones.equals(df_concatenado)
+
+    print(
+        f'{años:>4} años | {len(df):>9} mediciones | '
+        f'{datos.reporte_relleno["rellenas"]:>8} faltantes | '
+        f'concatenar: {t_concatenar:7.3f} s | rejilla: {t_rejilla:7.3f} s | '
+        f'x{t_concatenar / t_rejilla:6.1f} | {"OK" if iguales else "DIFERENTES"}'
+    )
+
+
+# =============================================================================================
+# Sección principal
+# =============================================================================================
+
+if __name__ == '__main__':
+    for años in [float(a) for a in sys.argv[1:]] or [1, 5, 10]:
+        comparar(años)
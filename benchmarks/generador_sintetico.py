@@ -0,0 +1,90 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: generador_sintetico.py - Series sintéticas de pluviómetro para pruebas de desempeño
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import io
+import pandas as pd
+import numpy as np
+
+
+# ---------------------------------------------------------------------------------------------
+def generar_serie(num_mediciones, intervalo=5, fraccion_humeda=0.08, semilla=0,
+                  inicio='2010-01-01', col_fechahora='Fecha', col_precipitacion='Lluvia',
+                  fraccion_faltante=0.0, tasa_lagunas=0.0, duracion_lagunas=48):
+    """
+    Genera una serie regular de precipitación alternando rachas secas y húmedas.
+
+    Args:
+        num_mediciones: Número de mediciones de la serie.
+        intervalo: Minutos entre mediciones.
+        fraccion_humeda: Fracción aproximada de mediciones con lluvia.
+        semilla: Semilla del generador aleatorio, para resultados reproducibles.
+        fraccion_faltante: Fracción de mediciones eliminadas al azar (muchas lagunas cortas).
+        tasa_lagunas: Probabilidad de que una laguna larga inicie en cada medición.
+        duracion_lagunas: Número medio de mediciones de cada laguna larga (geométrica).
+
+    Returns:
+        DataFrame con columnas de fecha-hora y precipitación (sin las filas eliminadas).
+    """
+    rng = np.random.default_rng(semilla)
+
+    # Rachas húmedas cortas (geométricas) separadas por rachas secas más largas
+    media_humeda = 4
+    media_seca = max(1, media_humeda * (1 - fraccion_humeda) / max(fraccion_humeda, 1e-6))
+    num_rachas = 2 * int(num_mediciones / (media_humeda + media_seca) + 10)
+    longitudes = np.where(
+        np.arange(num_rachas) % 2 == 0,
+        rng.geometric(1 / media_seca, num_rachas),
+        rng.geometric(1 / media_humeda, num_rachas),
+    )
+    humedo = np.repeat(np.arange(num_rachas) % 2 == 1, longitudes)[:num_mediciones]
+    humedo = np.pad(humedo, (0, num_mediciones - len(humedo)))
+
+    # Lámina con resolución de 0.1 mm, como la de un pluviómetro de cubeta basculante
+    lamina = np.round(rng.gamma(0.8, 0.6, num_mediciones), 1) + 0.1
+    valores = np.where(humedo, lamina, 0.0)
+
+    df = pd.DataFrame({
+        col_fechahora     : pd.date_range(inicio, periods=num_mediciones, freq=f'{intervalo}min'),
+        col_precipitacion : valores,
+    })
+    conservar = rng.random(num_mediciones) >= fraccion_faltante
+    if tasa_lagunas > 0:
+        # Cada laguna elimina un bloque de mediciones consecutivas desde su inicio
+        inicios = np.flatnonzero(rng.random(num_mediciones) < tasa_lagunas)
+        longitudes = rng.geometric(1 / duracion_lagunas, len(inicios))
+        cambios = np.zeros(num_mediciones + 1, dtype=np.int64)
+        np.add.at(cambios, inicios, 1)
+        np.add.at(cambios, np.minimum(inicios + longitudes, num_mediciones), -1)
+        conservar &= np.cumsum(cambios[:-1]) == 0
+    if not conservar.all():
+        df = df[conservar].reset_index(drop=True)
+    return df
+
+# ---------------------------------------------------------------------------------------------
+def archivo_csv(df, coma_decimal=False, nombre='sintetico.csv'):
+    """
+    Escribe la serie como texto .csv en memoria, como un archivo cargado en Streamlit.
+
+    Args:
+        df: Serie generada con generar_serie.
+        coma_decimal: Escribir decimales con coma (p.ej. "0,2", entre comillas).
+        nombre: Nombre del archivo (atributo name, usado por obtener_lecturas).
+
+    Returns:
+        BytesIO con el contenido del archivo.
+    """
+    texto = df.to_csv(index=False, decimal=',' if coma_decimal else '.')
+    archivo_io = io.BytesIO(texto.encode('utf-8'))
+    archivo_io.name = nombre
+    return archivo_io
@@ -0,0 +1,124 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: reproducir_tiempo_real.py - Reproduce un archivo histórico como mediciones en
+#          tiempo real y compara los aguaceros detectados con detectar_aguaceros
+#
+# Uso (desde la raíz del repositorio):
+#     python -m benchmarks.reproducir_tiempo_real <archivo.csv> --fechahora <columna>
+#         --precipitacion <columna> [--lote N]
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import argparse
+import sys
+import time
+import numpy as np
+
+from Class_Precipitaciones import Precipitaciones
+from Class_DetectorAguaceros import DetectorAguaceros
+
+
+# =============================================================================================
+# Procedimientos y funciones
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def detectar_historico(ruta, col_fechahora, col_precipitacion):
+    # Detección sobre el archivo completo; retorna también las mediciones tal como se leyeron
+    datos = Precipitaciones()
+    with open(ruta, 'rb') as archivo_io:
+        datos.obtener_lecturas(archivo_io)
+    columnas_ok, msg = datos.asignar_columnas_seleccionadas(col_fechahora, col_precipitacion)
+    if not columnas_ok:
+        raise ValueError(f'error en {msg}')
+    if not datos.estimar_intervalo_mediciones():
+        raise ValueError('error en intervalo entre mediciones')
+
+    mediciones = datos.df_mediciones
+    datos.rellenar_faltantes()
+    datos.calcular_eventos_precipitacion()
+    datos.primera_fecha, datos.ultima_fecha = datos.rango_mediciones()
+    datos.detectar_aguaceros()
+    return datos, mediciones
+
+# ---------------------------------------------------------------------------------------------
+def reproducir(datos, mediciones, lote=1):
+    # Entrega las mediciones al detector en lotes de tamaño lote, en orden de llegada
+    detector = DetectorAguaceros(
+        datos.intervalo_mediciones,
+        pausa_maxima=datos.pausa_maxima,
+        duracion_minima=datos.duracion_minima,
+        duracion_maxima=datos.duracion_maxima,
+        intensidad_minima=datos.intensidad_minima,
+    )
+    fechas = mediciones[datos.col_fechahora].to_numpy()
+    valores = mediciones[datos.col_precipitacion].to_numpy()
+
+    aguaceros = []
+    for inicio in range(0, len(fechas), lote):
+        aguaceros.extend(
+            detector.agregar_lote(fechas[inicio:inicio + lote], valores[inicio:inicio + lote])
+        )
+    aguaceros.extend(detector.finalizar())
+    return aguaceros, detector
+
+# ---------------------------------------------------------------------------------------------
+def comparar(df_aguaceros, aguaceros):
+    # Retorna lista de diferencias entre ambos resultados (vacía si coinciden)
+    if len(aguaceros) != df_aguaceros.shape[0]:
+        return [f'{len(aguaceros)} aguaceros en tiempo real, {df_aguaceros.shape[0]} históricos']
+
+    diferencias = []
+    for i, (fila, aguacero) in enumerate(zip(df_aguaceros.to_dict('records'), aguaceros)):
+        for columna, valor in fila.items():
+            if isinstance(valor, np.ndarray):
+                iguales = np.array_equal(valor, aguacero[columna], equal_nan=True)
+            else:
+                iguales = valor == aguacero[columna]
+            if not iguales:
+                diferencias.append(f'aguacero {i} ({fila["inicia"]}): {columna}')
+    return diferencias
+
+
+# =============================================================================================
+# Sección principal
+# =============================================================================================
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        description='Compara detección en tiempo real con detección sobre el archivo completo.'
+    )
+    parser.add_argument('archivo', help='Archivo .csv de mediciones')
+    parser.add_argument('--fechahora', required=True, help='Columna fecha-hora')
+    parser.add_argument('--precipitacion', required=True, help='Columna de precipitación')
+    parser.add_argument('--lote', type=int, default=1, help='Mediciones por lote entregado')
+    args = parser.parse_args(argumentos)
+
+    datos, mediciones = detectar_historico(args.archivo, args.fechahora, args.precipitacion)
+
+    t0 = time.perf_counter()
+    aguaceros, detector = reproducir(datos, mediciones, args.lote)
+    duracion = time.perf_counter() - t0
+
+    diferencias = comparar(datos.df_aguaceros, aguaceros)
+    print(
+        f'{len(mediciones)} mediciones en {duracion:.2f} s '
+        f'({1e6 * duracion / max(len(mediciones), 1):.1f} µs/medición), '
+        f'{len(aguaceros)} aguaceros, {detector.descartadas} mediciones descartadas'
+    )
+    for diferencia in diferencias[:20]:
+        print(f'  DIFERENTE: {diferencia}')
+    print('OK' if len(diferencias) == 0 else f'{len(diferencias)} diferencias')
+    return 0 if len(diferencias) == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,6 +13,7 @@
 # =============================================================================================
 
 import streamlit as st
+from datetime import timedelta
 
 
 # =============================================================================================
@@ -83,37 +84,85 @@ if aplicar_cambios:
         salida_estado.error(f'Error en {msg}')
         st.stop()
 
-# ************************************
-# TODO: Detectar mediciones duplicadas
-# ************************************
+# Revisar marcas de tiempo de toda la serie: intervalos distintos, duplicadas, desorden
+if datos.tiene_mediciones:
+    analisis = datos.analizar_intervalos()
+    revision = analisis.resumen()
+    if analisis.intervalo_mixto | any(
+        revision[clave] > 0 for clave in ['duplicadas', 'no_monotonas', 'fuera_rejilla']
+    ):
+        st.write('**Revisión de marcas de tiempo:**')
+        st.caption(
+            f'Tramos [ :orange[{revision["segmentos"]}] ] '
+            f'con intervalos [ :orange[{", ".join(f"{i:g}" for i in revision["intervalos"])}] ] '
+            f'minutos, duplicadas [ :orange[{revision["duplicadas"]}] ], '
+            f'fuera de orden [ :orange[{revision["no_monotonas"]}] ], '
+            f'fuera de rejilla [ :orange[{revision["fuera_rejilla"]}] ]'
+        )
+        c1, c2, _, _ = st.columns(4)
+        if c1.toggle('Ver detalle de intervalos?'):
+            st.dataframe(analisis.df_segmentos)
+            st.dataframe(analisis.df_histograma)
+        intervalo_comun = max(revision['intervalos'])
+        if analisis.intervalo_mixto and \
+                c2.toggle(f'Remuestrear a {intervalo_comun:g} minutos?'):
+            datos.remuestrear_mediciones()
+            st.rerun()
 
 # Detectar intervalo
-if (datos.df_mediciones is not None) & (not datos.estimar_intervalo_mediciones()):
+if datos.tiene_mediciones & (not datos.estimar_intervalo_mediciones()):
     salida_estado.error('Error en intervalo entre mediciones.')
     st.stop()
 
 # Detectar lagunas en datos
 num_lagunas = 0
-if (datos.df_mediciones is not None) & (datos.intervalo_mediciones is not None):
+if datos.tiene_mediciones & (datos.intervalo_mediciones is not None):
     num_lagunas, df_lagunas = datos.detectar_lagunas()
     if num_lagunas > 0:
         st.write('**Manejo de lagunas:**')
         c1, c2, _, _ = st.columns(4)
         if c1.toggle('Ver detalle de lagunas?'):
+            reporte = datos.reporte_lagunas(frecuencia='ME')
+            st.caption(
+                f'Posiciones faltantes [ :orange[{reporte["faltantes"]}] ], '
+                f'laguna más larga [ :orange[{reporte["laguna_mas_larga"]:g}] ] minutos, '
+                f'lagunas con lluvia en sus bordes [ :orange[{reporte["lagunas_humedas"]}] ], '
+                f'completitud [ :orange[{reporte["completitud"]:.1%}] ]'
+            )
             st.line_chart(df_lagunas, x='inicia', y='duracion', color='#FF4500')
-            st.dataframe(df_lagunas)
+            apcfg.mostrar_tabla_paginada(df_lagunas, clave='pagina_lagunas')
+            st.write('Completitud mensual:')
+            st.bar_chart(reporte['df_completitud'], y='completitud')
         if c2.toggle('Rellenar faltantes con CEROS?'):
             datos.rellenar_faltantes()
             st.rerun()
 
 # Calcular eventos
-if (num_lagunas == 0) & (datos.df_eventos is None) & (datos.df_mediciones is not None):
+if (num_lagunas == 0) & (datos.df_eventos is None) & datos.tiene_mediciones:
     datos.calcular_eventos_precipitacion()
 
 # Indicar si ya se ejecutó procesamiento
 salida_intervalo.caption(
     f'Intervalo entre mediciones: [ :orange[{datos.intervalo_mediciones}] ] minutos'
 )
+if datos.tiene_mediciones & any(datos.conversion_precipitacion.values()):
+    st.caption(
+        'Precipitaciones tomadas como faltantes: '
+        f'vacías [ :orange[{datos.conversion_precipitacion["vacios"]}] ], '
+        f'no numéricas [ :orange[{datos.conversion_precipitacion["no_numericos"]}] ], '
+        f'valor centinela [ :orange[{datos.conversion_precipitacion["centinelas"]}] ]'
+    )
+if datos.intervalo_remuestreo is not None:
+    st.caption(
+        f'Mediciones remuestreadas a [ :orange[{datos.intervalo_remuestreo:g}] ] minutos'
+    )
+if datos.reporte_relleno:
+    st.caption(
+        'Relleno de faltantes: '
+        f'posiciones rellenas [ :orange[{datos.reporte_relleno["rellenas"]}] ], '
+        f'mediciones duplicadas [ :orange[{datos.reporte_relleno["duplicadas"]}] ], '
+        f'fuera de intervalo [ :orange[{datos.reporte_relleno["fuera_rejilla"]}] ]'
+    )
 if datos.df_eventos is not None:
 
     salida_estado.success('Estado: Procesadas.')
@@ -124,17 +173,49 @@ else:
 
 # Si se calcularon los eventos exitosamente, reinicializar rango de fechas válidas
 if datos.df_eventos is not None:
-    datos.primera_fecha = datos.df_mediciones[datos.col_fechahora].min()
-    datos.ultima_fecha  = datos.df_mediciones[datos.col_fechahora].max()
+    datos.primera_fecha, datos.ultima_fecha = datos.rango_mediciones()
 
 # Visualizar mediciones?
+# (automática: según la ventana de fechas, con a lo sumo PUNTOS_GRAFICO puntos)
+PUNTOS_GRAFICO = 1000
+NIVELES_GRAFICO = {'base': 'mediciones', 'h': 'horas', 'D': 'días', 'ME': 'meses', 'YE': 'años'}
 if st.toggle('Visualizar gráfico de mediciones?', disabled=datos.df_eventos is None):
     frecuencia = st.select_slider(
-        'Frecuencia de acumulación', options=['h', 'D', 'W', 'ME', 'YE']  , value='ME'
+        'Frecuencia de acumulación', 
+        options=['Automática', 'h', 'D', 'W', 'ME', 'YE'], 
+        value='Automática',
     )
-    st.line_chart(datos.agrupar_mediciones(frecuencia=frecuencia))
+    fecha_minima, fecha_maxima = datos.rango_mediciones()
+    if (frecuencia == 'Automática') and (fecha_minima < fecha_maxima):
+        ventana = st.slider(
+            'Ventana de fechas', 
+            min_value=fecha_minima.to_pydatetime(), 
+            max_value=fecha_maxima.to_pydatetime(),
+            value=(fecha_minima.to_pydatetime(), fecha_maxima.to_pydatetime()),
+            step=timedelta(hours=1),
+            format='YYYY-MM-DD HH:mm',
+        )
+        df_grafico, nivel = datos.piramide_mediciones().consultar(
+            *ventana, max_puntos=PUNTOS_GRAFICO
+        )
+        st.caption(
+            f'Acumulado por [ :orange[{NIVELES_GRAFICO[nivel]}] ], '
+            f'{df_grafico.shape[0]} puntos (mínimo y máximo por tramo)'
+        )
+        st.line_chart(df_grafico, x='fechahora', y='precipitacion')
+    elif frecuencia != 'Automática':
+        st.line_chart(datos.agrupar_mediciones(frecuencia=frecuencia))
+
+    # Mayor lámina en 15, 30 y 60 minutos por periodo (por día en la vista automática)
+    if st.toggle('Ver láminas máximas en 15, 30 y 60 minutos?'):
+        frecuencia_laminas = 'D' if frecuencia == 'Automática' else frecuencia
+        apcfg.mostrar_tabla_paginada(
+            datos.laminas_maximas(frecuencia=frecuencia_laminas), clave='pagina_laminas'
+        )
 
 # Ver eventos calculados?
 if datos.df_eventos is not None:
     if st.toggle('Visualizar tabla de eventos?', disabled=datos.df_eventos is None):
-        st.dataframe(datos.df_eventos)
+        apcfg.mostrar_tabla_paginada(datos.df_eventos, clave='pagina_eventos')
+
+apcfg.mostrar_instrumentacion(datos)
@@ -15,6 +15,8 @@
 
 import streamlit as st
 
+from Class_TablasArrow import tabla_parquet
+
 
 # =============================================================================================
 # Sección principal
@@ -38,21 +40,22 @@ if datos.df_eventos is None:
     st.stop()
 
 # Definir parámetros para detectar aguaceros
+fecha_minima, fecha_maxima = datos.rango_mediciones()
 with st.expander('Parámetros.', expanded=True):
     with st.form('Definir parámetros', ):
         zona_fecha1, zona_fecha2 = st.columns(2)
         datos.primera_fecha = zona_fecha1.date_input(
             'Seleccionar fecha inicial:', 
             value=datos.primera_fecha,
-            min_value=datos.df_mediciones[datos.col_fechahora].min(),
-            max_value=datos.df_mediciones[datos.col_fechahora].max(),
+            min_value=fecha_minima,
+            max_value=fecha_maxima,
         )
 
         datos.ultima_fecha = zona_fecha2.date_input(
             'Seleccionar fecha final:', 
             value=datos.ultima_fecha,
-            min_value=datos.df_mediciones[datos.col_fechahora].min(),
-            max_value=datos.df_mediciones[datos.col_fechahora].max(),
+            min_value=fecha_minima,
+            max_value=fecha_maxima,
         )
 
         zona_minima, zona_maxima = st.columns(2)
@@ -95,10 +98,36 @@ if aplicar_parametros:
     datos.detectar_aguaceros()
 
 if datos.df_aguaceros is not None:
+    # Columnas de listas: como listas Arrow, ocultas salvo que se pidan
+    columnas_listas = ['mediciones', 'porcentaje_acumulado']
     st.write('**Aguaceros detectados:**')
     st.write(
         'Estadísticas:',
-        datos.df_aguaceros.describe(include='all')
+        datos.df_aguaceros.drop(columns=columnas_listas).describe(include='all')
     )
     st.write('Datos:')
-    st.dataframe(datos.df_aguaceros)
\ No newline at end of file
+    tabla = datos.tabla_aguaceros()
+    ver_listas = st.toggle('Ver mediciones y porcentaje acumulado de cada aguacero?')
+    apcfg.mostrar_tabla_paginada(
+        tabla, 
+        clave='pagina_aguaceros',
+        columnas=None if ver_listas else \
+            [c for c in tabla.column_names if c not in columnas_listas],
+    )
+
+    if tabla.num_rows > 0:
+        zona_detalle, zona_descarga = st.columns([1, 3])
+        aguacero = zona_detalle.number_input(
+            'Detalle del aguacero (fila de la tabla, desde 1)', 
+            min_value=1, max_value=tabla.num_rows, value=1, step=1,
+        )
+        df_detalle = datos.detalle_aguacero(aguacero - 1)
+        st.line_chart(df_detalle, x='minuto', y='porcentaje_acumulado', color='#1E90FF')
+        zona_descarga.download_button(
+            'Descargar aguaceros (.parquet)',
+            data=lambda: tabla_parquet(tabla),
+            file_name=f'{datos.nombre}_aguaceros.parquet',
+            mime='application/octet-stream',
+        )
+
+apcfg.mostrar_instrumentacion(datos)
@@ -15,9 +15,8 @@
 
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
-from math import floor, ceil, trunc
-from pandas import cut
+
+from Class_GraficasAguaceros import rango_intensidades
 
 
 # =============================================================================================
@@ -25,54 +24,36 @@ from pandas import cut
 # =============================================================================================
 
 # ---------------------------------------------------------------------------------------------
-def generar_piedepagina(datos):
-    return \
-        f'Primera medición: {datos.primera_fecha}'                               +'\n'  + \
-        f'Última medición: {datos.ultima_fecha}'                                 +'\n'  + \
-        f'Rango de duración: {datos.duracion_minima} - {datos.duracion_maxima}'  + '\n' + \
-        f'Pausa máxima entre eventos: {datos.pausa_maxima}'                      + '\n' + \
-        f'Intensidad mínima de aguacero: {datos.intensidad_minima}'              + '\n' + \
-        f'Número de aguaceros: {datos.df_aguaceros.shape[0]}'                    + '\n' + \
-        f'Medición/Sensor: {datos.col_precipitacion}'
-    
+def mostrar_figura(nombre, *parametros):
+    # Reserva el lugar de la figura; se dibujan todas juntas (las que no están en la
+    # cache, en paralelo) al final de la página, en dibujar_figuras
+    pendientes.append((st.empty(), nombre, parametros))
+
+# ---------------------------------------------------------------------------------------------
+def dibujar_figuras(datos):
+    servicio = st.session_state['figuras']
+    imagenes = servicio.obtener(
+        datos, [(nombre, parametros) for _, nombre, parametros in pendientes]
+    )
+    for (lugar, _, _), imagen in zip(pendientes, imagenes):
+        lugar.image(imagen, width='stretch')
+
 # ---------------------------------------------------------------------------------------------
 def seccion_graficar_aguaceros(datos):
+    # Con muchos aguaceros las curvas se superponen: por defecto se muestra su densidad
     numero_aguaceros = datos.df_aguaceros.shape[0]
-    if st.button(f'Calcular {numero_aguaceros} curvas', type='primary'):
-        barra_progreso = st.progress(0, '')
-        fig, ax = plt.subplots(figsize=(8, 6))
-        numero_aguaceros = datos.df_aguaceros.shape[0]
-        procesado = 0
-        for _, aguacero in datos.df_aguaceros.iterrows():
-            conteo = aguacero['conteo']
-            porcentaje_duracion = [(i + 1) / conteo * 100 for i in range(conteo)]
-            porcentaje_precipitacion = list(aguacero['porcentaje_acumulado'])
-
-            ax.plot(porcentaje_duracion, porcentaje_precipitacion, linewidth=0.6)
-
-            procesado = procesado + 1
-            barra_progreso.progress(
-                procesado/numero_aguaceros, 
-                text=f'Curva {procesado} de {numero_aguaceros}'
-            )
-        barra_progreso.empty()
-
-        ax.set_xticks(range(0,101, 10))
-        ax.set_yticks(range(0,101, 10))
-        ax.grid(which='both', linestyle='--', linewidth=0.5)
-        ax.minorticks_on()
-        ax.grid(which='minor', linestyle=':', linewidth=0.5)
-        ax.set_xlabel('% duración')
-        ax.set_ylabel('% precipitación')
-
-        pie = generar_piedepagina(datos)
-        plt.text(100, 5, 
-            pie, fontsize=6, ha='right', 
-            bbox={'facecolor': 'white', 'alpha': 1, 'pad': 2}
-        )
+    if numero_aguaceros == 0:
+        st.warning('No hay aguaceros para graficar.')
+        return
 
-        plt.title(f'Curvas de aguaceros {datos.nombre}', fontsize=10)        
-        st.pyplot(fig)
+    modo = st.radio(
+        'Mostrar',
+        options=['Curvas', 'Densidad'],
+        index=0 if numero_aguaceros <= 1000 else 1,
+        horizontal=True,
+        help='Densidad: porcentaje de aguaceros cuya curva pasa por cada celda.',
+    )
+    mostrar_figura('curvas_aguaceros', modo)
 
     return
 
@@ -93,52 +74,13 @@ def seccion_graficar_aguaceros(datos):
 
     return xy_inflexion
 
-# ---------------------------------------------------------------------------------------------
-def preparar_curva_frecuencia(ax, df, columna):
-
-    # Curva general
-    valores       = df[[columna]].sort_values(columna, ascending=False)
-    num_valores   = valores.shape[0]
-    porcentajes_x = [(i + 1) / num_valores * 100 for i in range(num_valores)]
-    ax.plot(porcentajes_x, valores, label='General', linestyle='-', linewidth=1.2)
-
-    # Curvas por categoría Huff
-    categorias = df['Q_Huff'].unique()
-    categorias.sort()
-    for categoria in categorias:
-        valores       = df[df['Q_Huff'] == categoria][[columna]].sort_values(columna, ascending=False)
-        num_valores   = valores.shape[0]
-        porcentajes_x = [(i + 1) / num_valores * 100 for i in range(num_valores)]
-        ax.plot(porcentajes_x, valores, label=categoria, linewidth=0.9, linestyle='-.')
-
-    ax.set_ylabel(columna.capitalize())
-    ax.set_xlabel('Probabilidad')
-    ax.legend(fontsize=8)
-    ax.grid(which='both', linestyle='--', linewidth=0.5)
-    ax.minorticks_on()
-    ax.grid(which='minor', linestyle=':', linewidth=0.5)
-
-    return
-
 # ---------------------------------------------------------------------------------------------
 def seccion_graficar_curvas_frecuencia(datos):
     if datos.df_aguaceros.shape[0] <= 1:
         st.warning('Se requieren dos o mas aguaceros para calcular frecuencias.')
         return
-    
-    fig, (ax_duracion, ax_precipit) = plt.subplots(1, 2, figsize=(8, 4))
-    
-    preparar_curva_frecuencia(ax_duracion, datos.df_aguaceros, 'duracion')
-    preparar_curva_frecuencia(ax_precipit, datos.df_aguaceros, 'precipitacion_acumulada')
 
-    fig.suptitle(f'Curvas de frecuencia {datos.nombre}', fontsize=10, ha='center')
-    pie = generar_piedepagina(datos)
-    
-    plt.gcf().text(0.5, -0.125, 
-        pie, fontsize=5, ha='center', 
-        bbox={'facecolor': 'white', 'alpha': 1, 'pad': 2}
-    )
-    st.pyplot(fig)
+    mostrar_figura('curvas_frecuencia')
 
     return
 
@@ -150,39 +92,10 @@ def seccion_graficar_curvas_huff(datos):
         value=10,
     )
 
-    curvas_huff = datos.calcular_curvas_huff(intervalo=intervalo_percentiles)
-    valores_eje_x = range(0, 101, intervalo_percentiles)
-
-    fig, ax = plt.subplots(figsize=(8, 6))
-    marcas = "vDo^"
-    for indice, curva in curvas_huff.iterrows():
-        ax.plot(
-            valores_eje_x,
-            list(curva['valores_percentiles']),
-            label=curva['Q'],
-            marker=marcas[indice]
-        )
-
-    ax.set_xticks(range(0, 101, intervalo_percentiles))
-    ax.set_yticks(range(0, 101, 5))
-
-    ax.grid(which='both', linestyle='--', linewidth=0.5)
-    ax.grid(which='minor', linestyle=':', linewidth=0.5)
-
-    ax.set_xlabel('% duración')
-    ax.set_ylabel('% precipitación')
-    ax.legend()
-
-    plt.title(f'Curvas de Huff {datos.nombre}', fontsize=10)
-    pie = generar_piedepagina(datos)
-    plt.text(100, 5, 
-        pie, fontsize=6, ha='right', 
-        bbox={'facecolor': 'white', 'alpha': 1, 'pad': 2}
-    )
-
-    st.pyplot(fig)
+    mostrar_figura('curvas_huff', intervalo_percentiles)
 
     if st.toggle('Ver valores percentiles'):
+        curvas_huff = datos.calcular_curvas_huff(intervalo=intervalo_percentiles)
         curvas_huff['valores_percentiles'] = curvas_huff['valores_percentiles'].apply(
             lambda x: [round(i, 2) for i in x]
         )
@@ -198,8 +111,7 @@ def seccion_graficar_rangos_intensidad(datos):
         st.error('Requiere mas de dos aguaceros.')
         return
 
-    intensidad_min = floor(datos.df_aguaceros['intensidad'].min())
-    intensidad_max = ceil(datos.df_aguaceros['intensidad'].max())
+    intensidad_min, intensidad_max = rango_intensidades(datos)
     intensidad_med = (intensidad_max - intensidad_min) // 2
 
     if intensidad_min == intensidad_max:
@@ -211,53 +123,7 @@ def seccion_graficar_rangos_intensidad(datos):
         min_value=2, 
         max_value=intensidad_med
     )
-    tamaño_rango = (intensidad_max - intensidad_min) / num_rangos
-    limites_rangos = \
-        [trunc(intensidad_min + i * tamaño_rango) for i in range(num_rangos + 1)]
-    rangos = \
-        [(limites_rangos[i], limites_rangos[i + 1]) for i in range(num_rangos)]
-
-    df = datos.df_aguaceros[['Q_Huff', 'intensidad']].copy()
-
-    df['rango'] = cut(
-        datos.df_aguaceros['intensidad'], 
-        bins=limites_rangos,
-        labels=[f'{t}' for t in rangos],
-    )
-
-    conteo_por_categoria = df.groupby(['Q_Huff', 'rango'], observed=False).size()
-    categorias = df['Q_Huff'].unique()
-    categorias.sort()
-    
-    fig, ax = plt.subplots(figsize=(7, 4))
-    colores = ['lightblue', 'cyan', 'blue', 'navy']
-    for i, categoria in enumerate(categorias):
-        ax.bar(
-            [p + i * 0.15 for p in range(num_rangos)], 
-            conteo_por_categoria.loc[categoria],
-            width=0.15,
-            label=categoria,
-            color=colores[i]
-        )
-
-    ax.legend(title='Cuartil', loc='upper left', bbox_to_anchor=(1, 1))
-    ax.set_xticks(range(num_rangos))
-    ax.set_xticklabels(rangos, rotation=45, fontsize=8)
-    ax.set_xlabel('Rangos de intensidad')
-    ax.set_ylabel('Frecuencia')
-    ax.grid(which='both', linestyle='--', linewidth=0.5, axis='y')
-    ax.grid(which='minor', linestyle=':', linewidth=0.5, axis='y')
-
-    pie = generar_piedepagina(datos)
-    plt.gcf().text(1, 0.3, 
-        pie, fontsize=5, ha='center', 
-        bbox={'facecolor': 'white', 'alpha': 1, 'pad': 2}
-    )
-    plt.title(
-        f'Distribución rangos de intensidad por cuartil Huff\n{datos.nombre}',
-    )
-
-    st.pyplot(fig)
+    mostrar_figura('rangos_intensidad', num_rangos)
 
     return
 
@@ -298,7 +164,13 @@ secciones = {
     'Histórico de aguaceros'   : seccion_graficar_historico,
 }
 
-# Mostrar secciones
+# Mostrar secciones y luego dibujar sus figuras (el tiempo queda en la instrumentación)
+pendientes = []
 for titulo, seccion in secciones.items():
     with st.expander(titulo, expanded=False):
-        seccion(datos)
+        with datos.medir(f'gráfica: {titulo}'):
+            seccion(datos)
+with datos.medir('gráficas: dibujo'):
+    dibujar_figuras(datos)
+
+apcfg.mostrar_instrumentacion(datos)
@@ -0,0 +1,91 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: test_detectar_aguaceros.py - Detección con arreglos planos igual a la de listas
+#
+# Uso (desde la raíz del repositorio):
+#     python -m pytest -q
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import Class_Precipitaciones
+from Class_Precipitaciones import Precipitaciones
+from benchmarks.bench_detectar_aguaceros import preparar, calcular_eventos_listas, \
+    detectar_aguaceros_listas, resultados_iguales
+
+
+# =============================================================================================
+# Preparación
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+@pytest.fixture(params=['compilado', 'numpy'])
+def segmentacion(request, monkeypatch):
+    # Cada prueba con la segmentación compilada (si numba está instalado) y con NumPy
+    if request.param == 'compilado':
+        if Class_Precipitaciones._recorrer_secuencias_compilado is None:
+            pytest.skip('numba no está instalado')
+    else:
+        monkeypatch.setattr(Class_Precipitaciones, '_recorrer_secuencias_compilado', None)
+    return request.param
+
+# ---------------------------------------------------------------------------------------------
+def detectar_ambos(datos):
+    # Aguaceros con arreglos planos y con la implementación de referencia (listas)
+    df_listas = detectar_aguaceros_listas(datos, calcular_eventos_listas(datos))
+    datos.calcular_eventos_precipitacion()
+    datos.duracion_maxima = datos.duracion_tope
+    datos.detectar_aguaceros()
+    return datos.df_aguaceros, df_listas
+
+
+# =============================================================================================
+# Pruebas
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+@pytest.mark.parametrize('intervalo', [5, 1])
+def test_serie_sintetica(segmentacion, intervalo):
+    datos = preparar(30_000, intervalo=intervalo)
+    df, df_listas = detectar_ambos(datos)
+
+    assert len(df) > 0
+    assert resultados_iguales(df, df_listas)
+    assert np.array_equal(
+        df['precipitacion_acumulada'].to_numpy(), df_listas['precipitacion_acumulada'].to_numpy()
+    )
+
+# ---------------------------------------------------------------------------------------------
+def test_aguacero_en_intensidad_minima(segmentacion):
+    # Diez mediciones de 0.1 mm en 50 minutos: 1.0 mm y 1.2 mm/h exactos solo con suma
+    # compensada (sumadas una a una dan 0.9999999999999999 y el aguacero se descarta)
+    valores = np.zeros(2000)
+    for inicio in range(100, 1900, 300):
+        valores[inicio:inicio + 10] = 0.1
+
+    datos = Precipitaciones()
+    datos.nombre = 'limite'
+    datos.df_mediciones = pd.DataFrame({
+        'fechahora'     : pd.date_range('2020-01-01', periods=len(valores), freq='5min'),
+        'precipitacion' : valores,
+    })
+    datos.col_fechahora, datos.col_precipitacion = 'fechahora', 'precipitacion'
+    datos.estimar_intervalo_mediciones()
+    datos.primera_fecha, datos.ultima_fecha = datos.rango_mediciones()
+    datos.intensidad_minima = 1.2
+    df, df_listas = detectar_ambos(datos)
+
+    assert len(df) == len(df_listas) == 6
+    assert (df['precipitacion_acumulada'] == 1.0).all()
+    assert resultados_iguales(df, df_listas)
@@ -0,0 +1,75 @@
+# *********************************************************************************************
+# HyetiaScan
+# Análisis de lluvias, detección de aguaceros y gráficos de curvas de Huff
+# Juan Manuel de Villeros Arias
+# Mónica Liliana Gallego Jaramillo
+#
+# Archivo: test_lectura_por_partes.py - Lectura por bloques igual a la lectura completa
+# *********************************************************************************************
+
+
+# =============================================================================================
+# Bibliotecas
+# =============================================================================================
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from Class_Precipitaciones import Precipitaciones
+
+
+# =============================================================================================
+# Preparación
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def archivo(contenido, nombre='prueba.csv'):
+    archivo_io = io.BytesIO(contenido)
+    archivo_io.name = nombre
+    return archivo_io
+
+# ---------------------------------------------------------------------------------------------
+def leer(contenido, por_partes):
+    datos = Precipitaciones()
+    datos.obtener_lecturas(archivo(contenido), por_partes=por_partes)
+    return datos, datos.asignar_columnas_seleccionadas('Fecha', 'Lluvia')
+
+
+# =============================================================================================
+# Pruebas
+# =============================================================================================
+
+# ---------------------------------------------------------------------------------------------
+def test_coma_decimal_y_texto_despues_de_la_muestra():
+    # La muestra (primeras 1000 filas) es numérica; coma decimal, texto y vacíos después
+    num_filas = 5000
+    valores = np.round(np.random.default_rng(0).random(num_filas), 1).astype(str).astype(object)
+    valores[3000], valores[3500], valores[4000] = '1,5', 's/d', ''
+    contenido = pd.DataFrame({
+        'Fecha'  : pd.date_range('2020-01-01', periods=num_filas, freq='5min')
+                     .strftime('%Y-%m-%d %H:%M:%S'),
+        'Lluvia' : valores,
+    }).to_csv(index=False).encode()
+
+    completo, resultado_completo = leer(contenido, por_partes=False)
+    partes, resultado_partes = leer(contenido, por_partes=True)
+
+    assert resultado_completo == resultado_partes == (True, None)
+    assert partes.df_mediciones.equals(completo.df_mediciones)
+    assert partes.conversion_precipitacion == completo.conversion_precipitacion
+    assert partes.df_mediciones['Lluvia'].iloc[3000] == 1.5
+
+# ---------------------------------------------------------------------------------------------
+def test_error_de_lectura_con_su_mensaje():
+    filas = [
+        f'2020-01-{1 + i // 1440:02d} {(i // 60) % 24:02d}:{i % 60:02d}:00,0.1'
+        for i in range(3000)
+    ]
+    contenido = ('Fecha,Lluvia\n' + '\n'.join(filas) + '\n2020-01-05 01:00:00,"0.2\n').encode()
+
+    _, (columnas_ok, msg) = leer(contenido, por_partes=True)
+
+    assert not columnas_ok
+    assert msg.startswith('lectura del archivo')